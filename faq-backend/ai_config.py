@@ -0,0 +1,110 @@
+# AI service settings, shared by the Flask app (Config extends AIConfig) and AIService
+# Kept apart from config.py so AIService can be built without database configuration
+
+import os
+from typing import Any, Dict, Mapping, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+class AIConfig:
+    OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL', 'https://api.chatanywhere.tech/v1')
+    AI_MODEL = os.environ.get('AI_MODEL', 'gpt-3.5-turbo')
+    AI_SIMILARITY_THRESHOLD = float(os.environ.get('AI_SIMILARITY_THRESHOLD', '0.3'))
+    AI_MAX_TOKENS = int(os.environ.get('AI_MAX_TOKENS', '500'))
+    AI_TEMPERATURE = float(os.environ.get('AI_TEMPERATURE', '0.7'))
+    # Input-token budget of one LLM request (estimated locally); longer FAQ context is cut
+    # down to the sentences most relevant to the question (0 = no budget)
+    AI_MAX_INPUT_TOKENS = int(os.environ.get('AI_MAX_INPUT_TOKENS', '1000'))
+    
+    # LLM HTTP connection pool (one long-lived client per worker)
+    AI_HTTP_MAX_CONNECTIONS = int(os.environ.get('AI_HTTP_MAX_CONNECTIONS', '20'))
+    AI_HTTP_MAX_KEEPALIVE = int(os.environ.get('AI_HTTP_MAX_KEEPALIVE', '10'))
+    AI_HTTP_KEEPALIVE_EXPIRY = float(os.environ.get('AI_HTTP_KEEPALIVE_EXPIRY', '30'))
+    AI_CONNECT_TIMEOUT = float(os.environ.get('AI_CONNECT_TIMEOUT', '5'))
+    AI_READ_TIMEOUT = float(os.environ.get('AI_READ_TIMEOUT', '30'))
+    AI_MAX_RETRIES = int(os.environ.get('AI_MAX_RETRIES', '2'))
+    
+    # LLM circuit breaker: open after N consecutive failures or slow calls, probe after the open period
+    AI_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('AI_BREAKER_FAILURE_THRESHOLD', '5'))
+    AI_BREAKER_SLOW_CALL_MS = float(os.environ.get('AI_BREAKER_SLOW_CALL_MS', '15000'))
+    AI_BREAKER_OPEN_SECONDS = float(os.environ.get('AI_BREAKER_OPEN_SECONDS', '30'))
+    AI_BREAKER_HALF_OPEN_CALLS = int(os.environ.get('AI_BREAKER_HALF_OPEN_CALLS', '1'))
+    
+    # Hedged LLM requests: send a duplicate call once the first exceeds the recent p95 latency
+    AI_HEDGE_ENABLED = os.environ.get('AI_HEDGE_ENABLED', 'False').lower() in ['true', '1', 'yes']
+    AI_HEDGE_PERCENTILE = float(os.environ.get('AI_HEDGE_PERCENTILE', '95'))
+    AI_HEDGE_MIN_DELAY_MS = float(os.environ.get('AI_HEDGE_MIN_DELAY_MS', '500'))
+    
+    # Async chat path (asgi.py): LLM connections shared by concurrent chats, threads for
+    # blocking DB work and threads serving the other (Flask) routes; keep both thread
+    # counts together within DB_POOL_SIZE + DB_MAX_OVERFLOW
+    AI_ASYNC_HTTP_MAX_CONNECTIONS = int(os.environ.get('AI_ASYNC_HTTP_MAX_CONNECTIONS', '100'))
+    ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', '8'))
+    ASYNC_WSGI_THREADS = int(os.environ.get('ASYNC_WSGI_THREADS', '16'))
+    
+    # LLM answer cache (LRU size and TTL in seconds)
+    AI_ANSWER_CACHE_SIZE = int(os.environ.get('AI_ANSWER_CACHE_SIZE', '1000'))
+    AI_ANSWER_CACHE_TTL = float(os.environ.get('AI_ANSWER_CACHE_TTL', '3600'))
+    
+    # Semantic answer cache: reuse an answer for paraphrases within this cosine distance
+    AI_SEMANTIC_CACHE_SIZE = int(os.environ.get('AI_SEMANTIC_CACHE_SIZE', '500'))
+    AI_SEMANTIC_CACHE_MAX_DISTANCE = float(os.environ.get('AI_SEMANTIC_CACHE_MAX_DISTANCE', '0.15'))
+    
+    # Persisted FAQ index artifacts, memory-mapped by workers instead of refitting (empty = disabled)
+    AI_INDEX_DIR = os.environ.get('AI_INDEX_DIR', '')
+    AI_INDEX_KEEP_VERSIONS = int(os.environ.get('AI_INDEX_KEEP_VERSIONS', '2'))
+    
+    # FAQ index mode: 'tfidf' refits on every corpus change, 'incremental' updates
+    # hashed TF-IDF rows per changed FAQ and compacts at least every AI_INDEX_COMPACT_SECONDS
+    AI_INDEX_MODE = os.environ.get('AI_INDEX_MODE', 'tfidf')
+    AI_INDEX_HASH_FEATURES = int(os.environ.get('AI_INDEX_HASH_FEATURES', str(2 ** 18)))
+    AI_INDEX_COMPACT_SECONDS = float(os.environ.get('AI_INDEX_COMPACT_SECONDS', '300'))
+    
+    # Retrieval engine: 'tfidf' (the built-in index above), 'bm25' (inverted index with
+    # MaxScore top-k), 'lsa' (dense, approximate) or 'hybrid'; engine indexes are built
+    # in memory and not persisted
+    AI_RETRIEVAL_ENGINE = os.environ.get('AI_RETRIEVAL_ENGINE', 'tfidf')
+    
+    # Hybrid retrieval: engines run concurrently and are fused by reciprocal rank;
+    # engines after the first are dropped when they miss the per-question budget
+    AI_HYBRID_ENGINES = os.environ.get('AI_HYBRID_ENGINES', 'tfidf,bm25,char')
+    AI_HYBRID_RRF_K = float(os.environ.get('AI_HYBRID_RRF_K', '60'))
+    AI_HYBRID_BUDGET_MS = float(os.environ.get('AI_HYBRID_BUDGET_MS', '50'))
+    
+    # Dense 'lsa' engine: TruncatedSVD embeddings (float32) searched through an IVF index
+    # of AI_LSA_LISTS clusters (0 = about sqrt(FAQs)), probing AI_LSA_PROBE lists per query
+    AI_LSA_COMPONENTS = int(os.environ.get('AI_LSA_COMPONENTS', '256'))
+    AI_LSA_LISTS = int(os.environ.get('AI_LSA_LISTS', '0'))
+    AI_LSA_PROBE = int(os.environ.get('AI_LSA_PROBE', '16'))
+    
+    # Background reindexing after FAQ edits: a burst of edits is rebuilt once it has been
+    # quiet for AI_REINDEX_DEBOUNCE_MS, at most AI_REINDEX_MAX_DELAY_MS after its first edit
+    AI_REINDEX_DEBOUNCE_MS = float(os.environ.get('AI_REINDEX_DEBOUNCE_MS', '500'))
+    AI_REINDEX_MAX_DELAY_MS = float(os.environ.get('AI_REINDEX_MAX_DELAY_MS', '5000'))
+    
+    # Cross-worker index invalidation: workers LISTEN for FAQ changes on PostgreSQL and re-read the
+    # revision row every AI_INDEX_NOTIFY_CHECK_SECONDS; other databases poll it every AI_INDEX_POLL_SECONDS
+    AI_INDEX_POLL_SECONDS = float(os.environ.get('AI_INDEX_POLL_SECONDS', '2'))
+    AI_INDEX_NOTIFY_CHECK_SECONDS = float(os.environ.get('AI_INDEX_NOTIFY_CHECK_SECONDS', '60'))
+    
+    # Cache warm-up (gunicorn master, after the index preload): answer the AI_WARMUP_QUESTIONS most
+    # frequent questions of the last AI_WARMUP_DAYS, AI_WARMUP_CONCURRENCY at a time, starting none
+    # after AI_WARMUP_BUDGET_SECONDS; questions asked fewer than AI_WARMUP_MIN_COUNT times are skipped
+    AI_WARMUP_ENABLED = os.environ.get('AI_WARMUP_ENABLED', 'False').lower() in ['true', '1', 'yes']
+    AI_WARMUP_DAYS = int(os.environ.get('AI_WARMUP_DAYS', '7'))
+    AI_WARMUP_QUESTIONS = int(os.environ.get('AI_WARMUP_QUESTIONS', '200'))
+    AI_WARMUP_MIN_COUNT = int(os.environ.get('AI_WARMUP_MIN_COUNT', '2'))
+    AI_WARMUP_CONCURRENCY = int(os.environ.get('AI_WARMUP_CONCURRENCY', '4'))
+    AI_WARMUP_BUDGET_SECONDS = float(os.environ.get('AI_WARMUP_BUDGET_SECONDS', '60'))
+
+
+def ai_settings(config: Optional[Any] = None) -> Dict[str, Any]:
+    """Upper-case settings of AIConfig, overridden by those of config (a mapping such as app.config, or a class)"""
+    settings = {name: getattr(AIConfig, name) for name in dir(AIConfig) if name.isupper()}
+    if isinstance(config, Mapping):
+        settings.update(config)
+    elif config is not None:
+        settings.update({name: getattr(config, name) for name in dir(config) if name.isupper()})
+    return settings
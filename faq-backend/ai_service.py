@@ -2,35 +2,213 @@
 # Integrates OpenAI API and semantic search functionality
 
 import openai
+import httpx
+import asyncio
 import os
-from typing import List, Dict, Any
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import List, Dict, Any, Callable, Iterator, Optional
 import numpy as np
+from sklearn.base import clone
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import json
 import re
+import string
 from models import FAQ
+from ai_config import ai_settings
+from answer_cache import AnswerCache, SemanticAnswerCache
+from faq_index_store import FAQIndexArtifact, corpus_content_hash, load_faq_index, save_faq_index
+from incremental_index import IncrementalFAQIndex
+from index_snapshot import EMPTY_SNAPSHOT, FAQIndexSnapshot, QuestionVectors
+from prompt_builder import PromptBuilder, estimate_message_tokens
+from retrieval_engines import create_retrieval_engine
+from keyword_service import keyword_service
+from llm_resilience import (CircuitBreaker, CircuitOpenError, LatencyTracker, SingleFlight, hedged_call,
+                            hedged_call_async)
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Empathetic wrapping of answers when negative emotion is detected
+FAQ_EMPATHY_PREFIX = "I understand this might be frustrating. "
+FAQ_EMPATHY_SUFFIX = "\n\nIf you need further assistance, please let me know and I can connect you with a human representative."
+AI_EMPATHY_PREFIX = "I understand your concern. "
+AI_EMPATHY_SUFFIX = "\n\nIf this doesn't fully address your issue, I can connect you with a human representative for more personalized assistance."
+
+
+def keyword_trie_pattern(keywords) -> str:
+    """Regex alternation of keywords factored into a prefix trie
+    
+    Keywords sharing a prefix share one branch ('ma(?:d|nager)'), so the regex
+    engine tests each position against the trie instead of every keyword in turn.
+    With the few dozen default emotion keywords this is about as fast as a
+    substring scan; it pays off only for much longer lists (benchmark_emotion.py).
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def build(node) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f"(?:{pattern})?" if '' in node else pattern
+    
+    return build(trie)
+
+
+ASCII_UPPERCASE = string.ascii_uppercase.encode('ascii')
+
+def uppercase_count(text: str) -> int:
+    """Number of uppercase characters; ASCII text is counted in C via bytes.translate"""
+    if text.isascii():
+        data = text.encode('ascii')
+        return len(data) - len(data.translate(None, ASCII_UPPERCASE))
+    return sum(1 for c in text if c.isupper())
+
 class AIService:
-    def __init__(self):
-        # Set OpenAI API key
+    def __init__(self, config: Optional[Any] = None):
+        # Settings come from AIConfig, overridden by config (app.config, a Config class or a dict)
+        settings = ai_settings(config)
+        
+        # Set OpenAI API key (environment only; Config's fallback key is not used for LLM calls)
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
         
-        # Initialize TF-IDF vectorizer for semantic similarity calculation
-        self.vectorizer = TfidfVectorizer(
+        # LLM endpoint and HTTP connection pool settings
+        self.openai_base_url = settings['OPENAI_BASE_URL']
+        self.ai_model = settings['AI_MODEL']
+        self.ai_max_tokens = settings['AI_MAX_TOKENS']
+        self.ai_temperature = settings['AI_TEMPERATURE']
+        # Minimum similarity for a FAQ match
+        self.similarity_threshold = settings['AI_SIMILARITY_THRESHOLD']
+        self.http_max_connections = settings['AI_HTTP_MAX_CONNECTIONS']
+        self.http_max_keepalive = settings['AI_HTTP_MAX_KEEPALIVE']
+        self.http_keepalive_expiry = settings['AI_HTTP_KEEPALIVE_EXPIRY']
+        self.http_connect_timeout = settings['AI_CONNECT_TIMEOUT']
+        self.http_read_timeout = settings['AI_READ_TIMEOUT']
+        self.ai_max_retries = settings['AI_MAX_RETRIES']
+        
+        # Long-lived OpenAI client, created lazily once per worker process
+        self._openai_client = None
+        self._http_client = None
+        self._client_pid = None
+        self._client_lock = threading.Lock()
+        
+        # Async client for the ASGI chat path, bound to the event loop that created it
+        self.async_http_max_connections = settings['AI_ASYNC_HTTP_MAX_CONNECTIONS']
+        self._async_openai_client = None
+        self._async_client_loop = None
+        
+        # Circuit breaker around the LLM backend; while open, answers come from the FAQs
+        self.llm_breaker = CircuitBreaker(
+            failure_threshold=settings['AI_BREAKER_FAILURE_THRESHOLD'],
+            slow_call_ms=settings['AI_BREAKER_SLOW_CALL_MS'],
+            open_seconds=settings['AI_BREAKER_OPEN_SECONDS'],
+            half_open_max_calls=settings['AI_BREAKER_HALF_OPEN_CALLS']
+        )
+        
+        # Optional hedged requests: a duplicate LLM call after the recent p95 latency
+        self.hedge_enabled = settings['AI_HEDGE_ENABLED']
+        self.hedge_percentile = settings['AI_HEDGE_PERCENTILE']
+        self.hedge_min_delay_ms = settings['AI_HEDGE_MIN_DELAY_MS']
+        self.llm_latency = LatencyTracker()
+        self._hedge_executor = None
+        self._hedged_requests = 0
+        
+        # Identical questions with the same FAQ context in flight at once share one LLM call
+        self.llm_flights = SingleFlight()
+        
+        # Prompt builder enforcing the input-token budget, and prompt sizes of recent LLM calls
+        self.prompt_builder = PromptBuilder(max_input_tokens=settings['AI_MAX_INPUT_TOKENS'])
+        self._prompt_records = deque(maxlen=500)
+        
+        # LLM call statistics per connection pool ('sync' client, 'async' client of the
+        # ASGI chat path), used to spot requests queuing for a pooled connection
+        self._llm_stats_lock = threading.Lock()
+        self._llm_stats = {
+            pool: {
+                'requests': 0,
+                'failures': 0,
+                'in_flight': 0,
+                'peak_in_flight': 0,
+                'total_latency_ms': 0.0
+            }
+            for pool in ('sync', 'async')
+        }
+        
+        # TF-IDF vectorizer settings for semantic similarity calculation; every rebuild fits a clone
+        self.vectorizer_template = TfidfVectorizer(
             stop_words='english',
             ngram_range=(1, 2),
             max_features=1000
         )
         
-        # Cache FAQ vectors
-        self.faq_vectors = None
-        self.faq_questions = []
-        self.faq_answers = []
+        # FAQ index (vectors, FAQ rows, exact-match table) as one immutable snapshot,
+        # replaced by a single assignment; requests read it once and never lock
+        self._snapshot = EMPTY_SNAPSHOT
+        # Serializes rebuilds against each other (never taken by requests)
+        self._rebuild_lock = threading.RLock()
+        
+        # Optional directory of persisted, memory-mapped index artifacts (see faq_index_store)
+        self.index_dir = settings['AI_INDEX_DIR']
+        self.index_keep_versions = settings['AI_INDEX_KEEP_VERSIONS']
+        
+        # Retrieval engine: 'tfidf' is the built-in index, others come from retrieval_engines
+        # (this instance stays unbuilt; each snapshot builds a clone of it)
+        self.retrieval_engine_name = settings['AI_RETRIEVAL_ENGINE'].lower()
+        self.retrieval_engine = None
+        if self.retrieval_engine_name != 'tfidf':
+            options = {}
+            if self.retrieval_engine_name == 'hybrid':
+                # Engines fused by reciprocal rank within a per-question time budget
+                options = {
+                    'engines': [name.strip() for name in settings['AI_HYBRID_ENGINES'].split(',')
+                                if name.strip()],
+                    'rrf_k': settings['AI_HYBRID_RRF_K'],
+                    'budget_ms': settings['AI_HYBRID_BUDGET_MS']
+                }
+            elif self.retrieval_engine_name == 'lsa':
+                # Dense embeddings with an approximate (IVF) nearest-neighbour search
+                options = {
+                    'n_components': settings['AI_LSA_COMPONENTS'],
+                    'n_lists': settings['AI_LSA_LISTS'],
+                    'n_probe': settings['AI_LSA_PROBE']
+                }
+            try:
+                self.retrieval_engine = create_retrieval_engine(self.retrieval_engine_name, **options)
+            except ValueError as e:
+                print(f"⚠️ {e}, falling back to tfidf")
+                self.retrieval_engine_name = 'tfidf'
+        
+        # 'incremental' keeps a hashed TF-IDF index updated per changed FAQ instead of refitting
+        self.index_mode = settings['AI_INDEX_MODE'].lower()
+        self.incremental_index = None
+        if self.index_mode == 'incremental':
+            self.incremental_index = IncrementalFAQIndex(
+                n_features=settings['AI_INDEX_HASH_FEATURES'],
+                compact_seconds=settings['AI_INDEX_COMPACT_SECONDS']
+            )
+        
+        # Cache of LLM answers keyed by question and context FAQ revisions
+        self.answer_cache = AnswerCache(
+            max_size=settings['AI_ANSWER_CACHE_SIZE'],
+            ttl_seconds=settings['AI_ANSWER_CACHE_TTL']
+        )
+        
+        # Cache serving paraphrased questions by TF-IDF cosine distance
+        self.semantic_cache = SemanticAnswerCache(
+            max_size=settings['AI_SEMANTIC_CACHE_SIZE'],
+            ttl_seconds=settings['AI_ANSWER_CACHE_TTL'],
+            max_distance=settings['AI_SEMANTIC_CACHE_MAX_DISTANCE']
+        )
         
         # Emotion detection keywords
         self.negative_emotion_keywords = {
@@ -40,60 +218,371 @@ class AIService:
             'complaint': ['complain', 'complaint', 'report', 'escalate', 'manager', 'supervisor'],
             'transfer': ['human', 'person', 'agent', 'representative', 'transfer', 'speak to someone', 'talk to someone']
         }
+        self._compile_emotion_matcher()
         
-    def update_faq_vectors(self, faqs: List[FAQ]):
-        """Update FAQ vector cache"""
-        if not faqs:
-            return
+    @property
+    def index_snapshot(self) -> FAQIndexSnapshot:
+        """The FAQ index currently served; read it once per request"""
+        return self._snapshot
+    
+    @property
+    def corpus_version(self) -> Any:
+        """Corpus revision the current index was built from (None = not built yet)"""
+        return self._snapshot.corpus_version
+    
+    @property
+    def vectorizer(self):
+        """Fitted vectorizer of the current index (the unfitted template before the first build)"""
+        vectorizer = self._snapshot.vectorizer
+        return vectorizer if vectorizer is not None else self.vectorizer_template
+    
+    @property
+    def faq_vectors(self):
+        return self._snapshot.vectors
+    
+    @property
+    def faq_ids(self) -> tuple:
+        return self._snapshot.faq_ids
+    
+    @property
+    def faq_revisions(self) -> tuple:
+        return self._snapshot.faq_revisions
+    
+    @property
+    def faq_questions(self) -> tuple:
+        return self._snapshot.faq_questions
+    
+    @property
+    def faq_answers(self) -> tuple:
+        return self._snapshot.faq_answers
+    
+    def update_faq_vectors(self, faqs: List[FAQ], corpus_version: Any = None):
+        """Build a new FAQ index snapshot and publish it
+        
+        The new index is built next to the one being served; requests keep
+        reading the old snapshot until the new one replaces it in one step.
+        """
+        faqs = faqs or []
+        with self._rebuild_lock:
+            if self.incremental_index is not None:
+                self._sync_incremental_index(faqs, corpus_version)
+                return
             
-        self.faq_questions = [faq.question for faq in faqs]
-        self.faq_answers = [faq.answer for faq in faqs]
+            questions = [faq.question for faq in faqs]
+            engine = vectorizer = vectors = None
+            if self.retrieval_engine is not None:
+                engine = self.retrieval_engine.clone()
+                engine.build(questions)
+            elif faqs:
+                # Calculate TF-IDF vectors
+                vectorizer = clone(self.vectorizer_template)
+                vectors = vectorizer.fit_transform(questions)
+            
+            self._publish(FAQIndexSnapshot(
+                corpus_version,
+                [faq.id for faq in faqs],
+                [faq.revision for faq in faqs],
+                questions,
+                [faq.answer for faq in faqs],
+                vectors=vectors,
+                vectorizer=vectorizer,
+                engine=engine
+            ))
+    
+    def load_index_artifact(self, artifact: FAQIndexArtifact):
+        """Serve from a persisted index artifact instead of refitting the vectorizer"""
+        vectorizer = clone(self.vectorizer_template)
+        artifact.apply_to(vectorizer)
+        with self._rebuild_lock:
+            self._publish(FAQIndexSnapshot(
+                artifact.corpus_version,
+                artifact.faq_ids,
+                artifact.faq_revisions,
+                artifact.faq_questions,
+                artifact.faq_answers,
+                vectors=artifact.vectors,
+                vectorizer=vectorizer
+            ))
+    
+    def _sync_incremental_index(self, faqs: List[FAQ], corpus_version: Any):
+        """Apply only the FAQs that changed since the last sync to the incremental index"""
+        changed_ids = self.incremental_index.sync(faqs)
+        self._publish_incremental_view(corpus_version, changed_ids)
+    
+    def compact_index(self):
+        """Run a full compaction of the incremental index"""
+        if self.incremental_index is not None:
+            with self._rebuild_lock:
+                self.incremental_index.compact()
+                self._publish_incremental_view(self.corpus_version, [])
+    
+    def _publish_incremental_view(self, corpus_version: Any, changed_ids: List[Any]):
+        """Publish the incremental index's current view; only changed FAQs are re-keyed for exact matches
+        
+        Without changed FAQs (a compaction) IDF weights stay the same, so question
+        vectors of the previous snapshot remain comparable and keep its vector space.
+        """
+        view = self.incremental_index.view()
+        exact_match = self._snapshot.exact_match.copy()
+        for faq_id in changed_ids:
+            row = view.row_of.get(faq_id)
+            exact_match.update(faq_id, view.faq_questions[row] if row is not None else None)
         
-        # Calculate TF-IDF vectors
-        self.faq_vectors = self.vectorizer.fit_transform(self.faq_questions)
+        self._publish(FAQIndexSnapshot(
+            corpus_version,
+            view.faq_ids,
+            view.faq_revisions,
+            view.faq_questions,
+            view.faq_answers,
+            incremental=view,
+            exact_match=exact_match,
+            faq_rows=view.row_of,
+            vector_generation=self._snapshot.vector_generation if not changed_ids else None
+        ), changed_ids)
     
-    def find_similar_faq(self, user_question: str, threshold: float = 0.3) -> Dict[str, Any]:
-        """Find the most relevant FAQ using semantic similarity"""
-        if self.faq_vectors is None or len(self.faq_questions) == 0:
-            return None
+    def _publish(self, snapshot: FAQIndexSnapshot, changed_ids: List[Any] = None):
+        """Swap in a new snapshot, then drop cached answers it makes stale
+        
+        Args:
+            snapshot: The new index
+            changed_ids: FAQs that changed, if known; otherwise derived by comparing both snapshots
+        """
+        previous = self._snapshot
+        if changed_ids is None:
+            current_faqs = dict(zip(snapshot.faq_ids, zip(snapshot.faq_revisions, snapshot.faq_questions,
+                                                           snapshot.faq_answers)))
+            changed_ids = [
+                faq_id for faq_id, state in
+                zip(previous.faq_ids, zip(previous.faq_revisions, previous.faq_questions, previous.faq_answers))
+                if current_faqs.get(faq_id) != state
+            ]
+        
+        # A single reference assignment: requests see either the old or the new index, never a mix
+        self._snapshot = snapshot
+        
+        # Cached answers built on an edited or deleted FAQ are no longer valid
+        if changed_ids:
+            self.answer_cache.invalidate_faqs(changed_ids)
+        
+        # Question vectors of the old index are not comparable with the new one; answers
+        # of LLM calls still running against the old index are dropped by the cache
+        if snapshot.vector_generation != previous.vector_generation:
+            self.semantic_cache.clear(snapshot.vector_generation)
+    
+    def get_index_stats(self) -> Dict[str, Any]:
+        """Size and origin of the FAQ index held by this worker
+        
+        'inherited' is True in a forked worker still using the index built by
+        the gunicorn master; 'memory_mapped' is True for a persisted artifact.
+        """
+        snapshot = self._snapshot
+        common = {
+            'mode': self.index_mode,
+            'corpus_version': snapshot.corpus_version,
+            'generation': snapshot.generation,
+            'pid': os.getpid(),
+            'inherited': snapshot.corpus_version is not None and snapshot.pid != os.getpid(),
+            'exact_match': snapshot.exact_match.get_stats()
+        }
+        if snapshot.engine is not None or snapshot.incremental is not None:
+            stats = (snapshot.engine.get_stats() if snapshot.engine is not None
+                     else self.incremental_index.get_stats())
+            stats.update(common)
+            return stats
+        
+        vectors = snapshot.vectors
+        stats = {
+            'faqs': len(snapshot.faq_ids),
+            'memory_mapped': False,
+            'nnz': 0,
+            'bytes': 0
+        }
+        stats.update(common)
+        if vectors is not None:
+            stats['nnz'] = int(vectors.nnz)
+            stats['bytes'] = int(vectors.data.nbytes + vectors.indices.nbytes + vectors.indptr.nbytes)
+            stats['memory_mapped'] = not vectors.data.flags.writeable
+        return stats
+    
+    def sync_corpus(self, corpus_version: Any, load_faqs: Callable[[], List[FAQ]],
+                    load_faq_revisions: Callable[[], Dict[Any, Any]] = None,
+                    load_faqs_by_id: Callable[[List[Any]], List[FAQ]] = None) -> bool:
+        """Rebuild the FAQ index only if the corpus revision changed
+        
+        With AI_INDEX_DIR set, a worker first tries the persisted artifact for
+        this revision and the loaded FAQ content, and only refits (and saves a
+        new artifact) without one.
+        A built incremental index reads only (id, revision) pairs and loads
+        the FAQs whose revision changed, when both loaders for that are given.
+        
+        Args:
+            corpus_version: Current corpus revision (see FAQCorpusState)
+            load_faqs: Callable returning all FAQs, only invoked on a rebuild
+            load_faq_revisions: Callable returning {FAQ id: revision} of all FAQs
+            load_faqs_by_id: Callable returning the FAQs with the given ids
+            
+        Returns:
+            True if the index was rebuilt
+        """
+        if corpus_version == self.corpus_version:
+            return False
+        
+        with self._rebuild_lock:
+            # Another thread may have rebuilt while this one waited
+            if corpus_version == self.corpus_version:
+                return False
             
-        # Convert user question to vector
-        user_vector = self.vectorizer.transform([user_question])
+            if (self.incremental_index is not None and len(self.incremental_index)
+                    and load_faq_revisions is not None and load_faqs_by_id is not None):
+                changed_ids = self.incremental_index.sync_revisions(load_faq_revisions(), load_faqs_by_id)
+                self._publish_incremental_view(corpus_version, changed_ids)
+                return True
+            
+            persist = (self.index_dir and corpus_version is not None
+                       and self.incremental_index is None and self.retrieval_engine is None)
+            faqs = load_faqs()
+            if persist:
+                content_hash = corpus_content_hash([faq.id for faq in faqs], [faq.revision for faq in faqs],
+                                                   [faq.question for faq in faqs], [faq.answer for faq in faqs])
+                artifact = load_faq_index(self.index_dir, corpus_version, content_hash, self.vectorizer_template)
+                if artifact is not None:
+                    self.load_index_artifact(artifact)
+                    return True
+            
+            self.update_faq_vectors(faqs, corpus_version)
+            
+            snapshot = self._snapshot
+            if persist and snapshot.vectors is not None:
+                save_faq_index(self.index_dir, corpus_version, snapshot.vectorizer, snapshot.vectors,
+                               snapshot.faq_ids, snapshot.faq_revisions, snapshot.faq_questions,
+                               snapshot.faq_answers, self.index_keep_versions)
+            return True
+    
+    @staticmethod
+    def corpus_fingerprint(faqs: List[FAQ]) -> int:
+        """Content fingerprint for FAQ lists passed in directly (no revision available)"""
+        return hash(tuple((faq.id, faq.question, faq.answer) for faq in faqs))
+    
+    def retrieve(self, user_question: str, k: int = 3) -> List[Dict[str, Any]]:
+        """Return up to k FAQ hits ranked by similarity
         
-        # Calculate cosine similarity
-        similarities = cosine_similarity(user_vector, self.faq_vectors)[0]
+        The question is vectorized once. With the built-in TF-IDF index, FAQ
+        rows are L2-normalized, so a sparse dot product gives the cosine
+        similarity and argpartition selects the top-k without sorting every
+        score; other engines (AI_RETRIEVAL_ENGINE) rank through their own index.
+        """
+        return self._retrieve_with_vector(user_question, k)[1]
+    
+    def _vectorize(self, questions: List[str], snapshot: FAQIndexSnapshot):
+        """Question vectors in the space of the given index snapshot"""
+        return snapshot.vectorize(questions)
+    
+    def _retrieve_vector(self, user_question: str, user_vector, k: int,
+                         snapshot: FAQIndexSnapshot) -> List[Dict[str, Any]]:
+        """retrieve() for an already vectorized question"""
+        # Take some slack so duplicate FAQ questions don't shrink the result below k
+        return self._top_k_hits(snapshot.search([user_question], user_vector, 2 * k)[0], k, snapshot)
+    
+    def retrieve_batch(self, user_questions: List[str], k: int = 3) -> List[List[Dict[str, Any]]]:
+        """Batch version of retrieve(): one transform and one sparse matrix-matrix product"""
+        return self._retrieve_batch_with_vectors(user_questions, k)[1]
+    
+    def _retrieve_batch_with_vectors(self, user_questions: List[str], k: int) -> tuple:
+        """retrieve_batch() that also returns the tagged question vectors (None if no index)"""
+        snapshot = self._snapshot
+        if not snapshot.has_index() or not user_questions:
+            return None, [[] for _ in user_questions]
         
-        # Find the most similar FAQ
-        best_match_idx = np.argmax(similarities)
-        best_similarity = similarities[best_match_idx]
+        question_vectors = self._vectorize(user_questions, snapshot)
+        return snapshot.tag(question_vectors), [
+            self._top_k_hits(result, k, snapshot)
+            for result in snapshot.search(user_questions, question_vectors, 2 * k)
+        ]
+    
+    def _top_k_hits(self, result: tuple, k: int, snapshot: FAQIndexSnapshot) -> List[Dict[str, Any]]:
+        """Turn ranked candidate rows into up to k hits, skipping duplicate FAQ questions
         
-        if best_similarity >= threshold:
-            return {
-                'question': self.faq_questions[best_match_idx],
-                'answer': self.faq_answers[best_match_idx],
-                'similarity': float(best_similarity),
-                'confidence': 'high' if best_similarity > 0.7 else 'medium'
-            }
+        Hybrid retrieval results also carry the search time of each engine,
+        which is copied to every hit as 'retrieval_ms'.
+        """
+        rows, similarities = result
+        timings_ms = getattr(result, 'timings_ms', None)
+        hits = []
+        seen_questions = set()
+        for idx, similarity in zip(rows, similarities):
+            similarity = float(similarity)
+            if similarity <= 0 or len(hits) >= k:
+                break
+            question_key = snapshot.faq_questions[idx].strip().lower()
+            if question_key in seen_questions:
+                continue
+            seen_questions.add(question_key)
+            hits.append({
+                'index': int(idx),
+                'id': snapshot.faq_ids[idx],
+                'revision': snapshot.faq_revisions[idx],
+                'question': snapshot.faq_questions[idx],
+                'answer': snapshot.faq_answers[idx],
+                'similarity': similarity
+            })
+            if timings_ms is not None:
+                hits[-1]['retrieval_ms'] = timings_ms
+        return hits
+    
+    def _best_match(self, hits: List[Dict[str, Any]], threshold: Optional[float] = None) -> Dict[str, Any]:
+        """Turn the top retrieval hit into a FAQ match if it clears the threshold (default AI_SIMILARITY_THRESHOLD)"""
+        if threshold is None:
+            threshold = self.similarity_threshold
+        if not hits or hits[0]['similarity'] < threshold:
+            return None
         
-        return None
+        best = hits[0]
+        return {
+            'id': best['id'],
+            'question': best['question'],
+            'answer': best['answer'],
+            'similarity': best['similarity'],
+            'confidence': 'high' if best['similarity'] > 0.7 else 'medium'
+        }
+    
+    @staticmethod
+    def _context_hits(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Hits above the minimum relevance threshold, used as LLM context"""
+        return [hit for hit in hits if hit['similarity'] > 0.1]
+    
+    def find_similar_faq(self, user_question: str, threshold: Optional[float] = None) -> Dict[str, Any]:
+        """Find the most relevant FAQ using semantic similarity"""
+        return self._best_match(self.retrieve(user_question, k=1), threshold)
+    
+    def _compile_emotion_matcher(self):
+        """Compile all emotion keywords into one word-bounded regex
+        
+        Call again after changing negative_emotion_keywords.
+        """
+        self._emotion_keyword_types = {}
+        for emotion_type, keywords in self.negative_emotion_keywords.items():
+            for keyword in keywords:
+                self._emotion_keyword_types.setdefault(keyword.lower(), []).append(emotion_type)
+        
+        trie = keyword_trie_pattern(self._emotion_keyword_types) or '(?!)'
+        self._emotion_pattern = re.compile(rf"\b{trie}\b")
     
     def analyze_emotion(self, user_message: str) -> Dict[str, Any]:
         """Analyze user emotion and detect negative sentiment"""
-        user_message_lower = user_message.lower()
         detected_emotions = []
         emotion_score = 0
         
-        # Check for negative emotion keywords
-        for emotion_type, keywords in self.negative_emotion_keywords.items():
-            for keyword in keywords:
-                if keyword in user_message_lower:
-                    detected_emotions.append(emotion_type)
-                    emotion_score += 1
+        # Single pass over the message; each keyword counts once, as whole words only
+        matched_keywords = set(self._emotion_pattern.findall(user_message.lower()))
+        for keyword in matched_keywords:
+            for emotion_type in self._emotion_keyword_types[keyword]:
+                detected_emotions.append(emotion_type)
+                emotion_score += 1
         
         # Check for excessive punctuation (indicating frustration)
         exclamation_count = user_message.count('!')
         question_count = user_message.count('?')
-        caps_ratio = sum(1 for c in user_message if c.isupper()) / len(user_message) if user_message else 0
+        caps_ratio = uppercase_count(user_message) / len(user_message) if user_message else 0
         
         if exclamation_count > 2 or caps_ratio > 0.5:
             detected_emotions.append('frustrated')
@@ -109,6 +598,10 @@ class AIService:
             'sentiment': 'negative' if emotion_score > 0 else 'neutral'
         }
     
+    def analyze_emotions(self, user_messages: List[str]) -> List[Dict[str, Any]]:
+        """Analyze emotion for a batch of messages"""
+        return [self.analyze_emotion(message) for message in user_messages]
+    
     def generate_human_transfer_response(self, emotion_analysis: Dict[str, Any]) -> str:
         """Generate appropriate response for human transfer"""
         base_message = "I understand your concern and I want to make sure you get the best possible help. "
@@ -121,79 +614,721 @@ class AIService:
         
         return base_message + "I'm arranging for a human representative to assist you. They will be with you shortly."
     
-    def generate_ai_response(self, user_question: str, context_faqs: List[str] = None) -> str:
-        """Generate intelligent response using OpenAI"""
-        if not self.openai_api_key:
-            return "AI service is temporarily unavailable. Please contact administrator to configure API key."
+    def _get_openai_client(self) -> openai.OpenAI:
+        """Return the pooled OpenAI client for this worker process
         
-        try:
-            # Build context
-            context = ""
-            if context_faqs:
-                context = "\n\nRelevant FAQ information:\n" + "\n".join(context_faqs)
-            
-            # Build prompt
-            system_prompt = """
-You are a professional enterprise internal AI customer service assistant. Please provide accurate and helpful answers based on user questions and provided FAQ information.
-
-Answer requirements:
-1. If there is relevant information in the FAQ, prioritize using FAQ content to answer
-2. If there is no complete match in the FAQ, provide reasonable suggestions based on common sense and professional knowledge
-3. Answers should be concise and clear, with a friendly and professional tone
-4. If the answer cannot be determined, suggest users contact relevant departments
-5. Answer in English
-            """
-            
-            user_prompt = f"User question: {user_question}{context}"
-            
-            # Use new OpenAI API syntax while keeping the required configuration
-            client = openai.OpenAI(
+        The client and its HTTP connection pool are reused across requests so
+        keep-alive connections (and their TLS sessions) survive between LLM
+        calls. A forked worker gets its own client instead of the parent's.
+        """
+        with self._client_lock:
+            if self._openai_client is None or self._client_pid != os.getpid():
+                timeout = httpx.Timeout(self.http_read_timeout, connect=self.http_connect_timeout)
+                self._http_client = openai.DefaultHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=self.http_max_connections,
+                        max_keepalive_connections=self.http_max_keepalive,
+                        keepalive_expiry=self.http_keepalive_expiry
+                    ),
+                    timeout=timeout
+                )
+                self._openai_client = openai.OpenAI(
+                    api_key=self.openai_api_key,
+                    base_url=self.openai_base_url,
+                    http_client=self._http_client,
+                    timeout=timeout,
+                    max_retries=self.ai_max_retries
+                )
+                self._client_pid = os.getpid()
+            return self._openai_client
+    
+    def _get_async_openai_client(self) -> openai.AsyncOpenAI:
+        """Return the pooled AsyncOpenAI client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._async_openai_client is None or self._async_client_loop is not loop:
+            timeout = httpx.Timeout(self.http_read_timeout, connect=self.http_connect_timeout)
+            self._async_openai_client = openai.AsyncOpenAI(
                 api_key=self.openai_api_key,
-                base_url="https://api.chatanywhere.tech/v1"
+                base_url=self.openai_base_url,
+                http_client=openai.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=self.async_http_max_connections,
+                        max_keepalive_connections=self.http_max_keepalive,
+                        keepalive_expiry=self.http_keepalive_expiry
+                    ),
+                    timeout=timeout
+                ),
+                timeout=timeout,
+                max_retries=self.ai_max_retries
             )
+            self._async_client_loop = loop
+        return self._async_openai_client
+    
+    def close_llm_clients(self):
+        """Close the pooled LLM client and the hedging threads of this process
+        
+        Called before forking (after a cache warm-up in the gunicorn master), so
+        workers neither inherit open LLM connections nor a thread pool whose
+        threads did not survive the fork; both are recreated on next use.
+        """
+        with self._client_lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            self._openai_client = None
+            self._http_client = None
+            self._client_pid = None
+            hedge_executor, self._hedge_executor = self._hedge_executor, None
+        
+        if hedge_executor is not None:
+            hedge_executor.shutdown(wait=True)
+    
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        """Return the threads running hedged LLM calls, created once like the pooled client"""
+        with self._client_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=2 * self.http_max_connections, thread_name_prefix='llm-hedge'
+                )
+            return self._hedge_executor
+    
+    def get_llm_pool_stats(self) -> Dict[str, Any]:
+        """LLM call counters of both connection pools, plus the state of each pool
+        
+        Top-level counters add up both pools. Per pool, 'queued' counts its
+        in-flight calls beyond its own max_connections, i.e. calls waiting for a
+        pooled connection to become free.
+        """
+        with self._llm_stats_lock:
+            pools = {pool: dict(stats) for pool, stats in self._llm_stats.items()}
+        
+        limits = {'sync': self.http_max_connections, 'async': self.async_http_max_connections}
+        # httpx keeps its pool on the transport; only report it when present
+        http_clients = {
+            'sync': self._http_client if self._client_pid == os.getpid() else None,
+            'async': getattr(self._async_openai_client, '_client', None)
+        }
+        for pool, stats in pools.items():
+            completed = stats['requests'] - stats['in_flight']
+            stats['avg_latency_ms'] = round(stats.pop('total_latency_ms') / completed, 1) if completed else 0.0
+            stats['max_connections'] = limits[pool]
+            stats['max_keepalive_connections'] = self.http_max_keepalive
+            stats['queued'] = max(0, stats['in_flight'] - limits[pool])
             
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=500,
-                temperature=0.7
+            connection_pool = getattr(getattr(http_clients[pool], '_transport', None), '_pool', None)
+            connections = list(connection_pool.connections) if connection_pool is not None else []
+            stats['open_connections'] = len(connections)
+            stats['idle_connections'] = sum(1 for connection in connections if connection.is_idle())
+        
+        totals = {key: sum(stats[key] for stats in pools.values()) for key in ('requests', 'failures', 'in_flight', 'queued')}
+        totals['pools'] = pools
+        return totals
+    
+    def _build_messages(self, user_question: str, context_faqs: List[str] = None) -> List[Dict[str, str]]:
+        """Build the chat completion messages for a question and its FAQ context"""
+        return self.prompt_builder.build_messages(user_question, context_faqs)
+    
+    @contextmanager
+    def _track_llm_call(self, messages: List[Dict[str, str]], pool: str = 'sync'):
+        """Count an LLM call in the statistics of its connection pool for as long as it is in flight
+        
+        Yields the call's prompt record: the locally estimated prompt tokens, to
+        which the caller adds the API-reported 'prompt_tokens' if available.
+        Completed calls are kept with their latency for get_prompt_stats().
+        """
+        stats = self._llm_stats[pool]
+        with self._llm_stats_lock:
+            stats['requests'] += 1
+            stats['in_flight'] += 1
+            stats['peak_in_flight'] = max(stats['peak_in_flight'], stats['in_flight'])
+        
+        record = {'estimated_prompt_tokens': estimate_message_tokens(messages), 'prompt_tokens': None}
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception:
+            with self._llm_stats_lock:
+                stats['failures'] += 1
+            raise
+        else:
+            record['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            self._prompt_records.append(record)
+        finally:
+            with self._llm_stats_lock:
+                stats['in_flight'] -= 1
+                stats['total_latency_ms'] += (time.perf_counter() - started) * 1000
+    
+    @staticmethod
+    def _record_usage(record: Dict[str, Any], response):
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            record['prompt_tokens'] = usage.prompt_tokens
+    
+    def _generate_completion(self, user_question: str, context_faqs: List[str] = None) -> str:
+        """Call the LLM through the pooled client; raises on failure"""
+        messages = self._build_messages(user_question, context_faqs)
+        with self._track_llm_call(messages) as record:
+            response = self._get_openai_client().chat.completions.create(
+                model=self.ai_model,
+                messages=messages,
+                max_tokens=self.ai_max_tokens,
+                temperature=self.ai_temperature
             )
-            
+            self._record_usage(record, response)
+            return response.choices[0].message.content.strip()
+    
+    async def _generate_completion_async(self, user_question: str, context_faqs: List[str] = None) -> str:
+        """Async _generate_completion() through the pooled AsyncOpenAI client"""
+        messages = self._build_messages(user_question, context_faqs)
+        with self._track_llm_call(messages, 'async') as record:
+            response = await self._get_async_openai_client().chat.completions.create(
+                model=self.ai_model,
+                messages=messages,
+                max_tokens=self.ai_max_tokens,
+                temperature=self.ai_temperature
+            )
+            self._record_usage(record, response)
             return response.choices[0].message.content.strip()
+    
+    def _stream_completion(self, user_question: str, context_faqs: List[str] = None) -> Iterator[str]:
+        """Stream LLM output as text deltas through the pooled client; raises on failure"""
+        messages = self._build_messages(user_question, context_faqs)
+        with self._track_llm_call(messages):
+            stream = self._get_openai_client().chat.completions.create(
+                model=self.ai_model,
+                messages=messages,
+                max_tokens=self.ai_max_tokens,
+                temperature=self.ai_temperature,
+                stream=True
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+    
+    def generate_ai_response(self, user_question: str, context_faqs: List[str] = None) -> str:
+        """Generate intelligent response using OpenAI"""
+        if not self.openai_api_key:
+            return "AI service is temporarily unavailable. Please contact administrator to configure API key."
+        
+        try:
+            return self._resilient_completion(user_question, context_faqs)
             
         except Exception as e:
-            print(f"OpenAI API call failed: {e}")
+            return self._llm_failure_response(e)
+    
+    def _llm_failure_response(self, error: Exception) -> str:
+        """Log a failed LLM call and return the fallback answer"""
+        if not isinstance(error, CircuitOpenError):
+            print(f"OpenAI API call failed: {error}")
             print(f"API Key configured: {'Yes' if self.openai_api_key else 'No'}")
-            print(f"Error type: {type(e).__name__}")
-            print(f"Error details: {str(e)}")
-            return "Sorry, AI service is temporarily unavailable. Please try again later or contact technical support."
+            print(f"Error type: {type(error).__name__}")
+            print(f"Error details: {str(error)}")
+        return "Sorry, AI service is temporarily unavailable. Please try again later or contact technical support."
+    
+    def _hedge_delay(self) -> float:
+        """Seconds to wait before hedging, or None while hedging is off or latency is unknown"""
+        if not self.hedge_enabled:
+            return None
+        
+        p95 = self.llm_latency.percentile(self.hedge_percentile)
+        if p95 is None:
+            return None
+        return max(p95, self.hedge_min_delay_ms) / 1000
+    
+    def _record_llm_outcome(self, started: float, hedged: bool):
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.llm_breaker.record_success(latency_ms)
+        self.llm_latency.add(latency_ms)
+        if hedged:
+            with self._llm_stats_lock:
+                self._hedged_requests += 1
     
-    def smart_answer(self, user_question: str, faqs: List[FAQ]) -> Dict[str, Any]:
-        """Main intelligent answer function with emotion analysis"""
+    def _resilient_completion(self, user_question: str, context_faqs: List[str] = None) -> str:
+        """_generate_completion() behind the circuit breaker, hedged when enabled
+        
+        Raises CircuitOpenError without calling the LLM while the circuit is open.
+        """
+        if not self.llm_breaker.allow_request():
+            raise CircuitOpenError("LLM circuit breaker is open")
+        
+        started = time.perf_counter()
+        hedge_delay = self._hedge_delay()
+        try:
+            if hedge_delay is None:
+                answer, hedged = self._generate_completion(user_question, context_faqs), False
+            else:
+                answer, hedged = hedged_call(
+                    lambda: self._generate_completion(user_question, context_faqs),
+                    hedge_delay, self._get_hedge_executor()
+                )
+        except Exception:
+            self.llm_breaker.record_failure()
+            raise
+        except BaseException:
+            # Interrupted rather than failed: give back a half-open probe slot
+            self.llm_breaker.release()
+            raise
+        
+        self._record_llm_outcome(started, hedged)
+        return answer
+    
+    async def _resilient_completion_async(self, user_question: str, context_faqs: List[str] = None) -> str:
+        """Async _resilient_completion()"""
+        if not self.llm_breaker.allow_request():
+            raise CircuitOpenError("LLM circuit breaker is open")
+        
+        started = time.perf_counter()
+        hedge_delay = self._hedge_delay()
+        try:
+            if hedge_delay is None:
+                answer, hedged = await self._generate_completion_async(user_question, context_faqs), False
+            else:
+                answer, hedged = await hedged_call_async(
+                    lambda: self._generate_completion_async(user_question, context_faqs), hedge_delay
+                )
+        except Exception:
+            self.llm_breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled (e.g. the client disconnected): not an LLM failure
+            self.llm_breaker.release()
+            raise
+        
+        self._record_llm_outcome(started, hedged)
+        return answer
+    
+    def get_prompt_stats(self) -> Dict[str, Any]:
+        """Prompt sizes of recent LLM calls and how they relate to latency
+        
+        prompt_tokens are the API-reported counts where available, else the local
+        estimate; estimate_ratio (reported / estimated) shows how far off the
+        estimate runs for this model.
+        """
+        records = list(self._prompt_records)
+        stats = self.prompt_builder.get_stats()
+        stats['samples'] = len(records)
+        if not records:
+            return stats
+        
+        tokens = np.array([record['prompt_tokens'] or record['estimated_prompt_tokens'] for record in records], dtype=float)
+        latencies = np.array([record['latency_ms'] for record in records], dtype=float)
+        reported = [(record['prompt_tokens'], record['estimated_prompt_tokens'])
+                    for record in records if record['prompt_tokens']]
+        
+        stats['avg_prompt_tokens'] = round(float(tokens.mean()), 1)
+        stats['p95_prompt_tokens'] = round(float(np.percentile(tokens, 95)), 1)
+        stats['avg_latency_ms'] = round(float(latencies.mean()), 1)
+        stats['token_latency_correlation'] = (
+            round(float(np.corrcoef(tokens, latencies)[0, 1]), 3)
+            if len(records) >= 3 and tokens.std() > 0 and latencies.std() > 0 else None
+        )
+        stats['estimate_ratio'] = (
+            round(sum(actual for actual, _ in reported) / sum(estimated for _, estimated in reported), 3)
+            if reported else None
+        )
+        stats['recent'] = records[-10:]
+        return stats
+    
+    def get_llm_resilience_stats(self) -> Dict[str, Any]:
+        """Circuit breaker state and hedging counters"""
+        with self._llm_stats_lock:
+            hedged_requests = self._hedged_requests
+        p95 = self.llm_latency.percentile(95)
+        return {
+            'breaker': self.llm_breaker.get_stats(),
+            'hedge_enabled': self.hedge_enabled,
+            'hedged_requests': hedged_requests,
+            'single_flight': self.llm_flights.get_stats(),
+            'latency_p95_ms': round(p95, 1) if p95 is not None else None
+        }
+    
+    def _lookup_cached_answer(self, user_question: str, context_hits: List[Dict[str, Any]],
+                              user_vector: QuestionVectors = None) -> tuple:
+        """Look up the exact and semantic answer caches
+        
+        Returns:
+            (cached answer or None, cache entry to pass to _store_answer)
+        """
+        context_key = tuple((hit['id'], hit['revision']) for hit in context_hits)
+        cache_key = self.answer_cache.make_key(user_question, context_key)
+        
+        # A question sharing no terms with the FAQ vocabulary has no meaningful neighbours
+        if user_vector is not None and user_vector.vectors.nnz == 0:
+            user_vector = None
+        
+        cache_entry = (cache_key, context_key, user_vector, [hit['id'] for hit in context_hits])
+        
+        cached_answer = self.answer_cache.get(cache_key)
+        if cached_answer is None and user_vector is not None:
+            cached_answer = self.semantic_cache.get(user_vector.vectors, context_key, user_vector.vector_generation)
+        return cached_answer, cache_entry
+    
+    def _store_answer(self, cache_entry: tuple, answer: str):
+        """Store a successful LLM answer in the exact and semantic caches"""
+        cache_key, context_key, user_vector, faq_ids = cache_entry
+        self.answer_cache.put(cache_key, answer, faq_ids)
+        if user_vector is not None:
+            self.semantic_cache.put(user_vector.vectors, context_key, answer, faq_ids, user_vector.vector_generation)
+    
+    def _llm_answer(self, user_question: str, similar_faq: Dict[str, Any], context_hits: List[Dict[str, Any]],
+                    emotion_analysis: Dict[str, Any], user_vector=None) -> Dict[str, Any]:
+        """Answer from the exact or semantic answer cache, calling the LLM only on a miss
+        
+        Args:
+            user_question: User question
+            similar_faq: Best FAQ match below the high-confidence threshold, if any
+            context_hits: Retrieval hits used as LLM context
+            emotion_analysis: Result of analyze_emotion()
+            user_vector: Tagged TF-IDF vector of the question, enables the semantic cache
+        """
+        cached_answer, cache_entry = self._lookup_cached_answer(user_question, context_hits, user_vector)
+        if cached_answer is not None:
+            return self._ai_result(cached_answer, similar_faq, emotion_analysis, True)
+        
+        if not self.openai_api_key:
+            return self._ai_result(self.generate_ai_response(user_question), similar_faq, emotion_analysis, False)
+        
+        context_faqs = self.prompt_builder.context_faqs(user_question, context_hits)
+        
+        def complete():
+            answer = self._resilient_completion(user_question, context_faqs)
+            # Only successful completions are cached, never the fallback message
+            self._store_answer(cache_entry, answer)
+            return answer
+        
+        # Concurrent duplicates (same normalized question and context) wait for the first caller's call
+        try:
+            answer, shared = self.llm_flights.do(cache_entry[0], complete)
+        except Exception as e:
+            return self._degraded_result(user_question, similar_faq, context_hits, emotion_analysis, e)
+        
+        return self._ai_result(answer, similar_faq, emotion_analysis, False, coalesced=shared)
+    
+    async def _llm_answer_async(self, user_question: str, similar_faq: Dict[str, Any],
+                                context_hits: List[Dict[str, Any]], emotion_analysis: Dict[str, Any],
+                                user_vector=None) -> Dict[str, Any]:
+        """Async _llm_answer()"""
+        cached_answer, cache_entry = self._lookup_cached_answer(user_question, context_hits, user_vector)
+        if cached_answer is not None:
+            return self._ai_result(cached_answer, similar_faq, emotion_analysis, True)
+        
+        if not self.openai_api_key:
+            return self._ai_result(self.generate_ai_response(user_question), similar_faq, emotion_analysis, False)
+        
+        context_faqs = self.prompt_builder.context_faqs(user_question, context_hits)
+        
+        async def complete():
+            answer = await self._resilient_completion_async(user_question, context_faqs)
+            self._store_answer(cache_entry, answer)
+            return answer
+        
+        try:
+            answer, shared = await self.llm_flights.do_async(cache_entry[0], complete)
+        except Exception as e:
+            return self._degraded_result(user_question, similar_faq, context_hits, emotion_analysis, e)
+        
+        return self._ai_result(answer, similar_faq, emotion_analysis, False, coalesced=shared)
+    
+    def _degraded_result(self, user_question: str, similar_faq: Dict[str, Any], context_hits: List[Dict[str, Any]],
+                         emotion_analysis: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """Answer without the LLM (circuit open or call failed)
+        
+        Serves the best FAQ match if there is one, otherwise the context sentences
+        that share the most terms with the question, otherwise the fallback message.
+        """
+        fallback = self._llm_failure_response(error)
+        
+        if similar_faq:
+            answer, source = similar_faq['answer'], 'faq_fallback'
+        else:
+            answer, source = self._extractive_answer(user_question, context_hits), 'extractive'
+        
+        if not answer:
+            return self._ai_result(fallback, similar_faq, emotion_analysis, False)
+        
+        answer = "Our AI assistant is temporarily unavailable, but this information from our FAQ may help:\n\n" + answer
+        if emotion_analysis['sentiment'] == 'negative':
+            answer = FAQ_EMPATHY_PREFIX + answer + FAQ_EMPATHY_SUFFIX
+        
+        return {
+            'answer': answer,
+            'source': source,
+            'confidence': 'medium' if similar_faq else 'low',
+            'similarity': similar_faq['similarity'] if similar_faq else 0.0,
+            'emotion_analysis': emotion_analysis,
+            'requires_human': False,
+            'cached': False,
+            'coalesced': False
+        }
+    
+    @staticmethod
+    def _extractive_answer(user_question: str, context_hits: List[Dict[str, Any]], max_sentences: int = 2) -> str:
+        """Pick the context FAQ sentences that share the most keywords with the question"""
+        terms = set(keyword_service.extract_keywords(user_question))
+        if not terms:
+            return ''
+        
+        scored = []
+        for hit_rank, hit in enumerate(context_hits):
+            for sentence_rank, sentence in enumerate(re.split(r'(?<=[.!?])\s+', hit['answer'])):
+                overlap = len(terms.intersection(keyword_service.extract_keywords(sentence)))
+                if overlap:
+                    scored.append((-overlap, hit_rank, sentence_rank, sentence.strip()))
+        
+        best = sorted(scored)[:max_sentences]
+        # Keep the selected sentences in their original reading order
+        return ' '.join(sentence for _, _, _, sentence in sorted(best, key=lambda item: item[1:3]))
+    
+    def smart_answer(self, user_question: str, faqs: List[FAQ] = None) -> Dict[str, Any]:
+        """Main intelligent answer function with emotion analysis
+        
+        Callers that track the corpus revision call sync_corpus() first and
+        omit faqs; passing an explicit FAQ list refits whenever its content changes.
+        """
         # First, analyze user emotion
         emotion_analysis = self.analyze_emotion(user_question)
         
         # If user needs human assistance, prioritize human transfer
         if emotion_analysis['needs_human']:
-            human_response = self.generate_human_transfer_response(emotion_analysis)
-            return {
-                'answer': human_response,
-                'source': 'human_transfer',
-                'confidence': 'high',
-                'similarity': 0.0,
-                'emotion_analysis': emotion_analysis,
-                'requires_human': True
-            }
+            return self._human_transfer_result(emotion_analysis)
         
         # Update FAQ vectors (if needed)
-        if self.faq_vectors is None or len(self.faq_questions) != len(faqs):
-            self.update_faq_vectors(faqs)
+        if faqs is not None:
+            self.sync_corpus(self.corpus_fingerprint(faqs), lambda: faqs)
+        
+        # Copy-pasted FAQ questions are answered from the hash index without vectorizing
+        exact_result = self._exact_match_result(user_question, emotion_analysis)
+        if exact_result is not None:
+            return exact_result
+        
+        # Retrieve once; the best hit decides the FAQ match and all hits feed the LLM context
+        user_vector, hits = self._retrieve_with_vector(user_question)
+        return self._answer_from_hits(user_question, emotion_analysis, hits, user_vector=user_vector)
+    
+    async def smart_answer_async(self, user_question: str) -> Dict[str, Any]:
+        """Async smart_answer() for the ASGI chat path
         
-        # Try semantic matching
-        similar_faq = self.find_similar_faq(user_question)
+        Emotion analysis, retrieval and cache lookups are in-memory and run
+        inline; only the LLM call is awaited, so one event loop can carry many
+        concurrent chats. Call sync_corpus() (off the loop) beforehand.
+        """
+        emotion_analysis = self.analyze_emotion(user_question)
+        if emotion_analysis['needs_human']:
+            return self._human_transfer_result(emotion_analysis)
+        
+        exact_result = self._exact_match_result(user_question, emotion_analysis)
+        if exact_result is not None:
+            return exact_result
+        
+        user_vector, hits = self._retrieve_with_vector(user_question)
+        similar_faq = self._best_match(hits)
+        if similar_faq and similar_faq['confidence'] == 'high':
+            return self._answer_from_hits(user_question, emotion_analysis, hits, user_vector=user_vector)
+        
+        return await self._llm_answer_async(
+            user_question, similar_faq, self._context_hits(hits), emotion_analysis, user_vector
+        )
+    
+    def _retrieve_with_vector(self, user_question: str, k: int = 3) -> tuple:
+        """retrieve() that also returns the tagged question vector (None if no index)"""
+        snapshot = self._snapshot
+        if not snapshot.has_index():
+            return None, []
+        
+        user_vector = self._vectorize([user_question], snapshot)
+        return snapshot.tag(user_vector), self._retrieve_vector(user_question, user_vector, k, snapshot)
+    
+    def stream_answer(self, user_question: str) -> Iterator[Dict[str, Any]]:
+        """Streaming variant of smart_answer()
+        
+        Yields events as dicts with 'event' and 'data' keys:
+            meta  - source, confidence, similarity, emotion_analysis, requires_human
+            token - {'text': ...}; FAQ, transfer and cached answers arrive as one token
+            done  - {'answer': full answer text}
+        """
+        emotion_analysis = self.analyze_emotion(user_question)
+        
+        if emotion_analysis['needs_human']:
+            yield from self._stream_result(self._human_transfer_result(emotion_analysis))
+            return
+        
+        exact_result = self._exact_match_result(user_question, emotion_analysis)
+        if exact_result is not None:
+            yield from self._stream_result(exact_result)
+            return
+        
+        user_vector, hits = self._retrieve_with_vector(user_question)
+        similar_faq = self._best_match(hits)
+        context_hits = self._context_hits(hits)
+        
+        # FAQ matches and cached answers are flushed immediately
+        if (similar_faq and similar_faq['confidence'] == 'high') or not self.openai_api_key:
+            yield from self._stream_result(self._answer_from_hits(user_question, emotion_analysis, hits, user_vector=user_vector))
+            return
+        
+        cached_answer, cache_entry = self._lookup_cached_answer(user_question, context_hits, user_vector)
+        if cached_answer is not None:
+            yield from self._stream_result(self._ai_result(cached_answer, similar_faq, emotion_analysis, True))
+            return
+        
+        # Wait for the first token before committing to an LLM answer, so an open
+        # circuit or a failed call can still fall back to a FAQ-based answer
+        context_faqs = self.prompt_builder.context_faqs(user_question, context_hits)
+        if not self.llm_breaker.allow_request():
+            error = CircuitOpenError("LLM circuit breaker is open")
+            yield from self._stream_result(self._degraded_result(user_question, similar_faq, context_hits, emotion_analysis, error))
+            return
+        
+        # From here on the call ends in a recorded success or failure, or - when the
+        # client disconnects (GeneratorExit at a yield) - in a release of the breaker
+        started = time.perf_counter()
+        tokens = None
+        outcome_recorded = False
+        try:
+            try:
+                tokens = self._stream_completion(user_question, context_faqs)
+                first_text = next(tokens, '')
+            except Exception as e:
+                self.llm_breaker.record_failure()
+                outcome_recorded = True
+                yield from self._stream_result(self._degraded_result(user_question, similar_faq, context_hits, emotion_analysis, e))
+                return
+            
+            negative = emotion_analysis['sentiment'] == 'negative'
+            meta = self._ai_result('', similar_faq, emotion_analysis, False)
+            del meta['answer']
+            yield {'event': 'meta', 'data': meta}
+            
+            if negative:
+                yield {'event': 'token', 'data': {'text': AI_EMPATHY_PREFIX}}
+            
+            parts = [first_text]
+            yield {'event': 'token', 'data': {'text': first_text}}
+            try:
+                for text in tokens:
+                    parts.append(text)
+                    yield {'event': 'token', 'data': {'text': text}}
+            except Exception as e:
+                self.llm_breaker.record_failure()
+                outcome_recorded = True
+                self._llm_failure_response(e)
+                yield {'event': 'error', 'data': {'message': 'AI response was interrupted'}}
+            else:
+                self._record_llm_outcome(started, False)
+                outcome_recorded = True
+                self._store_answer(cache_entry, ''.join(parts).strip())
+        finally:
+            if not outcome_recorded:
+                self.llm_breaker.release()
+            if tokens is not None:
+                # Closes the HTTP stream of an abandoned response
+                tokens.close()
+        
+        if negative:
+            yield {'event': 'token', 'data': {'text': AI_EMPATHY_SUFFIX}}
+        
+        answer = ''.join(parts).strip()
+        if negative:
+            answer = AI_EMPATHY_PREFIX + answer + AI_EMPATHY_SUFFIX
+        yield {'event': 'done', 'data': {'answer': answer}}
+    
+    def _stream_result(self, result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Emit a complete smart_answer result as meta, one token and done events"""
+        meta = {key: value for key, value in result.items() if key != 'answer'}
+        yield {'event': 'meta', 'data': meta}
+        yield {'event': 'token', 'data': {'text': result['answer']}}
+        yield {'event': 'done', 'data': {'answer': result['answer']}}
+    
+    def smart_answer_batch(self, user_questions: List[str], use_ai: bool = False,
+                           llm_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """Answer many questions with one vectorization and one similarity product
+        
+        Args:
+            user_questions: Questions to answer, in order
+            use_ai: If True, questions without a high-confidence FAQ match are
+                    answered by the LLM; otherwise they are returned unanswered
+            llm_concurrency: LLM calls of the batch in flight at once
+            
+        Returns:
+            One smart_answer-style result per question, in the same order
+        """
+        emotion_analyses = self.analyze_emotions(user_questions)
+        
+        # Only questions that are neither transferred to a human nor exact FAQ matches need retrieval
+        exact_results = {}
+        for i, analysis in enumerate(emotion_analyses):
+            if not analysis['needs_human']:
+                exact_result = self._exact_match_result(user_questions[i], analysis)
+                if exact_result is not None:
+                    exact_results[i] = exact_result
+        pending = [i for i, analysis in enumerate(emotion_analyses)
+                   if not analysis['needs_human'] and i not in exact_results]
+        question_vectors, pending_hits = self._retrieve_batch_with_vectors([user_questions[i] for i in pending], k=3)
+        position_by_question = {i: position for position, i in enumerate(pending)}
+        
+        results = []
+        llm_questions = []
+        for i, user_question in enumerate(user_questions):
+            if i in exact_results:
+                results.append(exact_results[i])
+                continue
+            if i not in position_by_question:
+                results.append(self._human_transfer_result(emotion_analyses[i]))
+                continue
+            
+            position = position_by_question[i]
+            user_vector = question_vectors.row(position) if question_vectors is not None else None
+            result = self._answer_from_hits(user_question, emotion_analyses[i], pending_hits[position], False, user_vector)
+            if use_ai and result['source'] == 'unanswered':
+                llm_questions.append((i, pending_hits[position], user_vector))
+            results.append(result)
+        
+        if llm_questions:
+            # LLM calls run side by side, but never take more than llm_concurrency pooled connections
+            with ThreadPoolExecutor(max_workers=max(1, min(llm_concurrency, len(llm_questions))),
+                                    thread_name_prefix='batch-llm') as executor:
+                futures = [
+                    (i, executor.submit(self._answer_from_hits, user_questions[i], emotion_analyses[i], hits,
+                                        True, user_vector))
+                    for i, hits, user_vector in llm_questions
+                ]
+                for i, future in futures:
+                    results[i] = future.result()
+        return results
+    
+    def _human_transfer_result(self, emotion_analysis: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'answer': self.generate_human_transfer_response(emotion_analysis),
+            'source': 'human_transfer',
+            'confidence': 'high',
+            'similarity': 0.0,
+            'emotion_analysis': emotion_analysis,
+            'requires_human': True
+        }
+    
+    def _exact_match_result(self, user_question: str, emotion_analysis: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """FAQ answer for a question equal to a FAQ question up to case, punctuation and whitespace"""
+        snapshot = self._snapshot
+        row = snapshot.exact_match_row(user_question)
+        if row is None:
+            return None
+        
+        answer = snapshot.faq_answers[row]
+        if emotion_analysis['sentiment'] == 'negative':
+            answer = FAQ_EMPATHY_PREFIX + answer + FAQ_EMPATHY_SUFFIX
+        
+        return {
+            'answer': answer,
+            'source': 'faq_exact_match',
+            'confidence': 'high',
+            'similarity': 1.0,
+            'emotion_analysis': emotion_analysis,
+            'requires_human': False
+        }
+    
+    def _answer_from_hits(self, user_question: str, emotion_analysis: Dict[str, Any],
+                          hits: List[Dict[str, Any]], use_ai: bool = True, user_vector=None) -> Dict[str, Any]:
+        """Answer from retrieval hits: FAQ answer on a high-confidence match, LLM otherwise"""
+        similar_faq = self._best_match(hits)
         
         if similar_faq and similar_faq['confidence'] == 'high':
             # High confidence match, return FAQ answer directly
@@ -201,7 +1336,7 @@ Answer requirements:
             
             # Add empathetic response if negative emotion detected
             if emotion_analysis['sentiment'] == 'negative':
-                answer = "I understand this might be frustrating. " + answer + "\n\nIf you need further assistance, please let me know and I can connect you with a human representative."
+                answer = FAQ_EMPATHY_PREFIX + answer + FAQ_EMPATHY_SUFFIX
             
             return {
                 'answer': answer,
@@ -212,27 +1347,29 @@ Answer requirements:
                 'requires_human': False
             }
         
-        # Medium confidence or no match, use AI to generate answer
-        context_faqs = []
-        if similar_faq:
-            context_faqs.append(f"Q: {similar_faq['question']}\nA: {similar_faq['answer']}")
-        
-        # Add other relevant FAQs as context
-        if self.faq_vectors is not None:
-            user_vector = self.vectorizer.transform([user_question])
-            similarities = cosine_similarity(user_vector, self.faq_vectors)[0]
-            
-            # Get top 3 most similar FAQs as context
-            top_indices = np.argsort(similarities)[-3:][::-1]
-            for idx in top_indices:
-                if similarities[idx] > 0.1:  # Minimum relevance threshold
-                    context_faqs.append(f"Q: {self.faq_questions[idx]}\nA: {self.faq_answers[idx]}")
+        if not use_ai:
+            return {
+                'answer': None,
+                'source': 'unanswered',
+                'confidence': 'medium' if similar_faq else 'low',
+                'similarity': similar_faq['similarity'] if similar_faq else 0.0,
+                'emotion_analysis': emotion_analysis,
+                'requires_human': False
+            }
         
-        ai_answer = self.generate_ai_response(user_question, context_faqs[:3])  # Limit context length
+        # Medium confidence or no match, use AI to generate answer
+        return self._llm_answer(user_question, similar_faq, self._context_hits(hits), emotion_analysis, user_vector)
+    
+    def _ai_result(self, ai_answer: str, similar_faq: Dict[str, Any], emotion_analysis: Dict[str, Any],
+                   cached: bool, coalesced: bool = False) -> Dict[str, Any]:
+        """Build the smart_answer result for an LLM (or cached LLM) answer
         
+        cached marks answers served from the answer caches; coalesced marks answers
+        shared from an identical question's LLM call that was already in flight.
+        """
         # Add empathetic response if negative emotion detected
         if emotion_analysis['sentiment'] == 'negative':
-            ai_answer = "I understand your concern. " + ai_answer + "\n\nIf this doesn't fully address your issue, I can connect you with a human representative for more personalized assistance."
+            ai_answer = AI_EMPATHY_PREFIX + ai_answer + AI_EMPATHY_SUFFIX
         
         return {
             'answer': ai_answer,
@@ -240,7 +1377,9 @@ Answer requirements:
             'confidence': 'medium' if similar_faq else 'low',
             'similarity': similar_faq['similarity'] if similar_faq else 0.0,
             'emotion_analysis': emotion_analysis,
-            'requires_human': False
+            'requires_human': False,
+            'cached': cached,
+            'coalesced': coalesced
         }
 
 # Global AI service instance
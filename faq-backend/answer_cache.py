@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM answer caches
+AnswerCache keeps generated answers keyed by the normalized question and the FAQ
+context (ids and revisions) they were generated from, with LRU and TTL eviction.
+SemanticAnswerCache additionally serves paraphrases of cached questions.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_question(question: str) -> str:
+    """Fold case, punctuation and whitespace so trivially different questions compare equal"""
+    return _WHITESPACE.sub(' ', _PUNCTUATION.sub(' ', question.lower())).strip()
+
+
+class AnswerCache:
+    def __init__(self, max_size: int = 1000, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (answer, expires_at, faq_ids); ordered from least to most recently used
+        self._entries = OrderedDict()
+        # faq_id -> keys of answers generated with that FAQ in the context
+        self._keys_by_faq = {}
+        self._lock = threading.Lock()
+
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    @staticmethod
+    def make_key(question: str, context: Iterable[Tuple[Any, Any]]) -> Tuple[str, Tuple]:
+        """
+        Build a cache key
+
+        Args:
+            question: User question
+            context: (faq_id, revision) pairs of the FAQs used as LLM context, in prompt order
+
+        Returns:
+            Hashable cache key
+        """
+        return normalize_question(question), tuple(context)
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """Return the cached answer, or None on a miss or expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+
+            answer, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return answer
+
+    def put(self, key: Hashable, answer: str, faq_ids: Iterable[Any] = ()):
+        """Store an answer, evicting the least recently used entries beyond max_size"""
+        if self.max_size <= 0:
+            return
+
+        faq_ids = tuple(faq_ids)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (answer, time.monotonic() + self.ttl_seconds, faq_ids)
+            for faq_id in faq_ids:
+                self._keys_by_faq.setdefault(faq_id, set()).add(key)
+
+            while len(self._entries) > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._stats['evictions'] += 1
+
+    def invalidate_faqs(self, faq_ids: Iterable[Any]) -> int:
+        """Drop every answer that used one of the given FAQs as context"""
+        removed = 0
+        with self._lock:
+            for faq_id in faq_ids:
+                for key in list(self._keys_by_faq.get(faq_id, ())):
+                    self._remove(key)
+                    removed += 1
+            self._stats['invalidations'] += removed
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_faq.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+
+        lookups = stats['hits'] + stats['misses']
+        stats['max_size'] = self.max_size
+        stats['ttl_seconds'] = self.ttl_seconds
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _remove(self, key: Hashable):
+        """Remove one entry and its FAQ back-references; caller holds the lock"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+
+        for faq_id in entry[2]:
+            keys = self._keys_by_faq.get(faq_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_faq[faq_id]
+
+
+class SemanticAnswerCache:
+    """
+    Near-duplicate answer cache
+
+    Reuses an answer when a new question's TF-IDF vector is within max_distance
+    (cosine distance) of a cached question that was answered with the same FAQ
+    context. Vectors must be L2-normalized rows from one fitted vectorizer, so the
+    cache is cleared whenever the vectorizer is refit.
+
+    Entries are tagged with the generation of the vector space they belong to.
+    clear(generation) starts a new generation: puts of vectors from another
+    generation (an LLM call that started before the refit) are dropped, and
+    lookups only compare vectors of the same generation.
+    """
+
+    def __init__(self, max_size: int = 500, ttl_seconds: float = 3600, max_distance: float = 0.15):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+
+        # entry_id -> (context_key, vector, answer, expires_at, faq_ids, generation); LRU ordered
+        self._entries = OrderedDict()
+        # context_key -> entry ids answered with that context
+        self._entries_by_context = {}
+        self._next_entry_id = 0
+        # Vector space generation accepted by put() (None = untagged use)
+        self._generation = None
+        self._lock = threading.Lock()
+
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0,
+                       'stale_puts': 0}
+
+    def get(self, vector, context_key: Hashable, generation: Any = None) -> Optional[str]:
+        """Return the answer of the closest cached question with the same context, if close enough"""
+        with self._lock:
+            now = time.monotonic()
+            best_entry_id, best_similarity = None, 1.0 - self.max_distance
+
+            for entry_id in list(self._entries_by_context.get(context_key, ())):
+                _, cached_vector, _, expires_at, _, entry_generation = self._entries[entry_id]
+                if expires_at <= now:
+                    self._remove(entry_id)
+                    self._stats['expirations'] += 1
+                    continue
+                if entry_generation != generation:
+                    continue
+
+                similarity = vector.multiply(cached_vector).sum()
+                if similarity >= best_similarity:
+                    best_entry_id, best_similarity = entry_id, similarity
+
+            if best_entry_id is None:
+                self._stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(best_entry_id)
+            self._stats['hits'] += 1
+            return self._entries[best_entry_id][2]
+
+    def put(self, vector, context_key: Hashable, answer: str, faq_ids: Iterable[Any] = (), generation: Any = None):
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            if generation != self._generation:
+                # Vectorized before the last clear(): not comparable with current questions
+                self._stats['stale_puts'] += 1
+                return
+
+            entry_id = self._next_entry_id
+            self._next_entry_id += 1
+
+            self._entries[entry_id] = (context_key, vector, answer, time.monotonic() + self.ttl_seconds,
+                                       tuple(faq_ids), generation)
+            self._entries_by_context.setdefault(context_key, set()).add(entry_id)
+
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def invalidate_faqs(self, faq_ids: Iterable[Any]) -> int:
+        """Drop every answer that used one of the given FAQs as context"""
+        faq_ids = set(faq_ids)
+        with self._lock:
+            stale = [entry_id for entry_id, entry in self._entries.items() if faq_ids.intersection(entry[4])]
+            for entry_id in stale:
+                self._remove(entry_id)
+            self._stats['invalidations'] += len(stale)
+        return len(stale)
+
+    def clear(self, generation: Any = None):
+        """Drop every entry and accept only vectors of the given generation from now on"""
+        with self._lock:
+            self._entries.clear()
+            self._entries_by_context.clear()
+            self._generation = generation
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+            stats['generation'] = self._generation
+
+        lookups = stats['hits'] + stats['misses']
+        stats['max_size'] = self.max_size
+        stats['max_distance'] = self.max_distance
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _remove(self, entry_id: int):
+        """Remove one entry; caller holds the lock"""
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+
+        context_entries = self._entries_by_context.get(entry[0])
+        if context_entries is not None:
+            context_entries.discard(entry_id)
+            if not context_entries:
+                del self._entries_by_context[entry[0]]
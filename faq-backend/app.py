@@ -3,19 +3,23 @@
 # It includes endpoints to get, add, update, and delete FAQs.
 # Updated for PostgreSQL deployment on Azure
 
-from flask import Flask, jsonify, request, make_response
+from flask import Flask, jsonify, request, make_response, Response, stream_with_context
 from flask_cors import CORS
 from flask import session
 from config import Config
-from models import db, FAQ, Log, Feedback, User, ConversationSession
+from models import db, FAQ, FAQCorpusState, Log, Feedback, User, ConversationSession
 from ai_service import ai_service
 from keyword_service import keyword_service
 from conversation_service import conversation_service
+from reindex_worker import ReindexWorker
+from corpus_listener import CorpusChangeListener, open_listen_connection
+from warm_cache import frequent_questions, warm_caches
 
-from sqlalchemy import func, text
-from sqlalchemy.exc import SQLAlchemyError, OperationalError
+from sqlalchemy import func, text, inspect, insert
+from sqlalchemy.exc import SQLAlchemyError, OperationalError, ProgrammingError
 from datetime import timedelta, datetime
 import os
+import json
 import logging
 
 # Configure logging for Azure deployment
@@ -126,12 +130,38 @@ def init_database():
             
             # Create all tables
             db.create_all()
+            upgrade_faq_table()
             logger.info("Database tables created successfully")
             
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
         raise
 
+def upgrade_faq_table():
+    """Add FAQ revision columns to tables created before they existed (create_all skips them),
+    and create the corpus revision row that FAQCorpusState.bump() updates"""
+    existing_columns = {column['name'] for column in inspect(db.engine).get_columns('faqs')}
+    # Several workers may upgrade the same old table at startup; PostgreSQL skips a column
+    # another worker just added, other databases raise and the column is re-inspected
+    add_column = 'ADD COLUMN IF NOT EXISTS' if db.engine.dialect.name == 'postgresql' else 'ADD COLUMN'
+    upgrades = {
+        'revision': f'ALTER TABLE faqs {add_column} revision INTEGER NOT NULL DEFAULT 1',
+        'updated_at': f'ALTER TABLE faqs {add_column} updated_at TIMESTAMP'
+    }
+    for column, statement in upgrades.items():
+        if column in existing_columns:
+            continue
+        try:
+            db.session.execute(text(statement))
+            db.session.commit()
+            logger.info(f"Added faqs.{column} column")
+        except (OperationalError, ProgrammingError):
+            db.session.rollback()
+            if column not in {existing['name'] for existing in inspect(db.engine).get_columns('faqs')}:
+                raise
+            logger.info(f"faqs.{column} column was added by another worker")
+    FAQCorpusState.ensure_row()
+
 # Initialize database on startup
 try:
     init_database()
@@ -141,6 +171,107 @@ except Exception as e:
     # import sys
     # sys.exit(1)
 
+def sync_faq_index():
+    """Bring the FAQ index up to the current corpus revision; call within an app context
+    
+    An already built incremental index reads only FAQ ids and revisions and
+    loads the FAQs that changed, instead of every FAQ.
+    """
+    ai_service.sync_corpus(FAQCorpusState.current_revision(), lambda: FAQ.query.all(),
+                           FAQ.revisions, FAQ.get_many)
+
+def preload_faq_index():
+    """Build the FAQ index in the current process (the gunicorn master with preload_app)
+    
+    Workers forked afterwards inherit the index copy-on-write, so its arrays
+    exist once in physical memory instead of once per worker. Database
+    connections are closed again so no socket is shared across the fork.
+    """
+    with app.app_context():
+        sync_faq_index()
+        db.session.remove()
+        db.engine.dispose()
+    logger.info(f"Preloaded FAQ index at corpus revision {ai_service.corpus_version}")
+
+def warm_answer_caches():
+    """Answer the most frequent recent questions so this process starts with warm caches
+    
+    Run after preload_faq_index() in the gunicorn master: forked workers inherit
+    the warmed caches. LLM connections and threads are closed before returning.
+    """
+    with app.app_context():
+        sync_faq_index()
+        questions = frequent_questions(
+            days=app.config['AI_WARMUP_DAYS'],
+            limit=app.config['AI_WARMUP_QUESTIONS'],
+            min_count=app.config['AI_WARMUP_MIN_COUNT']
+        )
+        db.session.remove()
+        db.engine.dispose()
+    
+    try:
+        stats = warm_caches(
+            [question for question, _ in questions], ai_service,
+            concurrency=app.config['AI_WARMUP_CONCURRENCY'],
+            budget_seconds=app.config['AI_WARMUP_BUDGET_SECONDS']
+        )
+    finally:
+        ai_service.close_llm_clients()
+    logger.info(f"Warmed answer caches: {stats}")
+    return stats
+
+def rebuild_faq_index():
+    """Bring the FAQ index up to the current corpus revision (runs on the reindex worker thread)"""
+    with app.app_context():
+        try:
+            sync_faq_index()
+        finally:
+            db.session.remove()
+
+# FAQ edits are reindexed in the background, debounced so a burst of edits costs one rebuild
+reindex_worker = ReindexWorker(
+    rebuild_faq_index,
+    debounce_seconds=app.config['AI_REINDEX_DEBOUNCE_MS'] / 1000,
+    max_delay_seconds=app.config['AI_REINDEX_MAX_DELAY_MS'] / 1000
+)
+
+def read_corpus_revision():
+    with app.app_context():
+        try:
+            return FAQCorpusState.current_revision()
+        finally:
+            db.session.remove()
+
+def open_corpus_listen_connection():
+    with app.app_context():
+        return open_listen_connection(db.engine, FAQCorpusState.NOTIFY_CHANNEL)
+
+def schedule_reindex_if_stale(revision):
+    if revision != ai_service.corpus_version:
+        reindex_worker.request()
+
+# FAQ edits made through other workers or instances: LISTEN/NOTIFY on PostgreSQL,
+# polling of the revision row elsewhere
+corpus_listener = CorpusChangeListener(
+    read_corpus_revision,
+    schedule_reindex_if_stale,
+    open_connection=open_corpus_listen_connection,
+    poll_seconds=app.config['AI_INDEX_POLL_SECONDS'],
+    check_seconds=app.config['AI_INDEX_NOTIFY_CHECK_SECONDS']
+)
+
+def refresh_faq_index():
+    """Make sure a chat request can be served from the FAQ index
+    
+    Corpus changes are picked up by the corpus listener of this process, so
+    chat requests neither read the corpus revision nor rebuild; they are
+    answered from the current snapshot while a rebuild runs in the background.
+    The index is built inline only when this process has none yet (no preload).
+    """
+    corpus_listener.start()
+    if ai_service.corpus_version is None:
+        sync_faq_index()
+
 # Database connection health check
 def check_db_connection():
     """Check if database connection is healthy"""
@@ -190,7 +321,9 @@ def add_faq():
         if not isinstance(data, list):
             new_faq = FAQ(question=data["question"], answer=data["answer"])
             db.session.add(new_faq)
+            FAQCorpusState.bump()
             db.session.commit()
+            reindex_worker.request()
             return jsonify(new_faq.to_dict()), 201
         # 批量插入
         else:
@@ -200,7 +333,9 @@ def add_faq():
                     new_faq = FAQ(question=item["question"], answer=item["answer"])
                     db.session.add(new_faq)
                     new_faqs.append(new_faq.to_dict())
+            FAQCorpusState.bump()
             db.session.commit()
+            reindex_worker.request()
             return jsonify(new_faqs), 201
 
     except Exception as e:
@@ -222,7 +357,10 @@ def update_faq(faq_id):
     if "answer" in data:
         faq.answer = data["answer"]
 
+    faq.revision = (faq.revision or 0) + 1
+    FAQCorpusState.bump()
     db.session.commit()
+    reindex_worker.request()
     return jsonify(faq.to_dict()), 200
 
 
@@ -232,7 +370,9 @@ def delete_faq(faq_id):
     faq = FAQ.query.get(faq_id)
     if faq:
         db.session.delete(faq)
+        FAQCorpusState.bump()
         db.session.commit()
+        reindex_worker.request()
         return jsonify({"message": "FAQ deleted successfully"}), 200
     return jsonify({"error": "FAQ not found"}), 404
 
@@ -335,6 +475,33 @@ def get_csat():
 
 
 
+def record_chat_question(user_question, session_id):
+    """Log a chat question with keywords, category and session info
+    
+    Returns:
+        bool: Whether the given session is active
+    """
+    # Extract keywords and classification
+    keyword_result = keyword_service.process_question(user_question)
+    
+    # If session_id is provided, verify if session is active
+    session_active = False
+    if session_id:
+        session_active = conversation_service.is_session_active(session_id)
+        if session_active:
+            conversation_service.update_session_activity(session_id)
+    
+    # Log user question with keywords, category and session info
+    log = Log(
+        question=user_question,
+        keywords=keyword_result['keywords_str'],
+        category=keyword_result['category'],
+        session_id=session_id if session_active else None
+    )
+    db.session.add(log)
+    db.session.commit()
+    return session_active
+
 # AI Chat API Endpoint
 @app.route('/api/chat', methods=['POST'])
 def smart_chat():
@@ -346,58 +513,165 @@ def smart_chat():
         return jsonify({'error': 'Question cannot be empty'}), 400
     
     try:
-        # Extract keywords and classification
-        keyword_result = keyword_service.process_question(user_question)
+        session_active = record_chat_question(user_question, session_id)
         
-        # If session_id is provided, verify if session is active
-        session_active = False
-        if session_id:
-            session_active = conversation_service.is_session_active(session_id)
-            if session_active:
-                conversation_service.update_session_activity(session_id)
-        
-        # Log user question with keywords, category and session info
-        log = Log(
-            question=user_question,
-            keywords=keyword_result['keywords_str'],
-            category=keyword_result['category'],
-            session_id=session_id if session_active else None
-        )
-        db.session.add(log)
-        db.session.commit()
-        
-        # Get all FAQs
-        faqs = FAQ.query.all()
+        # FAQ changes are reindexed in the background; never rebuild inside the request
+        refresh_faq_index()
         
         # Use AI service to generate intelligent answer
-        result = ai_service.smart_answer(user_question, faqs)
+        result = ai_service.smart_answer(user_question)
         
-        response_data = {
-            'question': user_question,
-            'answer': result['answer'],
-            'source': result['source'],
-            'confidence': result['confidence'],
-            'similarity': result.get('similarity', 0.0),
-            'emotion_analysis': result.get('emotion_analysis', {}),
-            'requires_human': result.get('requires_human', False)
+        return jsonify(chat_response_data(user_question, result, session_id, session_active)), 200
+        
+    except Exception as e:
+        logger.error(f"Intelligent Chat API Error: {e}")
+        return jsonify(chat_error_data(user_question)), 500
+
+def chat_response_data(user_question, result, session_id, session_active):
+    """Build the /api/chat response body from a smart_answer result"""
+    response_data = {
+        'question': user_question,
+        'answer': result['answer'],
+        'source': result['source'],
+        'confidence': result['confidence'],
+        'similarity': result.get('similarity', 0.0),
+        'emotion_analysis': result.get('emotion_analysis', {}),
+        'requires_human': result.get('requires_human', False)
+    }
+    
+    # If there's an active session, add session information
+    if session_active:
+        response_data['session_id'] = session_id
+        response_data['session_active'] = True
+    
+    return response_data
+
+def chat_error_data(user_question):
+    return {
+        'question': user_question,
+        'answer': 'Sorry, the service is temporarily unavailable. Please try again later.',
+        'source': 'error',
+        'confidence': 'low',
+        'similarity': 0.0
+    }
+
+# Streaming AI Chat API Endpoint (Server-Sent Events)
+# POST takes the same JSON body as /api/chat; GET reads ?question=&session_id= for EventSource clients
+@app.route('/api/chat/stream', methods=['GET', 'POST'])
+def smart_chat_stream():
+    data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    user_question = (data.get('question') or '').strip()
+    session_id = data.get('session_id')
+    
+    if not user_question:
+        return jsonify({'error': 'Question cannot be empty'}), 400
+    
+    try:
+        session_active = record_chat_question(user_question, session_id)
+        refresh_faq_index()
+    except Exception as e:
+        logger.error(f"Streaming Chat API Error: {e}")
+        return jsonify({'error': 'Sorry, the service is temporarily unavailable. Please try again later.'}), 500
+    
+    def generate():
+        try:
+            for event in ai_service.stream_answer(user_question):
+                event_data = event['data']
+                if event['event'] == 'meta':
+                    event_data = dict(event_data, question=user_question)
+                    if session_active:
+                        event_data['session_id'] = session_id
+                        event_data['session_active'] = True
+                yield f"event: {event['event']}\ndata: {json.dumps(event_data)}\n\n"
+        except Exception as e:
+            logger.error(f"Streaming Chat API Error: {e}")
+            yield f"event: error\ndata: {json.dumps({'message': 'Sorry, the service is temporarily unavailable. Please try again later.'})}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Disable proxy buffering so tokens are flushed immediately
         }
+    )
+
+# Batch AI Chat API Endpoint (bulk replay of helpdesk tickets)
+@app.route('/api/chat/batch', methods=['POST'])
+def smart_chat_batch():
+    data = request.get_json() or {}
+    questions = data.get('questions')
+    # Retrieval only unless the LLM is asked for explicitly
+    use_ai = data.get('use_ai', False)
+    max_size = app.config['CHAT_BATCH_MAX_SIZE']
+    ai_max_size = app.config['CHAT_BATCH_AI_MAX_SIZE']
+    
+    if not isinstance(questions, list) or not questions:
+        return jsonify({'error': 'questions must be a non-empty list'}), 400
+    if not isinstance(use_ai, bool):
+        return jsonify({'error': 'use_ai must be true or false'}), 400
+    if len(questions) > max_size:
+        return jsonify({'error': f'At most {max_size} questions are allowed per batch'}), 400
+    if use_ai and len(questions) > ai_max_size:
+        return jsonify({'error': f'At most {ai_max_size} questions are allowed per batch with use_ai'}), 400
+    if not all(isinstance(question, str) and question.strip() for question in questions):
+        return jsonify({'error': 'Questions cannot be empty'}), 400
+    
+    questions = [question.strip() for question in questions]
+    
+    try:
+        # Extract keywords and classification for the whole batch
+        keyword_results = keyword_service.process_questions(questions)
         
-        # If there's an active session, add session information
-        if session_active:
-            response_data['session_id'] = session_id
-            response_data['session_active'] = True
+        # Log all questions with one bulk insert
+        db.session.execute(insert(Log), [
+            {
+                'question': question,
+                'keywords': keyword_result['keywords_str'],
+                'category': keyword_result['category']
+            } for question, keyword_result in zip(questions, keyword_results)
+        ])
+        db.session.commit()
         
-        return jsonify(response_data), 200
+        refresh_faq_index()
+        results = ai_service.smart_answer_batch(
+            questions, use_ai=use_ai, llm_concurrency=app.config['CHAT_BATCH_AI_CONCURRENCY']
+        )
         
-    except Exception as e:
-        logger.error(f"Intelligent Chat API Error: {e}")
         return jsonify({
-            'question': user_question,
-            'answer': 'Sorry, the service is temporarily unavailable. Please try again later.',
-            'source': 'error',
-            'confidence': 'low',
-            'similarity': 0.0
-        }), 500
+            'count': len(results),
+            'results': [
+                {
+                    'question': question,
+                    'answer': result['answer'],
+                    'source': result['source'],
+                    'confidence': result['confidence'],
+                    'similarity': result.get('similarity', 0.0),
+                    'emotion_analysis': result.get('emotion_analysis', {}),
+                    'requires_human': result.get('requires_human', False),
+                    'category': keyword_result['category']
+                } for question, result, keyword_result in zip(questions, results, keyword_results)
+            ]
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Batch Chat API Error: {e}")
+        return jsonify({'error': 'Sorry, the service is temporarily unavailable. Please try again later.'}), 500
+
+# AI service runtime statistics (LLM connection pool)
+@app.route('/api/ai/stats', methods=['GET'])
+def ai_stats():
+    return jsonify({
+        'llm_pool': ai_service.get_llm_pool_stats(),
+        'answer_cache': ai_service.answer_cache.get_stats(),
+        'semantic_cache': ai_service.semantic_cache.get_stats(),
+        'llm_resilience': ai_service.get_llm_resilience_stats(),
+        'prompt': ai_service.get_prompt_stats(),
+        'faq_index': ai_service.get_index_stats(),
+        'reindex': reindex_worker.get_stats(),
+        'corpus_listener': corpus_listener.get_stats()
+    }), 200
 
 # User Authentication APIs
 # Session management API endpoints
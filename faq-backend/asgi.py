@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ASGI entrypoint with an async chat pipeline
+
+POST /api/chat is served on the event loop: the LLM call is awaited through the
+AsyncOpenAI client and blocking database work runs in a bounded thread pool, so
+slow LLM responses no longer pin a worker. Every other route is passed through
+to the Flask app unchanged, each request on a thread of its own (at most
+ASYNC_WSGI_THREADS at a time), so slow Flask routes run side by side instead
+of queuing behind each other.
+
+Run with:
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker --workers 2
+"""
+
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app, record_chat_question, refresh_faq_index, chat_response_data, chat_error_data
+from ai_service import ai_service
+
+logger = logging.getLogger(__name__)
+
+# Bounded pool for blocking DB work; keep it within the SQLAlchemy pool size
+db_executor = ThreadPoolExecutor(
+    max_workers=app.config['ASYNC_DB_THREADS'],
+    thread_name_prefix='chat-db'
+)
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """
+    WsgiToAsgi running each WSGI request on a thread of its own, at most
+    max_threads at a time
+
+    asgiref's adapter runs requests thread-sensitively, i.e. on one shared
+    thread per process, so every Flask route would wait for the one before it.
+    Inside a ThreadSensitiveContext asgiref gives the request its own thread
+    instead; the semaphore bounds how many run at once.
+    """
+
+    def __init__(self, wsgi_application, max_threads: int):
+        super().__init__(wsgi_application)
+        self.threads = asyncio.Semaphore(max_threads)
+
+    async def __call__(self, scope, receive, send):
+        async with self.threads, ThreadSensitiveContext():
+            await super().__call__(scope, receive, send)
+
+
+# Flask routes served at once; each holds a DB session while its request runs
+flask_application = PooledWsgiToAsgi(app, app.config['ASYNC_WSGI_THREADS'])
+
+
+def _in_app_context(func, *args):
+    with app.app_context():
+        return func(*args)
+
+
+async def run_db(func, *args):
+    """Run blocking database work in the bounded thread pool inside a Flask app context"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(_in_app_context, func, *args))
+
+
+async def read_json_body(receive):
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return json.loads(body) if body else {}
+
+
+async def send_json(scope, send, payload, status=200):
+    headers = [(b'content-type', b'application/json')]
+
+    # Mirror the CORS headers that Flask's after_request adds to every response
+    origin = dict(scope['headers']).get(b'origin')
+    if origin:
+        headers += [
+            (b'access-control-allow-origin', origin),
+            (b'access-control-allow-credentials', b'true'),
+            (b'access-control-expose-headers', b'Set-Cookie,Access-Control-Allow-Credentials'),
+        ]
+
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': json.dumps(payload).encode('utf-8')})
+
+
+async def smart_chat(scope, receive, send):
+    """Async equivalent of app.smart_chat"""
+    try:
+        data = await read_json_body(receive)
+    except ValueError:
+        await send_json(scope, send, {'error': 'Invalid JSON body'}, 400)
+        return
+
+    user_question = (data.get('question') or '').strip()
+    session_id = data.get('session_id')
+
+    if not user_question:
+        await send_json(scope, send, {'error': 'Question cannot be empty'}, 400)
+        return
+
+    try:
+        session_active = await run_db(record_chat_question, user_question, session_id)
+        await run_db(refresh_faq_index)
+
+        result = await ai_service.smart_answer_async(user_question)
+        await send_json(scope, send, chat_response_data(user_question, result, session_id, session_active))
+
+    except Exception as e:
+        logger.error(f"Async Chat API Error: {e}")
+        await send_json(scope, send, chat_error_data(user_question), 500)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            db_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    if scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'] == '/api/chat':
+        await smart_chat(scope, receive, send)
+        return
+
+    await flask_application(scope, receive, send)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark for AIService.analyze_emotion
+
+Compares the compiled single-pass keyword matcher with the previous nested
+substring scan over every emotion keyword list.
+
+At the shipped keyword lists (36 keywords) the two cost about the same: the
+trie regex measured only 1.07x faster, and analyze_emotion as a whole about
+1.2x. It is not a hot-path win. The gap opens only as the lists grow, which
+the second table simulates with synthetic keywords (about 6x at 236 keywords,
+about 25x at 1036). The matcher is kept for that scaling and for the
+whole-word matching.
+
+Usage:
+    python benchmark_emotion.py [--iterations 20000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ai_service import AIService
+
+MESSAGES = [
+    "Hello, how can I reset my password?",
+    "I am so frustrated with this system!",
+    "I need help ASAP! This is urgent!",
+    "This is terrible and useless. I want to complain!",
+    "Can I speak to someone in HR about my benefits package and the enrollment deadline?",
+    "I hate this stupid system and want to talk to your manager immediately!",
+    "Where can I find the cafeteria breakfast menu and the opening hours for the gym?",
+    "I AM REALLY MAD ABOUT THIS!!!",
+]
+
+
+def legacy_analyze_emotion(keywords_by_emotion, user_message):
+    """analyze_emotion as it was before the compiled matcher: one substring scan per keyword"""
+    user_message_lower = user_message.lower()
+    detected_emotions = []
+    emotion_score = 0
+    for emotion_type, keywords in keywords_by_emotion.items():
+        for keyword in keywords:
+            if keyword in user_message_lower:
+                detected_emotions.append(emotion_type)
+                emotion_score += 1
+
+    exclamation_count = user_message.count('!')
+    caps_ratio = sum(1 for c in user_message if c.isupper()) / len(user_message) if user_message else 0
+    if exclamation_count > 2 or caps_ratio > 0.5:
+        detected_emotions.append('frustrated')
+        emotion_score += 1
+
+    needs_human = any(emotion in detected_emotions for emotion in ['complaint', 'transfer']) or emotion_score >= 3
+    return {
+        'emotions': list(set(detected_emotions)),
+        'emotion_score': emotion_score,
+        'needs_human': needs_human,
+        'sentiment': 'negative' if emotion_score > 0 else 'neutral'
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark emotion keyword matching')
+    parser.add_argument('--iterations', type=int, default=20000, help='Passes over the sample messages')
+    args = parser.parse_args()
+
+    service = AIService()
+    keywords = service.negative_emotion_keywords
+
+    legacy = timeit.timeit(lambda: [legacy_analyze_emotion(keywords, m) for m in MESSAGES], number=args.iterations)
+    compiled = timeit.timeit(lambda: [service.analyze_emotion(m) for m in MESSAGES], number=args.iterations)
+    calls = args.iterations * len(MESSAGES)
+
+    print(f"Messages analysed: {calls}")
+    print(f"Substring scan:    {legacy / calls * 1e6:.2f} us/message")
+    print(f"Compiled matcher:  {compiled / calls * 1e6:.2f} us/message")
+    print(f"Speedup:           {legacy / compiled:.2f}x")
+
+    # Matching cost as the keyword lists grow; the extra keywords are synthetic
+    print("\nKeyword matching only, by keyword count:")
+    for extra in (0, 200, 1000):
+        grown = {emotion: list(words) for emotion, words in keywords.items()}
+        grown['dissatisfied'] += [f"synthetic{i}word" for i in range(extra)]
+        service.negative_emotion_keywords = grown
+        service._compile_emotion_matcher()
+        total = sum(len(words) for words in grown.values())
+
+        lowered = [message.lower() for message in MESSAGES]
+        scan = timeit.timeit(lambda: [[k for words in grown.values() for k in words if k in m] for m in lowered],
+                             number=args.iterations // 10)
+        trie = timeit.timeit(lambda: [service._emotion_pattern.findall(m) for m in lowered],
+                             number=args.iterations // 10)
+        print(f"  {total:5d} keywords: substring scan {scan / trie:.1f}x slower than compiled matcher")
+    service.negative_emotion_keywords = keywords
+    service._compile_emotion_matcher()
+
+    print("\nResults that changed (substring scan matched inside words):")
+    for message in MESSAGES:
+        old_score = legacy_analyze_emotion(keywords, message)['emotion_score']
+        new_score = service.analyze_emotion(message)['emotion_score']
+        if old_score != new_score:
+            print(f"  '{message}': {old_score} -> {new_score}")
+
+
+if __name__ == '__main__':
+    main()
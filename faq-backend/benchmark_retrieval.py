@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Retrieval benchmark for AIService
+
+Builds synthetic FAQ corpora from the sample_faqs.py templates (each template
+question specialised by role, team and site), replays paraphrased queries
+(reworded, reordered, some with a typo) and reports for every retrieval
+engine:
+
+    - index build time and memory (traced allocations retained by the index)
+    - p50/p95/p99 latency of the retrieval step of smart_answer (top-3)
+    - recall@1 and recall@3 of the FAQ each query was paraphrased from
+    - share of queries answered from the FAQ at high confidence, and how
+      many of those were the right FAQ
+    - the same for out-of-domain queries (questions no FAQ answers, with the
+      corpus' role/team/site qualifiers), which should never be answered from
+      the FAQ; precision_with_ood counts them as wrong high-confidence answers
+
+Results are written as JSON (with the git commit) so runs can be compared
+across commits.
+
+Usage:
+    python benchmark_retrieval.py [--sizes 1000,10000,100000]
+                                  [--engines tfidf,incremental,bm25,char,lsa,hybrid]
+                                  [--queries 300] [--ood-queries 100] [--seed 42]
+                                  [--output retrieval_benchmark.json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from ai_service import AIService
+from incremental_index import IncrementalFAQIndex
+from models import FAQ
+from retrieval_engines import create_retrieval_engine
+from sample_faqs import SAMPLE_FAQS
+
+ROLES = ["contractor", "intern", "manager", "new hire", "part-time employee", "team lead", "engineer",
+         "analyst", "consultant", "director", "sales representative", "designer", "accountant",
+         "recruiter", "technician", "nurse", "driver", "researcher", "trainer", "auditor"]
+TEAMS = ["finance", "marketing", "legal", "logistics", "procurement", "security", "support", "research",
+         "facilities", "payroll", "sales", "product", "platform", "data", "quality", "operations",
+         "compliance", "design", "training", "hardware", "mobile", "retail", "treasury", "tax", "audit"]
+SITES = ["Berlin", "Boston", "Chicago", "Dublin", "Hamburg", "Lisbon", "London", "Madrid", "Manila",
+         "Milan", "Munich", "Oslo", "Paris", "Prague", "Seattle", "Seoul", "Sydney", "Tokyo", "Toronto",
+         "Warsaw"]
+
+# Rewordings applied to the template part of a query
+SYNONYMS = [
+    ("How do I ", "How can I "), ("How to ", "What is the way to "), ("apply for", "request"),
+    ("reset", "change"), ("find", "see"), ("working hours", "office hours"), ("access", "get into"),
+    ("book", "reserve"), ("report", "raise"), ("process", "procedure"), ("benefits", "coverage"),
+    ("policy", "rules"), ("programs", "courses"), ("What are", "Which are"), ("What is", "Tell me"),
+]
+PREFIXES = ["", "", "Quick question: ", "Hi, ", "Can you tell me: "]
+
+# Questions no FAQ answers
+OUT_OF_DOMAIN = [
+    "What is the weather forecast for the weekend", "How do I cook pasta carbonara",
+    "Who won the football match yesterday", "Can you recommend a good movie",
+    "How do I change a flat tyre on my car", "What is the capital of Australia",
+    "How many calories are in an apple", "Where can I buy cheap concert tickets",
+    "How do I train my puppy to sit", "What time does the supermarket close",
+    "How do I fix a leaking kitchen tap", "Which plants grow well on a balcony",
+]
+
+ENGINES = ['tfidf', 'incremental', 'bm25', 'char', 'lsa', 'hybrid']
+
+
+def generate_corpus(size, rng):
+    """size distinct FAQs: every template question specialised by role, team and site"""
+    combinations = len(SAMPLE_FAQS) * len(ROLES) * len(TEAMS) * len(SITES)
+    if size > combinations:
+        raise ValueError(f"At most {combinations} distinct synthetic FAQs")
+
+    faqs = []
+    for faq_id, code in enumerate(rng.sample(range(combinations), size), start=1):
+        code, site = divmod(code, len(SITES))
+        code, team = divmod(code, len(TEAMS))
+        template, role = divmod(code, len(ROLES))
+        base = SAMPLE_FAQS[template]
+        question = f"{base['question'].rstrip('?')} as a {ROLES[role]} in the {TEAMS[team]} team in {SITES[site]}?"
+        answer = f"{base['answer']} This applies to {ROLES[role]}s in {TEAMS[team]} at the {SITES[site]} office."
+        faqs.append(FAQ(id=faq_id, revision=1, question=question, answer=answer))
+    return faqs
+
+
+def paraphrase(question, rng):
+    """Reword the template part, reorder the role/team/site qualifier and sometimes add a typo"""
+    template, qualifier = question.rstrip('?').split(' as a ', 1)
+    role, rest = qualifier.split(' in the ', 1)
+    team, site = rest.split(' team in ', 1)
+
+    for original, replacement in SYNONYMS:
+        if original in template and rng.random() < 0.6:
+            template = template.replace(original, replacement, 1)
+
+    qualifier = rng.choice([
+        f"for a {role} in {team} at {site}",
+        f"- I'm a {role} ({site}, {team})",
+        f"in {site} {team}, as {role}",
+    ])
+    words = f"{rng.choice(PREFIXES)}{template} {qualifier}?".split(' ')
+    if rng.random() < 0.3:
+        candidates = [i for i, word in enumerate(words) if len(word) > 4 and word.isalpha()]
+        if candidates:
+            i = rng.choice(candidates)
+            position = rng.randrange(1, len(words[i]) - 1)
+            word = words[i]
+            words[i] = word[:position - 1] + word[position] + word[position - 1] + word[position + 1:]
+    return ' '.join(words)
+
+
+def out_of_domain_query(rng):
+    """An unanswerable question carrying a corpus-like role/team/site qualifier"""
+    qualifier = rng.choice([
+        f"as a {rng.choice(ROLES)} in the {rng.choice(TEAMS)} team in {rng.choice(SITES)}",
+        f"for a {rng.choice(ROLES)} in {rng.choice(SITES)}",
+        "",
+    ])
+    return f"{rng.choice(PREFIXES)}{rng.choice(OUT_OF_DOMAIN)} {qualifier}".rstrip() + '?'
+
+
+def make_service(engine):
+    """AIService retrieving through the named engine ('tfidf' is the built-in index)"""
+    service = AIService()
+    if engine == 'incremental':
+        service.index_mode = 'incremental'
+        service.incremental_index = IncrementalFAQIndex()
+    elif engine != 'tfidf':
+        service.retrieval_engine_name = engine
+        service.retrieval_engine = create_retrieval_engine(engine)
+    return service
+
+
+def measure_memory(engine, faqs):
+    """Bytes still allocated by a fresh build of the index, and the peak during the build"""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    service = make_service(engine)
+    service.update_faq_vectors(faqs, corpus_version=1)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del service
+    return current - baseline, peak - baseline
+
+
+def benchmark_engine(engine, faqs, queries, measure_mem=True, ood_queries=()):
+    service = make_service(engine)
+    started = time.perf_counter()
+    service.update_faq_vectors(faqs, corpus_version=1)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    # Warm up lazily created state (thread pools, IDF caches)
+    for question, _ in queries[:5]:
+        service.retrieve(question, k=3)
+
+    latencies = []
+    hits_at_1 = hits_at_3 = high_confidence = high_confidence_correct = 0
+    for question, faq_id in queries:
+        started = time.perf_counter()
+        hits = service.retrieve(question, k=3)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        ids = [hit['id'] for hit in hits]
+        hits_at_1 += ids[:1] == [faq_id]
+        hits_at_3 += faq_id in ids
+        match = service._best_match(hits)
+        if match and match['confidence'] == 'high':
+            high_confidence += 1
+            high_confidence_correct += match['id'] == faq_id
+
+    ood_matches = ood_high_confidence = 0
+    for question in ood_queries:
+        match = service._best_match(service.retrieve(question, k=3))
+        if match:
+            ood_matches += 1
+            ood_high_confidence += match['confidence'] == 'high'
+    all_high_confidence = high_confidence + ood_high_confidence
+
+    result = {
+        'engine': engine,
+        'faqs': len(faqs),
+        'queries': len(queries),
+        'build_ms': round(build_ms, 1),
+        'latency_ms': {
+            'mean': round(float(np.mean(latencies)), 3),
+            'p50': round(float(np.percentile(latencies, 50)), 3),
+            'p95': round(float(np.percentile(latencies, 95)), 3),
+            'p99': round(float(np.percentile(latencies, 99)), 3)
+        },
+        'recall_at_1': round(hits_at_1 / len(queries), 4),
+        'recall_at_3': round(hits_at_3 / len(queries), 4),
+        'high_confidence_rate': round(high_confidence / len(queries), 4),
+        'high_confidence_precision': round(high_confidence_correct / high_confidence, 4) if high_confidence else None,
+        'ood_queries': len(ood_queries),
+        'ood_match_rate': round(ood_matches / len(ood_queries), 4) if ood_queries else None,
+        'ood_high_confidence_rate': round(ood_high_confidence / len(ood_queries), 4) if ood_queries else None,
+        'precision_with_ood': round(high_confidence_correct / all_high_confidence, 4) if all_high_confidence else None,
+        'index_stats': service.get_index_stats()
+    }
+    del service
+
+    if measure_mem:
+        retained, peak = measure_memory(engine, faqs)
+        result['memory_bytes'] = retained
+        result['build_peak_memory_bytes'] = peak
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=10,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(sizes, engines, query_count, seed, measure_mem=True, verbose=True, ood_count=100):
+    results = []
+    for size in sizes:
+        rng = random.Random(seed)
+        faqs = generate_corpus(size, rng)
+        sources = rng.sample(faqs, min(query_count, len(faqs)))
+        queries = [(paraphrase(faq.question, rng), faq.id) for faq in sources]
+        ood_queries = [out_of_domain_query(rng) for _ in range(ood_count)]
+
+        for engine in engines:
+            result = benchmark_engine(engine, faqs, queries, measure_mem, ood_queries)
+            results.append(result)
+            if verbose:
+                latency = result['latency_ms']
+                memory = f"{result['memory_bytes'] / 2 ** 20:8.1f} MiB" if measure_mem else '         -'
+                print(f"{size:>7} {engine:<12} build {result['build_ms']:>9.1f} ms  mem {memory}  "
+                      f"p50 {latency['p50']:>7.2f}  p95 {latency['p95']:>7.2f}  p99 {latency['p99']:>7.2f} ms  "
+                      f"R@1 {result['recall_at_1']:.3f}  R@3 {result['recall_at_3']:.3f}  "
+                      f"high {result['high_confidence_rate']:.3f}  "
+                      f"ood high {result['ood_high_confidence_rate'] or 0:.3f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark FAQ retrieval engines on synthetic corpora')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Comma-separated corpus sizes')
+    parser.add_argument('--engines', default=','.join(ENGINES), help='Comma-separated engines')
+    parser.add_argument('--queries', type=int, default=300, help='Paraphrased queries per corpus')
+    parser.add_argument('--ood-queries', type=int, default=100, help='Out-of-domain queries per corpus')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-memory', action='store_true', help='Skip the traced rebuild that measures memory')
+    parser.add_argument('--output', default='retrieval_benchmark.json', help='JSON results file')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    engines = [engine.strip() for engine in args.engines.split(',') if engine.strip()]
+    results = run(sizes, engines, args.queries, args.seed, measure_mem=not args.no_memory,
+                  ood_count=args.ood_queries)
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'parameters': {'sizes': sizes, 'engines': engines, 'queries': args.queries,
+                       'ood_queries': args.ood_queries, 'seed': args.seed},
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,12 @@
 import os
 from dotenv import load_dotenv
 
+from ai_config import AIConfig
+
 # Load environment variables
 load_dotenv()
 
-class Config:
+class Config(AIConfig):
     # Database Configuration
     DATABASE_URL = os.environ.get('DATABASE_URL')
     
@@ -52,10 +54,14 @@ class Config:
     else:
         print("✅ OpenAI API key is configured")
         
-    # AI Service Configuration
-    AI_SIMILARITY_THRESHOLD = float(os.environ.get('AI_SIMILARITY_THRESHOLD', '0.3'))
-    AI_MAX_TOKENS = int(os.environ.get('AI_MAX_TOKENS', '500'))
-    AI_TEMPERATURE = float(os.environ.get('AI_TEMPERATURE', '0.7'))
+    # AI service settings (AI_*, OPENAI_BASE_URL, ASYNC_*_THREADS) are inherited from AIConfig
+    
+    # Maximum number of questions accepted by /api/chat/batch; batches with use_ai are
+    # smaller and answer CHAT_BATCH_AI_CONCURRENCY questions at once, so a batch of LLM
+    # answers finishes well within the gunicorn timeout
+    CHAT_BATCH_MAX_SIZE = int(os.environ.get('CHAT_BATCH_MAX_SIZE', '500'))
+    CHAT_BATCH_AI_MAX_SIZE = int(os.environ.get('CHAT_BATCH_AI_MAX_SIZE', '50'))
+    CHAT_BATCH_AI_CONCURRENCY = int(os.environ.get('CHAT_BATCH_AI_CONCURRENCY', '8'))
     
     # Flask Configuration
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cross-worker FAQ corpus change notifications
+Every worker process runs one CorpusChangeListener thread that learns about
+FAQ edits made through any worker or instance, so its index is rebuilt within
+a bounded delay instead of staying stale until it happens to serve an edit.
+
+PostgreSQL: FAQCorpusState.bump() issues NOTIFY in the editing transaction and
+the listener waits on a dedicated LISTEN connection; a notification arrives at
+commit. The revision row is also re-read every check_seconds while listening
+(and after every reconnect), so a notification lost during a disconnect still
+reaches the worker.
+
+Other databases (SQLite in development and tests): the listener polls the
+single revision row every poll_seconds.
+
+Either way only faq_corpus_state is read - never the faqs table. Every read
+revision is handed to on_revision, which schedules a rebuild if the index is
+behind.
+"""
+
+import logging
+import os
+import select
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_listeners = weakref.WeakSet()
+
+
+def open_listen_connection(engine, channel: str):
+    """Dedicated autocommit DBAPI connection LISTENing on channel; None unless PostgreSQL
+
+    The connection is detached from the SQLAlchemy pool: it stays open for the
+    life of the listener and closing it closes the database connection.
+    """
+    if engine.dialect.name != 'postgresql':
+        return None
+
+    connection = engine.raw_connection()
+    connection.detach()
+    connection.dbapi_connection.autocommit = True
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f'LISTEN "{channel}"')
+    finally:
+        cursor.close()
+    return connection
+
+
+class CorpusChangeListener:
+    def __init__(self, read_revision: Callable[[], Any], on_revision: Callable[[Any], Any],
+                 open_connection: Optional[Callable[[], Any]] = None, poll_seconds: float = 2.0,
+                 check_seconds: float = 60.0, reconnect_seconds: float = 5.0,
+                 name: str = 'faq-corpus-listener'):
+        """
+        Args:
+            read_revision: Returns the current corpus revision (one-row read)
+            on_revision: Called with every revision read
+            open_connection: Returns a LISTENing DBAPI connection, or None to poll
+            poll_seconds: Revision polling interval without LISTEN/NOTIFY
+            check_seconds: Revision re-check interval while listening
+            reconnect_seconds: Wait before reconnecting after a database error
+            name: Listener thread name
+        """
+        self.read_revision = read_revision
+        self.on_revision = on_revision
+        self.open_connection = open_connection
+        self.poll_seconds = poll_seconds
+        self.check_seconds = max(check_seconds, poll_seconds)
+        self.reconnect_seconds = reconnect_seconds
+        self.name = name
+
+        self._stats = {'mode': None, 'checks': 0, 'notifications': 0, 'changes': 0, 'errors': 0,
+                       'last_revision': None, 'last_error': None}
+        self._reset()
+        _listeners.add(self)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._connection = None
+
+    def start(self):
+        """Start the listener thread of this process (no-op if it is running)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop_event.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['running'] = self.running
+        stats['poll_seconds'] = self.poll_seconds
+        stats['check_seconds'] = self.check_seconds
+        return stats
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._connection = self.open_connection() if self.open_connection else None
+                self._set_stat('mode', 'listen' if self._connection is not None else 'poll')
+
+                # Catch up on anything missed before (re)connecting
+                self._check()
+                while not self._stop_event.is_set():
+                    if self._connection is not None:
+                        self._wait_for_notifications(self._connection)
+                    else:
+                        self._stop_event.wait(self.poll_seconds)
+                    if not self._stop_event.is_set():
+                        self._check()
+            except Exception as e:
+                logger.warning(f"FAQ corpus listener error, retrying in {self.reconnect_seconds}s: {e}")
+                with self._lock:
+                    self._stats['errors'] += 1
+                    self._stats['last_error'] = str(e)
+                self._stop_event.wait(self.reconnect_seconds)
+            finally:
+                self._close_connection()
+
+    def _wait_for_notifications(self, connection):
+        """Return on a notification or after check_seconds"""
+        deadline = time.monotonic() + self.check_seconds
+        while not self._stop_event.is_set():
+            # Wake up at least every second so stop() is honoured promptly
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            readable, _, _ = select.select([connection], [], [], min(remaining, 1.0))
+            if readable:
+                connection.poll()
+                if connection.notifies:
+                    with self._lock:
+                        self._stats['notifications'] += len(connection.notifies)
+                    del connection.notifies[:]
+                    return
+
+    def _check(self):
+        revision = self.read_revision()
+        with self._lock:
+            self._stats['checks'] += 1
+            if revision != self._stats['last_revision']:
+                self._stats['changes'] += 1
+                self._stats['last_revision'] = revision
+        self.on_revision(revision)
+
+    def _set_stat(self, name, value):
+        with self._lock:
+            self._stats[name] = value
+
+    def _close_connection(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+
+def _reset_listeners_after_fork():
+    # Threads do not survive a fork; a forked child starts its own listener
+    # (and its own LISTEN connection) on first use
+    for listener in list(_listeners):
+        listener._reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_listeners_after_fork)
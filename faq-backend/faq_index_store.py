@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persisted FAQ index artifacts
+A fitted TF-IDF index (vocabulary, IDF weights and the CSR matrix of FAQ rows)
+is written once per corpus version as plain .npy files, so worker processes can
+load it with np.load(mmap_mode='r') instead of refitting. Memory-mapped pages
+come from the OS page cache and are shared by every worker on the host.
+
+An artifact is only reused for the FAQ content it was built from: its
+directory and meta.json carry a hash of the FAQ ids, revisions, questions and
+answers, so a revision number reused by another database (or after a reset)
+never serves a stale index.
+
+Layout:
+    <index_dir>/v<corpus_version>-<content hash prefix>/
+        meta.json      format, content hash, vectorizer settings, FAQ ids/revisions/questions/answers
+        terms.npy      vocabulary terms ordered by column
+        idf.npy        IDF weight per column
+        data.npy, indices.npy, indptr.npy   CSR arrays of the FAQ vectors
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT = 2
+
+# Vectorizer settings that must match for a saved vocabulary/IDF to be reusable
+VECTORIZER_PARAMS = ('stop_words', 'ngram_range', 'max_features', 'lowercase', 'norm',
+                     'use_idf', 'smooth_idf', 'sublinear_tf', 'token_pattern')
+
+
+class FAQIndexArtifact:
+    """A loaded index artifact; arrays are read-only memory maps"""
+
+    def __init__(self, corpus_version: Any, vocabulary: Dict[str, int], idf: np.ndarray,
+                 vectors: csr_matrix, meta: Dict[str, Any]):
+        self.corpus_version = corpus_version
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.vectors = vectors
+        self.faq_ids = meta['faq_ids']
+        self.faq_revisions = meta['faq_revisions']
+        self.faq_questions = meta['faq_questions']
+        self.faq_answers = meta['faq_answers']
+
+    def apply_to(self, vectorizer):
+        """Make an unfitted TfidfVectorizer behave like the one the artifact was built with"""
+        vectorizer.vocabulary_ = self.vocabulary
+        vectorizer.idf_ = np.asarray(self.idf)
+
+
+def vectorizer_settings(vectorizer) -> Dict[str, Any]:
+    params = vectorizer.get_params()
+    return {name: list(params[name]) if isinstance(params[name], tuple) else params[name] for name in VECTORIZER_PARAMS}
+
+
+def corpus_content_hash(faq_ids: List[Any], faq_revisions: List[Any], faq_questions: List[str],
+                        faq_answers: List[str]) -> str:
+    """SHA-256 of the FAQ rows an index is built from, independent of row order"""
+    rows = sorted(json.dumps(row, default=str) for row in zip(faq_ids, faq_revisions, faq_questions, faq_answers))
+    return hashlib.sha256('\n'.join(rows).encode('utf-8')).hexdigest()
+
+
+def artifact_path(index_dir: str, corpus_version: Any, content_hash: str) -> str:
+    return os.path.join(index_dir, f"v{corpus_version}-{content_hash[:16]}")
+
+
+def save_faq_index(index_dir: str, corpus_version: Any, vectorizer, vectors, faq_ids: List[Any],
+                   faq_revisions: List[Any], faq_questions: List[str], faq_answers: List[str],
+                   keep_versions: int = 2) -> Optional[str]:
+    """
+    Write the fitted index for corpus_version, unless it already exists
+
+    The artifact is assembled in a temporary directory and renamed into place,
+    so concurrent writers (several workers seeing the same new revision) and
+    readers never see a partial artifact.
+
+    Returns:
+        Path of the artifact, or None if it could not be written
+    """
+    content_hash = corpus_content_hash(faq_ids, faq_revisions, faq_questions, faq_answers)
+    final_path = artifact_path(index_dir, corpus_version, content_hash)
+    if os.path.exists(os.path.join(final_path, 'meta.json')):
+        return final_path
+
+    try:
+        os.makedirs(index_dir, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix='.tmp-', dir=index_dir)
+    except OSError as e:
+        logger.warning(f"Cannot write FAQ index artifact to {index_dir}: {e}")
+        return None
+
+    try:
+        vectors = csr_matrix(vectors)
+        terms = np.empty(len(vectorizer.vocabulary_), dtype=object)
+        for term, column in vectorizer.vocabulary_.items():
+            terms[column] = term
+
+        np.save(os.path.join(tmp_path, 'terms.npy'), terms.astype(str))
+        np.save(os.path.join(tmp_path, 'idf.npy'), vectorizer.idf_)
+        np.save(os.path.join(tmp_path, 'data.npy'), vectors.data)
+        np.save(os.path.join(tmp_path, 'indices.npy'), vectors.indices)
+        np.save(os.path.join(tmp_path, 'indptr.npy'), vectors.indptr)
+
+        meta = {
+            'format': INDEX_FORMAT,
+            'corpus_version': corpus_version,
+            'content_hash': content_hash,
+            'shape': list(vectors.shape),
+            'vectorizer': vectorizer_settings(vectorizer),
+            'faq_ids': list(faq_ids),
+            'faq_revisions': list(faq_revisions),
+            'faq_questions': list(faq_questions),
+            'faq_answers': list(faq_answers)
+        }
+        # meta.json is written last: its presence marks a complete artifact
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+        os.rename(tmp_path, final_path)
+    except OSError:
+        # Another worker renamed its copy into place first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.exists(os.path.join(final_path, 'meta.json')):
+            logger.warning(f"Failed to write FAQ index artifact {final_path}")
+            return None
+
+    prune_faq_indexes(index_dir, keep_versions)
+    return final_path
+
+
+def load_faq_index(index_dir: str, corpus_version: Any, content_hash: str,
+                   vectorizer=None) -> Optional[FAQIndexArtifact]:
+    """
+    Memory-map the artifact for corpus_version built from the FAQ content with content_hash
+
+    Args:
+        index_dir: Artifact root directory
+        corpus_version: Corpus revision to load
+        content_hash: corpus_content_hash() of the current FAQs; the artifact is
+                      rejected unless its stored FAQ rows hash to the same value
+        vectorizer: If given, the artifact is rejected when its settings differ
+
+    Returns:
+        FAQIndexArtifact, or None if no usable artifact exists
+    """
+    path = artifact_path(index_dir, corpus_version, content_hash)
+    try:
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get('format') != INDEX_FORMAT or meta.get('corpus_version') != corpus_version:
+        return None
+    stored_hash = corpus_content_hash(meta['faq_ids'], meta['faq_revisions'], meta['faq_questions'], meta['faq_answers'])
+    if meta.get('content_hash') != content_hash or stored_hash != content_hash:
+        logger.info(f"Ignoring FAQ index artifact {path}: built from different FAQ content")
+        return None
+    if vectorizer is not None and meta.get('vectorizer') != vectorizer_settings(vectorizer):
+        logger.info(f"Ignoring FAQ index artifact {path}: vectorizer settings changed")
+        return None
+
+    try:
+        terms = np.load(os.path.join(path, 'terms.npy'), mmap_mode='r')
+        idf = np.load(os.path.join(path, 'idf.npy'), mmap_mode='r')
+        vectors = csr_matrix(
+            (np.load(os.path.join(path, 'data.npy'), mmap_mode='r'),
+             np.load(os.path.join(path, 'indices.npy'), mmap_mode='r'),
+             np.load(os.path.join(path, 'indptr.npy'), mmap_mode='r')),
+            shape=tuple(meta['shape']),
+            copy=False
+        )
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to load FAQ index artifact {path}: {e}")
+        return None
+
+    vocabulary = {str(term): column for column, term in enumerate(terms)}
+    return FAQIndexArtifact(corpus_version, vocabulary, idf, vectors, meta)
+
+
+def prune_faq_indexes(index_dir: str, keep_versions: int = 2):
+    """Delete all but the newest keep_versions artifacts (by modification time)"""
+    try:
+        entries = [entry for entry in os.scandir(index_dir) if entry.is_dir() and entry.name.startswith('v')]
+    except OSError:
+        return
+
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[keep_versions:]:
+        # Workers that still map an older artifact keep their open pages until they reload
+        shutil.rmtree(entry.path, ignore_errors=True)
@@ -0,0 +1,67 @@
+# Gunicorn configuration (loaded automatically from the working directory)
+#
+# With PRELOAD_FAQ_INDEX enabled (the default) the app is imported and the FAQ
+# index is built once in the master before workers are forked. Workers inherit
+# the TF-IDF vectorizer and CSR arrays copy-on-write, so there is one physical
+# copy of the index no matter how many workers run.
+#
+# Refresh protocol when FAQs change:
+#   1. add/update/delete FAQ bumps faq_corpus_state.revision in the same commit.
+#   2. The worker that served the edit schedules a debounced rebuild on its
+#      background reindex thread. Every other worker learns about the new
+#      revision from its corpus listener (corpus_listener.py): at once through
+#      PostgreSQL LISTEN/NOTIFY, or within AI_INDEX_POLL_SECONDS by polling the
+#      revision row on other databases, and schedules the same rebuild.
+#      Chat requests keep using the current index until the rebuilt one is
+#      published; the master's copy stays shared by workers not yet refreshed.
+#   3. With AI_INDEX_DIR set, the first worker to see the new revision fits it
+#      and writes a persisted artifact; workers refreshing after it memory-map
+#      that artifact, so the refreshed index is again shared via the page cache.
+#   4. Workers recycled later (max_requests, HUP) are forked from the master's
+#      old index and catch up the same way on their first request. Restart the
+#      master (or redeploy) to make the new revision the preloaded one.
+#
+# With AI_WARMUP_ENABLED the master also answers the most frequent recent
+# questions (warm_cache.py) before forking, so workers inherit warm caches.
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+timeout = 120
+
+preload_app = os.environ.get('PRELOAD_FAQ_INDEX', 'True').lower() in ['true', '1', 'yes']
+
+def when_ready(server):
+    if not preload_app:
+        return
+
+    from app import app, preload_faq_index
+    try:
+        preload_faq_index()
+    except Exception as e:
+        server.log.warning(f"FAQ index preload failed, workers will build it on demand: {e}")
+
+    # Answer frequent recent questions once, so every worker forks with warm answer caches
+    if app.config['AI_WARMUP_ENABLED']:
+        from app import warm_answer_caches
+        try:
+            warm_answer_caches()
+        except Exception as e:
+            server.log.warning(f"Cache warm-up failed, workers start with cold caches: {e}")
+
+    # Move everything allocated so far out of the collector's generations, so
+    # garbage collection in the workers does not write to (and copy) shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+
+    # Never reuse a pooled database connection inherited from the master
+    from models import db
+    from app import app
+    with app.app_context():
+        db.engine.dispose(close=False)
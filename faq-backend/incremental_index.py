@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Incremental FAQ index
+TF-IDF retrieval over hashed features that is updated in place: adding, editing
+or deleting one FAQ tokenizes only that FAQ and adjusts the maintained document
+frequencies, instead of refitting a vectorizer over the whole corpus.
+
+Rows are raw term counts. IDF weights (same smoothed formula as sklearn's
+TfidfTransformer) and the L2 row norms are derived from the document
+frequencies when the corpus changes, so similarities are the cosine of the
+TF-IDF vectors without re-tokenizing anything. Features no indexed FAQ
+contains get no weight, as with a fitted vocabulary. Replaced and deleted rows
+are tombstoned and new rows go to a small delta matrix; compaction merges both
+back into one contiguous matrix and recounts the document frequencies.
+
+Row norms are kept current per edit: idf(t) = ln(1 + n) + 1 - ln(1 + df(t)),
+so with a = ln(1 + n) + 1 and b(t) = ln(1 + df(t)) a row's squared norm is
+a^2 * sum(c^2) - 2a * sum(c^2 b) + sum(c^2 b^2) over its counts c. The three
+sums are stored per row and adjusted only for the rows containing a term
+whose document frequency changed, so an edit never re-weights the whole
+matrix.
+
+view() returns an immutable IncrementalIndexView of the current state, which
+keeps answering consistently while the index itself moves on.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix, hstack, vstack
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+
+class IncrementalIndexView:
+    """Read-only state of an IncrementalFAQIndex at one point in time"""
+
+    def __init__(self, hasher: HashingVectorizer, main: csr_matrix, delta: Optional[csr_matrix], idf: np.ndarray,
+                 row_scale: np.ndarray, faq_ids: tuple, faq_revisions: tuple, faq_questions: tuple,
+                 faq_answers: tuple, row_of: dict):
+        self.hasher = hasher
+        self.main = main
+        self.delta = delta
+        self.idf = idf
+        self.row_scale = row_scale
+        self.faq_ids = faq_ids
+        self.faq_revisions = faq_revisions
+        self.faq_questions = faq_questions
+        self.faq_answers = faq_answers
+        self.row_of = row_of
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+    def transform(self, questions: List[str]) -> csr_matrix:
+        """L2-normalized TF-IDF vectors of questions in the hashed feature space"""
+        vectors = self.hasher.transform(questions).tocsr()
+        vectors.data *= self.idf[vectors.indices]
+        # Terms no FAQ contains have zero weight and must not count towards the norm
+        vectors.eliminate_zeros()
+        return normalize(vectors, norm='l2', copy=False)
+
+    def similarities(self, question_vectors: csr_matrix) -> csr_matrix:
+        """Cosine similarity of each question vector (rows) with every index row (columns)"""
+        # Row i's TF-IDF vector is counts_i * idf / norm_i: apply idf to the question side
+        weighted = question_vectors.tocsr(copy=True)
+        weighted.data *= self.idf[weighted.indices]
+        parts = [weighted @ self.main.T]
+        if self.delta is not None:
+            parts.append(weighted @ self.delta.T)
+
+        scores = hstack(parts, format='csr') if len(parts) > 1 else parts[0].tocsr()
+        scores.data *= self.row_scale[scores.indices]
+        scores.eliminate_zeros()
+        return scores
+
+
+class IncrementalFAQIndex:
+    def __init__(self, n_features: int = 2 ** 18, compact_seconds: float = 300,
+                 max_delta_ratio: float = 0.1, max_dead_ratio: float = 0.2):
+        """
+        Args:
+            n_features: Hashed feature space size; collisions are rare well below it
+            compact_seconds: Compact pending changes at least this often
+            max_delta_ratio: Compact once delta rows exceed this share of all rows
+            max_dead_ratio: Compact once tombstoned rows exceed this share of all rows
+        """
+        self.n_features = n_features
+        self.compact_seconds = compact_seconds
+        self.max_delta_ratio = max_delta_ratio
+        self.max_dead_ratio = max_dead_ratio
+
+        # Same analyzer settings as the TF-IDF vectorizer, without a fitted vocabulary
+        self.hasher = HashingVectorizer(
+            stop_words='english',
+            ngram_range=(1, 2),
+            n_features=n_features,
+            alternate_sign=False,
+            norm=None
+        )
+
+        self._main = csr_matrix((0, n_features))
+        self._delta_rows = []
+        self._delta = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._doc_freq = np.zeros(n_features, dtype=np.int64)
+        self._log_df = np.zeros(n_features)
+        # Per row: sum(c^2), sum(c^2 * log_df), sum(c^2 * log_df^2) over its counts c
+        self._norm_sums = np.zeros((0, 3))
+        self._main_columns = None
+        self._delta_columns = None
+        self._row_of = {}
+
+        # Row-aligned FAQ metadata (tombstoned rows keep their slot until compaction)
+        self.faq_ids = []
+        self.faq_revisions = []
+        self.faq_questions = []
+        self.faq_answers = []
+
+        self._idf = None
+        self._row_scale = None
+        self._view = None
+        self._last_compaction = time.monotonic()
+        self._pending_changes = 0
+        self._lock = threading.RLock()
+        self._stats = {'upserts': 0, 'deletes': 0, 'rows_tokenized': 0, 'compactions': 0}
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def sync(self, faqs: Iterable[Any]) -> List[Any]:
+        """
+        Bring the index in line with the full FAQ list, touching only changed FAQs
+
+        Args:
+            faqs: Objects with id, revision, question and answer attributes
+
+        Returns:
+            Ids of FAQs that were added, changed or deleted
+        """
+        current = {faq.id: faq for faq in faqs or []}
+        with self._lock:
+            deleted_ids = [faq_id for faq_id in self._row_of if faq_id not in current]
+            for faq_id in deleted_ids:
+                self.delete(faq_id)
+
+            changed = []
+            for faq in current.values():
+                row = self._row_of.get(faq.id)
+                if row is None or (self.faq_revisions[row], self.faq_questions[row], self.faq_answers[row]) != \
+                        (faq.revision, faq.question, faq.answer):
+                    changed.append((faq.id, faq.revision, faq.question, faq.answer))
+            self.upsert_many(changed)
+
+            self.maybe_compact()
+        return deleted_ids + [faq_id for faq_id, _, _, _ in changed]
+
+    def sync_revisions(self, revisions: Dict[Any, Any], load_faqs: Callable[[List[Any]], Iterable[Any]]) -> List[Any]:
+        """
+        sync() from (id, revision) pairs: only FAQs whose revision changed are loaded
+
+        Args:
+            revisions: FAQ id -> revision of every current FAQ
+            load_faqs: Called with the ids of new and edited FAQs, returns those FAQs
+
+        Returns:
+            Ids of FAQs that were added, changed or deleted
+        """
+        with self._lock:
+            deleted_ids = [faq_id for faq_id in self._row_of if faq_id not in revisions]
+            for faq_id in deleted_ids:
+                self.delete(faq_id)
+
+            stale_ids = [faq_id for faq_id, revision in revisions.items()
+                         if faq_id not in self._row_of or self.faq_revisions[self._row_of[faq_id]] != revision]
+            faqs = list(load_faqs(stale_ids)) if stale_ids else []
+            self.upsert_many([(faq.id, faq.revision, faq.question, faq.answer) for faq in faqs])
+
+            self.maybe_compact()
+        return deleted_ids + [faq.id for faq in faqs]
+
+    def upsert(self, faq_id: Any, revision: Any, question: str, answer: str):
+        """Add or replace one FAQ"""
+        self.upsert_many([(faq_id, revision, question, answer)])
+
+    def upsert_many(self, faqs: Iterable[tuple]):
+        """Add or replace FAQs given as (id, revision, question, answer); new questions are tokenized in one batch"""
+        with self._lock:
+            to_tokenize = {}
+            removed_terms = []
+            for faq_id, revision, question, answer in faqs:
+                self._stats['upserts'] += 1
+                row = self._row_of.get(faq_id)
+
+                # Answer-only edits keep the row; its vector depends on the question alone
+                if row is not None and self.faq_questions[row] == question:
+                    self.faq_revisions[row] = revision
+                    self.faq_answers[row] = answer
+                    self._view = None
+                    continue
+
+                if row is not None:
+                    del self._row_of[faq_id]
+                    removed_terms.append(self._tombstone(row))
+                to_tokenize[faq_id] = (revision, question, answer)
+
+            if not to_tokenize:
+                self._add_doc_freq(removed_terms)
+                return
+
+            counts = self.hasher.transform([question for _, question, _ in to_tokenize.values()]).tocsr()
+            counts.sum_duplicates()
+            self._stats['rows_tokenized'] += len(to_tokenize)
+
+            self._delta_rows.append(counts)
+            self._delta = None
+            self._alive = np.concatenate([self._alive, np.ones(len(to_tokenize), dtype=bool)])
+            self._norm_sums = np.vstack([self._norm_sums, self._row_norm_sums(counts)])
+            # One net update: terms kept by an edited question cancel out instead of touching every row twice
+            self._add_doc_freq(removed_terms, counts.indices)
+            for faq_id, (revision, question, answer) in to_tokenize.items():
+                self._row_of[faq_id] = len(self.faq_ids)
+                self.faq_ids.append(faq_id)
+                self.faq_revisions.append(revision)
+                self.faq_questions.append(question)
+                self.faq_answers.append(answer)
+            self._changed()
+
+    def delete(self, faq_id: Any) -> bool:
+        """Remove one FAQ; returns False if it was not indexed"""
+        with self._lock:
+            row = self._row_of.pop(faq_id, None)
+            if row is None:
+                return False
+            self._stats['deletes'] += 1
+            self._add_doc_freq([self._tombstone(row)])
+            self._changed()
+            return True
+
+    def transform(self, questions: List[str]) -> csr_matrix:
+        """L2-normalized TF-IDF vectors of questions in the hashed feature space"""
+        return self.view().transform(questions)
+
+    def similarities(self, question_vectors: csr_matrix) -> csr_matrix:
+        """Cosine similarity of each question vector (rows) with every index row (columns)"""
+        return self.view().similarities(question_vectors)
+
+    def view(self) -> IncrementalIndexView:
+        """Immutable view of the current rows, weights and FAQ metadata (cached until the next change)"""
+        with self._lock:
+            if self._view is None:
+                self._view = IncrementalIndexView(
+                    self.hasher, self._main, self._delta_matrix() if self._delta_rows else None, self._current_idf(), self._current_row_scale(),
+                    tuple(self.faq_ids), tuple(self.faq_revisions), tuple(self.faq_questions),
+                    tuple(self.faq_answers), dict(self._row_of)
+                )
+            return self._view
+
+    def compact(self):
+        """Merge the delta into the main matrix, drop tombstones and recount document frequencies"""
+        with self._lock:
+            matrix = vstack([self._main, self._delta_matrix()]).tocsr() if self._delta_rows else self._main
+            keep = np.flatnonzero(self._alive)
+            self._main = matrix[keep].tocsr()
+            self._delta_rows = []
+            self._delta = None
+            self._alive = np.ones(len(keep), dtype=bool)
+
+            self.faq_ids = [self.faq_ids[row] for row in keep]
+            self.faq_revisions = [self.faq_revisions[row] for row in keep]
+            self.faq_questions = [self.faq_questions[row] for row in keep]
+            self.faq_answers = [self.faq_answers[row] for row in keep]
+            self._row_of = {faq_id: row for row, faq_id in enumerate(self.faq_ids)}
+
+            self._doc_freq = np.bincount(self._main.indices, minlength=self.n_features).astype(np.int64)
+            self._log_df = np.log1p(self._doc_freq)
+            self._norm_sums = self._row_norm_sums(self._main)
+            self._main_columns = None
+            self._idf = None
+            self._row_scale = None
+            self._view = None
+            self._pending_changes = 0
+            self._last_compaction = time.monotonic()
+            self._stats['compactions'] += 1
+
+    def maybe_compact(self) -> bool:
+        """Compact when the delta or tombstones grew too large, or pending changes are old enough"""
+        with self._lock:
+            rows = len(self._alive)
+            if not self._pending_changes or not rows:
+                return False
+
+            dead = rows - int(self._alive.sum())
+            due = (
+                rows - self._main.shape[0] > self.max_delta_ratio * rows
+                or dead > self.max_dead_ratio * rows
+                or time.monotonic() - self._last_compaction >= self.compact_seconds
+            )
+            if due:
+                self.compact()
+            return due
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['faqs'] = len(self._row_of)
+            stats['rows'] = len(self._alive)
+            stats['tombstones'] = len(self._alive) - len(self._row_of)
+            stats['delta_rows'] = sum(block.shape[0] for block in self._delta_rows)
+            stats['nnz'] = int(self._main.nnz + sum(block.nnz for block in self._delta_rows))
+            stats['n_features'] = self.n_features
+        return stats
+
+    def _tombstone(self, row: int) -> np.ndarray:
+        """Mark a row dead and return its terms, whose document frequencies the caller must release; caller holds the lock"""
+        self._alive[row] = False
+        return self._row_counts(row).indices
+
+    def _add_doc_freq(self, removed_terms: List[np.ndarray], added_terms: Optional[np.ndarray] = None):
+        """Apply the net document frequency change of removed and added term occurrences; adjusts the norm sums of rows containing them"""
+        removed = np.concatenate(removed_terms) if removed_terms else np.zeros(0, dtype=np.int64)
+        added = added_terms if added_terms is not None else np.zeros(0, dtype=np.int64)
+        terms, inverse = np.unique(np.concatenate([removed, added]), return_inverse=True)
+        signs = np.concatenate([-np.ones(len(removed), dtype=np.int64), np.ones(len(added), dtype=np.int64)])
+        change = np.bincount(inverse, weights=signs, minlength=len(terms)).astype(np.int64)
+        changed = change != 0
+        terms, change = terms[changed], change[changed]
+        if not len(terms):
+            return
+        old_log_df = self._log_df[terms]
+        self._doc_freq[terms] += change
+        new_log_df = np.log1p(self._doc_freq[terms])
+        self._log_df[terms] = new_log_df
+
+        # Tombstoned rows are adjusted too; their norms are never used
+        log_df_change = new_log_df - old_log_df
+        squared_log_df_change = new_log_df ** 2 - old_log_df ** 2
+        for offset, columns in self._column_matrices():
+            postings = columns[:, terms]
+            for i in range(len(terms)):
+                # Rows are unique within one term's postings
+                start, end = postings.indptr[i], postings.indptr[i + 1]
+                rows = offset + postings.indices[start:end]
+                squared = postings.data[start:end] ** 2
+                self._norm_sums[rows, 1] += squared * log_df_change[i]
+                self._norm_sums[rows, 2] += squared * squared_log_df_change[i]
+
+    def _row_norm_sums(self, counts: csr_matrix) -> np.ndarray:
+        """Norm sums of count rows under the current document frequencies"""
+        squared = counts.power(2).tocsr()
+        log_df = self._log_df[squared.indices]
+        sums = np.zeros((squared.shape[0], 3))
+        row_of_entry = np.repeat(np.arange(squared.shape[0]), np.diff(squared.indptr))
+        np.add.at(sums[:, 0], row_of_entry, squared.data)
+        np.add.at(sums[:, 1], row_of_entry, squared.data * log_df)
+        np.add.at(sums[:, 2], row_of_entry, squared.data * log_df ** 2)
+        return sums
+
+    def _column_matrices(self) -> list:
+        """(first row, column-major copy) of the main and delta matrices, for finding the rows of a term
+
+        The main matrix is converted once per compaction, the small delta once per change.
+        """
+        if self._main_columns is None:
+            self._main_columns = self._main.tocsc()
+        matrices = [(0, self._main_columns)]
+        if self._delta_rows:
+            delta = self._delta_matrix()
+            if self._delta_columns is None:
+                self._delta_columns = delta.tocsc()
+            matrices.append((self._main.shape[0], self._delta_columns))
+        return matrices
+
+    def _row_counts(self, row: int) -> csr_matrix:
+        main_rows = self._main.shape[0]
+        return self._main[row] if row < main_rows else self._delta_matrix()[row - main_rows]
+
+    def _delta_matrix(self) -> csr_matrix:
+        if self._delta is None:
+            self._delta = vstack(self._delta_rows).tocsr()
+            self._delta_columns = None
+        return self._delta
+
+    def _changed(self):
+        self._idf = None
+        self._row_scale = None
+        self._view = None
+        self._pending_changes += 1
+
+    def _current_idf(self) -> np.ndarray:
+        """Smoothed IDF, as in TfidfTransformer: ln((1 + n) / (1 + df)) + 1; 0 for features no FAQ has"""
+        if self._idf is None:
+            self._idf = np.where(self._doc_freq > 0, self._idf_offset() - self._log_df, 0.0)
+        return self._idf
+
+    def _idf_offset(self) -> float:
+        return np.log1p(len(self._row_of)) + 1
+
+    def _current_row_scale(self) -> np.ndarray:
+        """1 / L2 norm of each row's TF-IDF vector; 0 for tombstoned and empty rows"""
+        if self._row_scale is None:
+            a = self._idf_offset()
+            sums = self._norm_sums
+            squared_norms = a * a * sums[:, 0] - 2 * a * sums[:, 1] + sums[:, 2]
+
+            row_scale = np.zeros(len(self._alive))
+            usable = self._alive & (squared_norms > 0)
+            row_scale[usable] = 1 / np.sqrt(squared_norms[usable])
+            self._row_scale = row_scale
+        return self._row_scale
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Immutable FAQ index snapshots
+Everything a request reads from the FAQ index - row metadata, the fitted
+vectorizer and FAQ vectors (or a built retrieval engine, or a view of the
+incremental index) and the exact-match table - lives in one FAQIndexSnapshot.
+
+A snapshot is never modified after construction. AIService builds the next
+snapshot off to the side and publishes it with a single reference assignment
+(read-copy-update): a request reads the reference once and uses that snapshot
+throughout, so it never blocks on a rebuild and never pairs rows of one corpus
+version with answers of another. Old snapshots are freed once the last request
+holding them finishes.
+"""
+
+import itertools
+import os
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from scipy.sparse import csr_matrix
+
+from retrieval_engines import ExactMatchIndex, RetrievalEngine, top_candidates
+
+_generations = itertools.count(1)
+
+
+class FAQIndexSnapshot:
+    __slots__ = ('generation', 'vector_generation', 'corpus_version', 'faq_ids', 'faq_revisions', 'faq_questions',
+                 'faq_answers', 'faq_rows', 'vectors', 'vectorizer', 'engine', 'incremental', 'exact_match', 'pid')
+
+    def __init__(self, corpus_version: Any, faq_ids: Sequence[Any], faq_revisions: Sequence[Any],
+                 faq_questions: Sequence[str], faq_answers: Sequence[str], vectors: csr_matrix = None,
+                 vectorizer=None, engine: RetrievalEngine = None, incremental=None,
+                 exact_match: ExactMatchIndex = None, faq_rows: Dict[Any, int] = None,
+                 vector_generation: int = None):
+        """
+        Args:
+            corpus_version: Corpus revision the snapshot was built from (None = not built)
+            faq_ids, faq_revisions, faq_questions, faq_answers: Row-aligned FAQ metadata
+            vectors: L2-normalized FAQ rows of the fitted vectorizer (built-in TF-IDF index)
+            vectorizer: Fitted vectorizer producing vectors in the space of 'vectors'
+            engine: Built retrieval engine, used instead of vectors/vectorizer
+            incremental: IncrementalIndexView, used instead of vectors/vectorizer
+            exact_match: Exact-match table of the FAQ questions (built here if omitted)
+            faq_rows: FAQ id -> row (derived from faq_ids if omitted)
+            vector_generation: Generation of an earlier snapshot whose question vectors
+                               are comparable with this one's (default: a new vector space)
+        """
+        set_field = object.__setattr__
+        set_field(self, 'generation', next(_generations))
+        set_field(self, 'vector_generation', vector_generation if vector_generation is not None else self.generation)
+        set_field(self, 'corpus_version', corpus_version)
+        set_field(self, 'faq_ids', tuple(faq_ids))
+        set_field(self, 'faq_revisions', tuple(faq_revisions))
+        set_field(self, 'faq_questions', tuple(faq_questions))
+        set_field(self, 'faq_answers', tuple(faq_answers))
+        set_field(self, 'faq_rows', faq_rows if faq_rows is not None
+                  else {faq_id: row for row, faq_id in enumerate(self.faq_ids)})
+        set_field(self, 'vectors', vectors)
+        set_field(self, 'vectorizer', vectorizer)
+        set_field(self, 'engine', engine)
+        set_field(self, 'incremental', incremental)
+        if exact_match is None:
+            exact_match = ExactMatchIndex()
+            exact_match.build([self.faq_ids[row] for row in self.faq_rows.values()],
+                              [self.faq_questions[row] for row in self.faq_rows.values()])
+        set_field(self, 'exact_match', exact_match)
+        set_field(self, 'pid', os.getpid())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FAQIndexSnapshot is immutable; build a new snapshot instead")
+
+    def __len__(self) -> int:
+        """Number of live FAQs"""
+        return len(self.faq_rows)
+
+    def has_index(self) -> bool:
+        if self.engine is not None:
+            return len(self.engine) > 0
+        if self.incremental is not None:
+            return len(self.incremental) > 0
+        return self.vectors is not None and len(self.faq_questions) > 0
+
+    def vectorize(self, questions: List[str]) -> csr_matrix:
+        """Question vectors in the space of this index"""
+        if self.engine is not None:
+            return self.engine.transform(questions)
+        if self.incremental is not None:
+            return self.incremental.transform(questions)
+        return self.vectorizer.transform(questions)
+
+    def tag(self, vectors: csr_matrix) -> 'QuestionVectors':
+        """Question vectors of this index, tagged with their vector space"""
+        return QuestionVectors(vectors, self.vector_generation)
+
+    def search(self, questions: List[str], question_vectors, k: int) -> list:
+        """Per question, (rows, similarities) of the best k rows"""
+        if self.engine is not None:
+            return self.engine.search(questions, k, question_vectors)
+
+        if self.incremental is not None:
+            similarity_matrix = self.incremental.similarities(question_vectors)
+        else:
+            similarity_matrix = question_vectors.dot(self.vectors.T).tocsr()
+        return [top_candidates(similarity_matrix.getrow(i).toarray().ravel(), k) for i in range(len(questions))]
+
+    def exact_match_row(self, question: str) -> Optional[int]:
+        """Row of the FAQ whose normalized question equals this one, or None"""
+        faq_id = self.exact_match.lookup(question)
+        return self.faq_rows.get(faq_id) if faq_id is not None else None
+
+
+class QuestionVectors(NamedTuple):
+    """
+    Question vectors together with the vector_generation of the snapshot that made them
+
+    Vectors of different generations come from different vectorizers and must
+    never be compared (the semantic answer cache checks the tag).
+    """
+    vectors: csr_matrix
+    vector_generation: int
+
+    def row(self, i: int) -> 'QuestionVectors':
+        return QuestionVectors(self.vectors.getrow(i), self.vector_generation)
+
+
+EMPTY_SNAPSHOT = FAQIndexSnapshot(None, (), (), (), ())
@@ -165,6 +165,18 @@ class KeywordService:
             'original_question': question
         }
     
+    def process_questions(self, questions: List[str]) -> List[Dict[str, any]]:
+        """
+        Process a batch of questions
+        
+        Args:
+            questions: List of user questions
+            
+        Returns:
+            List of process_question results, in the same order
+        """
+        return [self.process_question(question) for question in questions]
+    
     def get_category_stats(self, questions: List[str]) -> Dict[str, int]:
         """
         Get question category statistics
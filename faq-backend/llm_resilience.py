@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM backend resilience helpers
+Circuit breaker around LLM calls, a sliding latency window for p95-based hedge
+delays, hedged (duplicate after a delay) request execution, and single-flight
+coalescing of identical concurrent calls
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import numpy as np
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the LLM while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    closed    - calls pass; failures and slow calls are counted
+    open      - calls are rejected until open_seconds have passed
+    half_open - up to half_open_max_calls probe calls pass; a success closes
+                the circuit, a failure opens it again
+
+    Every call let through by allow_request() has to end in record_success(),
+    record_failure() or release(); otherwise its half-open probe slot is never
+    given back and the circuit cannot close again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, slow_call_ms: float = 15000,
+                 open_seconds: float = 30, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.slow_call_ms = slow_call_ms
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+
+        self._stats = {'rejected': 0, 'failures': 0, 'slow_calls': 0, 'times_opened': 0, 'released': 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def allow_request(self) -> bool:
+        """Return True if a call may go to the LLM now"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+
+            if state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+
+            self._stats['rejected'] += 1
+            return False
+
+    def record_success(self, latency_ms: float):
+        """Record a completed call; calls slower than slow_call_ms count as failures"""
+        if latency_ms >= self.slow_call_ms:
+            with self._lock:
+                self._stats['slow_calls'] += 1
+            self._record_failure()
+            return
+
+        with self._lock:
+            self._consecutive_failures = 0
+            if self._current_state() == self.HALF_OPEN:
+                self._state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._stats['failures'] += 1
+        self._record_failure()
+
+    def release(self):
+        """End an allowed call without an outcome (cancelled, or its client went away)"""
+        with self._lock:
+            self._stats['released'] += 1
+            if self._current_state() == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['state'] = self._current_state()
+            stats['consecutive_failures'] = self._consecutive_failures
+        stats['failure_threshold'] = self.failure_threshold
+        stats['slow_call_ms'] = self.slow_call_ms
+        return stats
+
+    def _record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            state = self._current_state()
+            if state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if state != self.OPEN:
+                    self._stats['times_opened'] += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def _current_state(self) -> str:
+        """Move open -> half_open once the open period is over; caller holds the lock"""
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies"""
+
+    def __init__(self, window: int = 200):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, latency_ms: float):
+        with self._lock:
+            self._latencies.append(latency_ms)
+
+    def percentile(self, percentile: float, min_samples: int = 20) -> Optional[float]:
+        """Return the latency percentile in ms, or None until min_samples calls were seen"""
+        with self._lock:
+            if len(self._latencies) < min_samples:
+                return None
+            samples = np.fromiter(self._latencies, dtype=float)
+        return float(np.percentile(samples, percentile))
+
+
+class SingleFlight:
+    """
+    Per-process coalescing of identical in-flight calls
+
+    The first caller of a key runs the call; callers arriving while it is in
+    flight wait for the same result (or exception) instead of repeating it.
+    The key is released when the call finishes, so later callers start a new
+    call - results are not cached here.
+
+    Sync and async callers share one table: followers wait on a
+    concurrent.futures.Future, awaited from a coroutine through wrap_future.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'coalesced': 0}
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> tuple:
+        """
+        Run func() once for all concurrent callers of key
+
+        Returns:
+            (result, whether it was shared from another caller's call)
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = func()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result, False
+
+    async def do_async(self, key: Hashable, coro_factory: Callable[[], Awaitable[Any]]) -> tuple:
+        """Async do(): coro_factory creates the coroutine run by the first caller"""
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future), True
+
+        try:
+            result = await coro_factory()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result, False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+    def _join(self, key: Hashable) -> tuple:
+        """(future of the call for key, whether this caller leads it)"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._stats['coalesced'] += 1
+                return future, False
+
+            future = self._calls[key] = Future()
+            self._stats['calls'] += 1
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, result: Any = None, error: BaseException = None):
+        with self._lock:
+            del self._calls[key]
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # The leader was cancelled (client went away); its waiters get an ordinary failure
+            future.set_exception(RuntimeError(f"Coalesced call was interrupted: {type(error).__name__}"))
+
+
+def hedged_call(func: Callable[[], Any], delay_seconds: float, executor) -> tuple:
+    """
+    Run func, starting a second identical call if the first has not finished after delay_seconds
+
+    Args:
+        func: Zero-argument callable
+        delay_seconds: Hedge delay
+        executor: concurrent.futures executor running both attempts
+
+    Returns:
+        (result of the first successful attempt, whether the hedge was sent)
+    """
+    primary = executor.submit(func)
+    done, _ = wait([primary], timeout=delay_seconds)
+    if done:
+        return primary.result(), False
+
+    pending = {primary, executor.submit(func)}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return future.result(), True
+            error = future.exception()
+    raise error
+
+
+async def hedged_call_async(coro_factory: Callable[[], Awaitable[Any]], delay_seconds: float) -> tuple:
+    """Async hedged_call(): coro_factory creates a fresh coroutine per attempt
+
+    Attempts still running when the caller is cancelled are cancelled with it.
+    """
+    primary = asyncio.ensure_future(coro_factory())
+    pending = {primary}
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay_seconds)
+        if done:
+            return primary.result(), False
+
+        pending.add(asyncio.ensure_future(coro_factory()))
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), True
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
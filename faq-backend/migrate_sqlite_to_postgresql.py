@@ -18,7 +18,7 @@ import sqlite3
 import json
 import os
 from datetime import datetime
-from app import app, db, FAQ, Log, ConversationSession, Feedback, User
+from app import app, db, FAQ, FAQCorpusState, Log, ConversationSession, Feedback, User
 
 def export_sqlite_data(sqlite_db_path='faq.db'):
     """Export data from SQLite database to JSON files"""
@@ -102,6 +102,7 @@ def import_to_postgresql():
                     faq = FAQ(id=faq_data[0], question=faq_data[1], answer=faq_data[2])
                     db.session.merge(faq)  # Use merge to handle existing IDs
                 
+                FAQCorpusState.bump()
                 db.session.commit()
                 print(f"Imported {len(faqs_data)} FAQs")
             
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local OpenAI-compatible stand-in server for load and latency testing
+
+Implements POST /v1/chat/completions (including stream=true) and GET /v1/models
+with configurable latency, error rate and token throughput, so chat throughput
+can be benchmarked offline and reproducibly. Standard library only.
+
+Usage:
+    python mock_llm_server.py --port 8001 --latency lognormal:800:0.5 \\
+        --error-rate 0.02 --tokens-per-second 40 --seed 42
+
+    # Point the backend at it
+    export OPENAI_BASE_URL=http://127.0.0.1:8001/v1
+    export OPENAI_API_KEY=mock-key
+
+Latency specs (milliseconds, applied before the first token):
+    fixed:MS | uniform:MIN:MAX | normal:MEAN:STD | lognormal:MEDIAN:SIGMA | exponential:MEAN
+
+GET /mock/stats returns request, error and streaming counters.
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+FILLER_WORDS = (
+    "Based on the FAQ information please check the employee portal for the latest "
+    "details and contact the relevant department if you need further help with your request"
+).split()
+
+
+class LatencyDistribution:
+    """Samples request latencies in milliseconds from a spec like 'lognormal:800:0.5'"""
+
+    def __init__(self, spec: str, rng: random.Random):
+        kind, *params = spec.split(':')
+        self.kind = kind
+        self.params = [float(param) for param in params]
+        self.rng = rng
+
+        expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exponential': 1}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"Invalid latency spec: {spec}")
+
+    def sample_ms(self) -> float:
+        if self.kind == 'fixed':
+            return self.params[0]
+        if self.kind == 'uniform':
+            return self.rng.uniform(*self.params)
+        if self.kind == 'normal':
+            return max(0.0, self.rng.gauss(*self.params))
+        if self.kind == 'lognormal':
+            median, sigma = self.params
+            return self.rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return self.rng.expovariate(1.0 / self.params[0]) if self.params[0] > 0 else 0.0
+
+
+class MockLLMConfig:
+    def __init__(self, latency: str = 'fixed:0', error_rate: float = 0.0, error_status: int = 500,
+                 tokens_per_second: float = 0.0, completion_tokens: int = 60, seed: int = None):
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.latency = LatencyDistribution(latency, self.rng)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+
+        self.stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'streams': 0, 'completion_tokens': 0}
+
+    def sample(self) -> tuple:
+        """Return (latency_ms, should_fail) for one request"""
+        with self.rng_lock:
+            return self.latency.sample_ms(), self.rng.random() < self.error_rate
+
+    def count(self, key: str, amount: int = 1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+
+def completion_tokens_for(body: Dict[str, Any], config: MockLLMConfig) -> List[str]:
+    """Build a deterministic answer that echoes the user's question"""
+    user_messages = [message.get('content', '') for message in body.get('messages', []) if message.get('role') == 'user']
+    question = user_messages[-1].splitlines()[0] if user_messages else ''
+    words = ["Mock", "answer", "to:"] + question.replace('User question:', '').split()
+
+    limit = min(config.completion_tokens, int(body.get('max_tokens') or config.completion_tokens))
+    while len(words) < limit:
+        words.extend(FILLER_WORDS)
+    return [word if i == 0 else ' ' + word for i, word in enumerate(words[:limit])]
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real endpoint
+    config: MockLLMConfig = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {'object': 'list', 'data': [{'id': 'gpt-3.5-turbo', 'object': 'model', 'owned_by': 'mock'}]})
+        elif self.path == '/mock/stats':
+            with self.config.stats_lock:
+                self._send_json(200, dict(self.config.stats))
+        else:
+            self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': {'message': 'Invalid JSON body', 'type': 'invalid_request_error'}})
+            return
+
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+            return
+
+        self.config.count('requests')
+        latency_ms, should_fail = self.config.sample()
+        time.sleep(latency_ms / 1000)
+
+        if should_fail:
+            self.config.count('errors')
+            self._send_json(self.config.error_status, {'error': {'message': 'Mock upstream error', 'type': 'server_error'}})
+            return
+
+        tokens = completion_tokens_for(body, self.config)
+        self.config.count('completion_tokens', len(tokens))
+        if body.get('stream'):
+            self.config.count('streams')
+            self._stream_completion(body, tokens)
+        else:
+            self._send_completion(body, tokens)
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0.0
+
+    def _send_completion(self, body: Dict[str, Any], tokens: List[str]):
+        time.sleep(self._token_delay() * len(tokens))
+        prompt_tokens = sum(len(message.get('content', '').split()) for message in body.get('messages', []))
+        self._send_json(200, {
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'gpt-3.5-turbo'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ''.join(tokens)},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(tokens),
+                'total_tokens': prompt_tokens + len(tokens)
+            }
+        })
+
+    def _stream_completion(self, body: Dict[str, Any], tokens: List[str]):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get('model', 'gpt-3.5-turbo')
+
+        def chunk(delta: Dict[str, Any], finish_reason=None) -> Dict[str, Any]:
+            return {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': created,
+                'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+            }
+
+        self._write_event(chunk({'role': 'assistant', 'content': ''}))
+        for token in tokens:
+            time.sleep(self._token_delay())
+            self._write_event(chunk({'content': token}))
+        self._write_event(chunk({}, 'stop'))
+        self._write_chunk(b'data: [DONE]\n\n')
+        self._write_chunk(b'')
+
+    def _write_event(self, payload: Dict[str, Any]):
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def create_server(host: str = '127.0.0.1', port: int = 8001, config: MockLLMConfig = None) -> ThreadingHTTPServer:
+    """Create (but do not start) a mock server; port 0 picks a free port"""
+    handler = type('ConfiguredMockLLMHandler', (MockLLMHandler,), {'config': config or MockLLMConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OpenAI-compatible mock LLM server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', default='fixed:0', help='Time to first token, e.g. lognormal:800:0.5')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail (0-1)')
+    parser.add_argument('--error-status', type=int, default=500, help='HTTP status of failed requests')
+    parser.add_argument('--tokens-per-second', type=float, default=0.0, help='Token throughput (0 = unlimited)')
+    parser.add_argument('--completion-tokens', type=int, default=60, help='Tokens per answer (capped by max_tokens)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs')
+    args = parser.parse_args()
+
+    config = MockLLMConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        seed=args.seed
+    )
+    server = create_server(args.host, args.port, config)
+    print(f"Mock LLM server listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
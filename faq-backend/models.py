@@ -1,6 +1,8 @@
 # Create a database design and tables for the Capstone project application.
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -12,6 +14,8 @@ class FAQ(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     question = db.Column(db.Text, nullable=False)
     answer = db.Column(db.Text, nullable=False)
+    revision = db.Column(db.Integer, nullable=False, default=1)  # Incremented on every edit
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def to_dict(self):
         return {
@@ -20,6 +24,71 @@ class FAQ(db.Model):
             "answer": self.answer
         }
 
+    @classmethod
+    def revisions(cls):
+        """Return {id: revision} of every FAQ without loading questions or answers"""
+        return dict(db.session.query(cls.id, cls.revision).all())
+
+    @classmethod
+    def get_many(cls, ids, chunk_size=500):
+        """Return the FAQs with the given ids, queried in chunks to keep IN lists short"""
+        ids = list(ids)
+        faqs = []
+        for start in range(0, len(ids), chunk_size):
+            faqs.extend(cls.query.filter(cls.id.in_(ids[start:start + chunk_size])).all())
+        return faqs
+
+class FAQCorpusState(db.Model):
+    """Single-row table holding the FAQ corpus revision.
+
+    The FAQ CRUD endpoints bump the revision whenever a FAQ is added, edited or
+    deleted, so the chat path only needs to read one value to know whether its
+    in-memory FAQ index is still current. On PostgreSQL every bump also sends
+    a NOTIFY on NOTIFY_CHANNEL, delivered to listening workers at commit.
+    """
+    __tablename__ = 'faq_corpus_state'
+    NOTIFY_CHANNEL = 'faq_corpus_changed'
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def current_revision(cls):
+        """Return the current corpus revision (0 if no FAQ was ever changed)"""
+        revision = db.session.query(cls.revision).filter_by(id=1).scalar()
+        return revision or 0
+
+    @classmethod
+    def ensure_row(cls):
+        """Create the revision row if it is missing; called once at startup (see upgrade_faq_table)
+
+        Concurrent callers (several workers starting at once) may race to insert
+        it; the losers roll back and find the row the winner committed.
+        """
+        if db.session.get(cls, 1) is not None:
+            return
+        db.session.add(cls(id=1, revision=0, updated_at=datetime.utcnow()))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+
+    @classmethod
+    def bump(cls):
+        """Increment the corpus revision; the caller commits the session
+
+        A single UPDATE of the row created by ensure_row(), so concurrent bumps
+        serialize on the row lock instead of racing to insert it.
+        """
+        updated = cls.query.filter_by(id=1).update({
+            cls.revision: cls.revision + 1,
+            cls.updated_at: datetime.utcnow()
+        }, synchronize_session=False)
+        if not updated:
+            raise RuntimeError("faq_corpus_state row is missing; run upgrade_faq_table() (init_database) first")
+        if db.session.get_bind().dialect.name == 'postgresql':
+            db.session.execute(text("SELECT pg_notify(:channel, '')"), {'channel': cls.NOTIFY_CHANNEL})
+
 class Log(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     question = db.Column(db.Text, nullable=False)
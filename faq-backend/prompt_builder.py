@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Token-budgeted LLM prompts
+Builds the chat completion messages for a question and its FAQ context within
+an input-token budget. Token counts are estimated locally (no tokenizer
+download, no API call): words of up to eight letters count as one token, longer
+words one per five letters, digits one per three, every other symbol one -
+close to, and rather above, the GPT tokenizers' counts for English text.
+
+The system prompt and the user question are always sent in full; the budget
+bounds the FAQ context. Each context FAQ, in rank order, gets an equal share of
+what is left (shares unused by short FAQs carry over to the next ones). An
+answer that does not fit its share is reduced to the sentences sharing the
+most terms with the question, kept in reading order; sentences sharing none
+are dropped.
+"""
+
+import re
+import threading
+from typing import Any, Dict, List
+
+from keyword_service import keyword_service
+
+SYSTEM_PROMPT = """
+You are a professional enterprise internal AI customer service assistant. Please provide accurate and helpful answers based on user questions and provided FAQ information.
+
+Answer requirements:
+1. If there is relevant information in the FAQ, prioritize using FAQ content to answer
+2. If there is no complete match in the FAQ, provide reasonable suggestions based on common sense and professional knowledge
+3. Answers should be concise and clear, with a friendly and professional tone
+4. If the answer cannot be determined, suggest users contact relevant departments
+5. Answer in English
+            """
+
+CONTEXT_HEADER = "\n\nRelevant FAQ information:\n"
+
+# Chat format overhead per message and for priming the reply
+TOKENS_PER_MESSAGE = 3
+REPLY_TOKENS = 3
+
+_TOKEN_PIECES = re.compile(r'[A-Za-z]+|\d+|[^\sA-Za-z\d]')
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate number of tokens in text"""
+    tokens = 0
+    for piece in _TOKEN_PIECES.findall(text):
+        if piece[0].isalpha():
+            tokens += 1 if len(piece) <= 8 else (len(piece) + 4) // 5
+        elif piece[0].isdigit():
+            tokens += (len(piece) + 2) // 3
+        else:
+            tokens += 1
+    return tokens
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Approximate prompt tokens of a chat completion request"""
+    return sum(TOKENS_PER_MESSAGE + estimate_tokens(message['content']) for message in messages) + REPLY_TOKENS
+
+
+def relevant_sentences(text: str, terms: set, max_tokens: int) -> str:
+    """
+    Fit text into max_tokens
+
+    Returns text unchanged if it fits; otherwise the sentences sharing the most
+    terms with the question (ties: earlier first) that fit, in reading order -
+    or, if no sentence shares a term, the leading sentences that fit. If not
+    even one sentence fits, the best one is cut to max_tokens; with no budget
+    left or no sentences at all, the result is ''.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    sentences = [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+    # Nothing fits a budget the question already used up (max_tokens < 0), nor an empty answer
+    if not sentences or max_tokens <= 0:
+        return ''
+    tokens = [estimate_tokens(sentence) for sentence in sentences]
+    overlaps = [len(terms.intersection(keyword_service.extract_keywords(sentence))) for sentence in sentences]
+    # Only sentences sharing a term with the question; without any, the answer's opening sentences
+    ranked = sorted((i for i in range(len(sentences)) if overlaps[i] or not any(overlaps)),
+                    key=lambda i: (-overlaps[i], i))
+
+    chosen = []
+    used = 0
+    for i in ranked:
+        if used + tokens[i] <= max_tokens:
+            chosen.append(i)
+            used += tokens[i]
+
+    if not chosen:
+        words = []
+        for word in sentences[ranked[0]].split():
+            if estimate_tokens(' '.join(words + [word, '...'])) > max_tokens:
+                break
+            words.append(word)
+        return ' '.join(words) + ' ...' if words else ''
+
+    return ' '.join(sentences[i] for i in sorted(chosen))
+
+
+class PromptBuilder:
+    def __init__(self, max_input_tokens: int = 1000, system_prompt: str = SYSTEM_PROMPT):
+        """
+        Args:
+            max_input_tokens: Input-token budget of one request (<= 0 disables trimming)
+            system_prompt: System message sent with every request
+        """
+        self.max_input_tokens = max_input_tokens
+        self.system_prompt = system_prompt
+
+        self._lock = threading.Lock()
+        self._stats = {'contexts': 0, 'trimmed_faqs': 0, 'dropped_faqs': 0, 'tokens_saved': 0}
+
+    def build_messages(self, user_question: str, context_faqs: List[str] = None) -> List[Dict[str, str]]:
+        """Chat completion messages for a question and its (already budgeted) FAQ context"""
+        context = CONTEXT_HEADER + "\n".join(context_faqs) if context_faqs else ""
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": f"User question: {user_question}{context}"}
+        ]
+
+    def context_faqs(self, user_question: str, context_hits: List[Dict[str, Any]]) -> List[str]:
+        """
+        Format retrieval hits as prompt context within the input-token budget
+
+        Args:
+            user_question: User question (its terms pick the sentences to keep)
+            context_hits: Hits with 'question' and 'answer', best first
+
+        Returns:
+            "Q: ...\\nA: ..." entries for build_messages()
+        """
+        entries = [f"Q: {hit['question']}\nA: {hit['answer']}" for hit in context_hits]
+        if self.max_input_tokens <= 0 or not entries:
+            return entries
+
+        available = (self.max_input_tokens - estimate_message_tokens(self.build_messages(user_question))
+                     - estimate_tokens(CONTEXT_HEADER))
+        terms = set(keyword_service.extract_keywords(user_question))
+        saved = trimmed = dropped = 0
+
+        budgeted = []
+        for position, (hit, entry) in enumerate(zip(context_hits, entries)):
+            entry_tokens = estimate_tokens(entry)
+            share = available // (len(entries) - position)
+
+            if entry_tokens > share:
+                prefix = f"Q: {hit['question']}\nA: "
+                answer = relevant_sentences(hit['answer'], terms, share - estimate_tokens(prefix))
+                if not answer:
+                    dropped += 1
+                    saved += entry_tokens
+                    continue
+                entry = prefix + answer
+                trimmed += 1
+                saved += entry_tokens - estimate_tokens(entry)
+                entry_tokens = estimate_tokens(entry)
+
+            budgeted.append(entry)
+            available -= entry_tokens
+
+        with self._lock:
+            self._stats['contexts'] += 1
+            self._stats['trimmed_faqs'] += trimmed
+            self._stats['dropped_faqs'] += dropped
+            self._stats['tokens_saved'] += saved
+        return budgeted
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['max_input_tokens'] = self.max_input_tokens
+        return stats
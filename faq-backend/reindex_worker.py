@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Background FAQ reindexing
+FAQ edits enqueue a reindex request instead of rebuilding inside a chat
+request. One daemon thread per process serves the requests: it waits until a
+burst of edits (a bulk import, an editor saving several FAQs) has gone quiet
+for debounce_seconds - but never longer than max_delay_seconds after the first
+edit of the burst - and then runs a single rebuild, which publishes the new
+index snapshot. Chat requests keep reading the previous snapshot meanwhile.
+
+Requests arriving while a rebuild runs are served by one more rebuild after it.
+A failed rebuild is logged and counted; the next request retries it.
+"""
+
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_workers = weakref.WeakSet()
+
+
+class ReindexWorker:
+    def __init__(self, rebuild: Callable[[], Any], debounce_seconds: float = 0.5,
+                 max_delay_seconds: float = 5.0, name: str = 'faq-reindex'):
+        """
+        Args:
+            rebuild: Brings the index up to date; called on the worker thread
+            debounce_seconds: Quiet period that ends a burst of requests
+            max_delay_seconds: Upper bound between a burst's first request and its rebuild
+            name: Worker thread name
+        """
+        self.rebuild = rebuild
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max(max_delay_seconds, debounce_seconds)
+        self.name = name
+
+        self._stats = {'requests': 0, 'rebuilds': 0, 'coalesced': 0, 'failures': 0,
+                       'last_rebuild_ms': None, 'last_error': None}
+        self._reset()
+        _workers.add(self)
+
+    def _reset(self):
+        self._condition = threading.Condition()
+        self._pending = 0
+        self._first_request_at = 0.0
+        self._last_request_at = 0.0
+        self._running = False
+        self._stopping = False
+        self._thread = None
+
+    def request(self):
+        """Schedule a rebuild; returns immediately"""
+        with self._condition:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_request_at = now
+            self._pending += 1
+            self._last_request_at = now
+            self._stats['requests'] += 1
+            self._stopping = False
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until no rebuild is pending or running; False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._running, timeout)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the worker thread; pending requests are dropped"""
+        with self._condition:
+            self._stopping = True
+            self._pending = 0
+            thread = self._thread
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            stats = dict(self._stats)
+            stats['pending'] = self._pending
+            stats['running'] = self._running
+            stats['alive'] = self._thread is not None and self._thread.is_alive()
+        stats['debounce_ms'] = self.debounce_seconds * 1000
+        stats['max_delay_ms'] = self.max_delay_seconds * 1000
+        return stats
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._stopping)
+                if self._stopping:
+                    return
+
+                # Debounce: wait for the burst to go quiet, bounded by max_delay_seconds
+                while not self._stopping:
+                    deadline = min(self._last_request_at + self.debounce_seconds,
+                                   self._first_request_at + self.max_delay_seconds)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._stopping:
+                    return
+
+                handled = self._pending
+                self._pending = 0
+                self._running = True
+
+            started = time.perf_counter()
+            error = None
+            try:
+                self.rebuild()
+            except Exception as e:
+                logger.error(f"Background FAQ reindex failed: {e}")
+                error = str(e)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            with self._condition:
+                self._running = False
+                self._stats['rebuilds'] += 1
+                self._stats['coalesced'] += handled - 1
+                self._stats['last_rebuild_ms'] = round(elapsed_ms, 2)
+                self._stats['last_error'] = error
+                if error is not None:
+                    self._stats['failures'] += 1
+                self._condition.notify_all()
+
+
+def _reset_workers_after_fork():
+    # The worker thread does not survive a fork and its lock may have been held
+    # at fork time; a forked child starts with a fresh, idle worker
+    for worker in list(_workers):
+        worker._reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_workers_after_fork)
@@ -0,0 +1,805 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pluggable FAQ retrieval engines
+AIService serves retrieval from its built-in TF-IDF index by default; setting
+AI_RETRIEVAL_ENGINE selects one of the engines registered here instead.
+
+An engine indexes the FAQ questions (row i = i-th question) and implements:
+    build(questions)                - (re)index the FAQ questions
+    transform(questions)            - L2-normalized sparse question vectors, used
+                                      by the semantic answer cache
+    search(questions, k, vectors)   - per question, (rows, similarities) of the
+                                      best k rows, best first, similarities in [0, 1]
+    clone()                         - an unbuilt engine with the same settings
+
+A built engine is treated as immutable: AIService builds a clone for every new
+index snapshot instead of rebuilding the engine that requests are reading.
+
+'hybrid' runs several engines concurrently and fuses their rankings.
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from answer_cache import normalize_question
+from llm_resilience import LatencyTracker
+
+SearchResult = Tuple[np.ndarray, np.ndarray]
+
+EMPTY_RESULT = (np.zeros(0, dtype=np.int64), np.zeros(0))
+
+
+def top_candidates(scores: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> SearchResult:
+    """
+    Best k positive scores, best first, without sorting every score
+
+    Args:
+        scores: Score per candidate
+        k: Number of candidates to keep
+        rows: Row number of each candidate (defaults to its position)
+    """
+    count = min(len(scores), k)
+    if count <= 0:
+        return EMPTY_RESULT
+
+    top = np.argpartition(-scores, count - 1)[:count]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    top = top[scores[top] > 0]
+    return (top if rows is None else rows[top]), scores[top]
+
+
+class RetrievalEngine:
+    """Base class for retrieval engines; see the module docstring for the interface"""
+
+    name = None
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def build(self, questions: List[str]):
+        raise NotImplementedError
+
+    def transform(self, questions: List[str]) -> csr_matrix:
+        raise NotImplementedError
+
+    def search(self, questions: List[str], k: int, vectors: csr_matrix = None) -> List[SearchResult]:
+        raise NotImplementedError
+
+    def clone(self) -> 'RetrievalEngine':
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'engine': self.name, 'faqs': len(self)}
+
+
+class BM25Engine(RetrievalEngine):
+    """
+    Okapi BM25 over an inverted index with MaxScore early termination
+
+    Postings are stored term by term in three flat arrays (CSC layout): doc ids
+    (int32, sorted within a term) and precomputed BM25 impacts (float32), plus
+    per-term offsets and maximum impacts. A query only reads the postings of its
+    own terms:
+
+    - Terms are processed from the highest maximum impact down. Documents are
+      accumulated from full posting lists while an unseen document could still
+      reach the current k-th best score.
+    - Once the remaining terms' maximum impacts add up to less than that score
+      (MaxScore), no new document can enter the top k. The remaining lists are
+      then only probed, by binary search, for the surviving candidates, and
+      candidates that can no longer reach the top k are dropped.
+
+    Similarities start from the BM25 score divided by the score the question
+    itself would get as a document, so an identical question scores 1.0. That
+    ratio runs much lower than TF-IDF cosine for the same paraphrase (median
+    about 0.3 against 0.7 on benchmark_retrieval.py corpora), which would send
+    almost every question past the 0.3/0.7 FAQ confidence thresholds to the
+    LLM. It is therefore raised to similarity_exponent, a power fitted by least
+    squares against TF-IDF cosine of the same top hits (0.30 at 1k FAQs, 0.27
+    at 10k). The mapping keeps the ranking and 1.0 for identical questions.
+    """
+
+    name = 'bm25'
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, similarity_exponent: float = 0.3):
+        self.k1 = k1
+        self.b = b
+        self.similarity_exponent = similarity_exponent
+        # Same analyzer as the TF-IDF model (English stop words, unigrams and bigrams)
+        self.vectorizer = CountVectorizer(stop_words='english', ngram_range=(1, 2))
+        self._analyzer = self.vectorizer.build_analyzer()
+        self._clear()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {'queries': 0, 'postings_scanned': 0, 'postings_probed': 0, 'early_terminations': 0}
+
+    def __len__(self) -> int:
+        return self._doc_count
+
+    def clone(self) -> 'BM25Engine':
+        return BM25Engine(self.k1, self.b, self.similarity_exponent)
+
+    def build(self, questions: List[str]):
+        if not questions:
+            self._clear()
+            return
+
+        counts = self.vectorizer.fit_transform(questions).tocsc()
+        counts.sort_indices()
+        doc_count = counts.shape[0]
+        doc_lengths = np.asarray(counts.sum(axis=1)).ravel()
+        avg_doc_len = max(float(doc_lengths.mean()), 1.0)
+
+        doc_freq = np.diff(counts.indptr)
+        idf = np.log(1 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+        terms = np.repeat(np.arange(counts.shape[1]), doc_freq)
+        tf = counts.data.astype(np.float64)
+        length_norm = self.k1 * (1 - self.b + self.b * doc_lengths[counts.indices] / avg_doc_len)
+        impacts = idf[terms] * tf * (self.k1 + 1) / (tf + length_norm)
+
+        self._vocabulary = dict(self.vectorizer.vocabulary_)
+        self._doc_count = doc_count
+        self._avg_doc_len = avg_doc_len
+        self._idf = idf
+        self._offsets = counts.indptr.astype(np.int64)
+        self._docs = counts.indices.astype(np.int32)
+        self._impacts = impacts.astype(np.float32)
+        self._max_impacts = np.maximum.reduceat(self._impacts, self._offsets[:-1]) if len(impacts) else self._impacts
+
+    def transform(self, questions: List[str]) -> csr_matrix:
+        """IDF-weighted, L2-normalized term vectors (used by the semantic answer cache)"""
+        if not self._doc_count:
+            return csr_matrix((len(questions), 0))
+        vectors = self.vectorizer.transform(questions).astype(np.float64).tocsr()
+        vectors.data *= self._idf[vectors.indices]
+        return normalize(vectors, norm='l2', copy=False)
+
+    def search(self, questions: List[str], k: int, vectors: csr_matrix = None) -> List[SearchResult]:
+        return [self._search_one(question, k) for question in questions]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            'engine': self.name,
+            'faqs': self._doc_count,
+            'terms': len(self._vocabulary),
+            'postings': int(len(self._docs)),
+            'postings_bytes': int(self._docs.nbytes + self._impacts.nbytes + self._offsets.nbytes)
+        })
+        return stats
+
+    def _search_one(self, question: str, k: int) -> SearchResult:
+        tokens = self._analyzer(question)
+        terms = {self._vocabulary[token] for token in tokens if token in self._vocabulary}
+        if not terms or k <= 0:
+            return EMPTY_RESULT
+
+        normalizer = self._self_score(tokens)
+        order = sorted(terms, key=lambda term: -self._max_impacts[term])
+        # remaining_bound[i]: the most terms order[i:] can still add to any document
+        remaining_bound = np.cumsum(self._max_impacts[order][::-1], dtype=np.float64)[::-1]
+
+        candidates = np.zeros(0, dtype=np.int32)
+        scores = np.zeros(0)
+        threshold = 0.0
+        scanned = probed = 0
+        terminated = False
+
+        for position, term in enumerate(order):
+            docs, impacts = self._postings(term)
+
+            if len(candidates) >= k and remaining_bound[position] < threshold:
+                # MaxScore: unseen documents can no longer reach the top k
+                terminated = True
+                alive = scores + remaining_bound[position] >= threshold
+                candidates, scores = candidates[alive], scores[alive]
+
+                slots = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+                found = docs[slots] == candidates
+                scores[found] += impacts[slots[found]]
+                probed += len(candidates)
+            else:
+                merged_docs = np.concatenate([candidates, docs])
+                merged_scores = np.concatenate([scores, impacts])
+                candidates, inverse = np.unique(merged_docs, return_inverse=True)
+                scores = np.bincount(inverse, weights=merged_scores)
+                scanned += len(docs)
+
+            if len(scores) >= k:
+                threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+
+        with self._stats_lock:
+            self._stats['queries'] += 1
+            self._stats['postings_scanned'] += scanned
+            self._stats['postings_probed'] += probed
+            self._stats['early_terminations'] += int(terminated)
+
+        rows, best = top_candidates(scores, k, candidates.astype(np.int64))
+        return rows, np.minimum(best / normalizer, 1.0) ** self.similarity_exponent
+
+    def _clear(self):
+        self._vocabulary = {}
+        self._doc_count = 0
+        self._avg_doc_len = 1.0
+        self._idf = np.zeros(0)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._docs = np.zeros(0, dtype=np.int32)
+        self._impacts = np.zeros(0, dtype=np.float32)
+        self._max_impacts = np.zeros(0, dtype=np.float32)
+
+    def _postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self._offsets[term], self._offsets[term + 1]
+        return self._docs[start:end], self._impacts[start:end]
+
+    def _self_score(self, tokens: List[str]) -> float:
+        """BM25 score of the question against itself; unknown terms count with the highest IDF"""
+        length_norm = self.k1 * (1 - self.b + self.b * len(tokens) / self._avg_doc_len)
+        unknown_idf = np.log(1 + (self._doc_count + 0.5) / 0.5)
+
+        score = 0.0
+        for token, tf in Counter(tokens).items():
+            term = self._vocabulary.get(token)
+            idf = self._idf[term] if term is not None else unknown_idf
+            score += idf * tf * (self.k1 + 1) / (tf + length_norm)
+        return score
+
+
+class CosineEngine(RetrievalEngine):
+    """Cosine similarity over L2-normalized TF-IDF rows; subclasses choose the vectorizer"""
+
+    def __init__(self):
+        self.vectorizer = self._make_vectorizer()
+        self.vectors = None
+
+    def _make_vectorizer(self) -> TfidfVectorizer:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0] if self.vectors is not None else 0
+
+    def clone(self) -> 'CosineEngine':
+        return type(self)()
+
+    def build(self, questions: List[str]):
+        self.vectors = self.vectorizer.fit_transform(questions).tocsr() if questions else None
+
+    def transform(self, questions: List[str]) -> csr_matrix:
+        return self.vectorizer.transform(questions)
+
+    def search(self, questions: List[str], k: int, vectors: csr_matrix = None) -> List[SearchResult]:
+        if self.vectors is None:
+            return [EMPTY_RESULT for _ in questions]
+        if vectors is None:
+            vectors = self.transform(questions)
+
+        similarity_matrix = (vectors @ self.vectors.T).tocsr()
+        results = []
+        for i in range(len(questions)):
+            # Only FAQs sharing a feature with the question have a stored score
+            start, end = similarity_matrix.indptr[i], similarity_matrix.indptr[i + 1]
+            results.append(top_candidates(similarity_matrix.data[start:end], k,
+                                          similarity_matrix.indices[start:end].astype(np.int64)))
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'engine': self.name, 'faqs': len(self), 'features': len(getattr(self.vectorizer, 'vocabulary_', {}))}
+
+
+class TfidfEngine(CosineEngine):
+    """Word unigram and bigram TF-IDF, the same model as AIService's built-in index"""
+
+    name = 'tfidf'
+
+    def _make_vectorizer(self) -> TfidfVectorizer:
+        return TfidfVectorizer(stop_words='english', ngram_range=(1, 2), max_features=1000)
+
+
+class CharNgramEngine(CosineEngine):
+    """Character 3-5 gram TF-IDF within word boundaries; tolerant of typos and word forms"""
+
+    name = 'char'
+
+    def _make_vectorizer(self) -> TfidfVectorizer:
+        return TfidfVectorizer(analyzer='char_wb', ngram_range=(3, 5), sublinear_tf=True, lowercase=True)
+
+
+class LSAEngine(RetrievalEngine):
+    """
+    Dense LSA embeddings searched through an inverted-file (IVF) index
+
+    build() projects the TF-IDF matrix onto its top singular vectors
+    (TruncatedSVD) and stores the L2-normalized embeddings as float32. The
+    embeddings are clustered with spherical k-means into about sqrt(n) lists;
+    rows are stored list by list (CSR layout: offsets plus row ids), so a
+    query scores the centroids, then only the rows of the n_probe closest
+    lists. Corpora with no more than n_probe lists are searched exactly.
+
+    The embedding search only generates candidates (at least n_candidates):
+    LSA cosine is much higher than TF-IDF cosine for loosely related text, so
+    the candidates are re-scored with the TF-IDF cosine that AIService's
+    confidence thresholds are calibrated for, and rows sharing no term with
+    the question are dropped.
+
+    Recall@k of the IVF search against exact search over the same embeddings
+    is measured on a sample of the indexed questions at build time and
+    reported in get_stats(); measure_recall() does the same for any queries.
+    """
+
+    name = 'lsa'
+
+    def __init__(self, n_components: int = 256, n_lists: int = 0, n_probe: int = 16,
+                 recall_sample: int = 200, seed: int = 0, n_candidates: int = 50):
+        """
+        Args:
+            n_components: Embedding dimensions (capped by the corpus size)
+            n_lists: IVF lists; 0 picks about sqrt(number of FAQs)
+            n_probe: Lists searched per query
+            recall_sample: Indexed questions used to measure recall@10 at build time (0 = skip)
+            seed: Seed for the SVD and k-means initialization
+            n_candidates: Embedding-search candidates re-scored per query (at least k)
+        """
+        self.n_components = n_components
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.recall_sample = recall_sample
+        self.seed = seed
+        self.n_candidates = n_candidates
+
+        self.vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2), sublinear_tf=True)
+        self._clear()
+
+    def __len__(self) -> int:
+        return self.embeddings.shape[0]
+
+    def clone(self) -> 'LSAEngine':
+        return LSAEngine(self.n_components, self.n_lists, self.n_probe, self.recall_sample, self.seed,
+                         self.n_candidates)
+
+    def build(self, questions: List[str]):
+        if not questions:
+            self._clear()
+            return
+
+        started = time.perf_counter()
+        tfidf = self.tfidf = self.vectorizer.fit_transform(questions).tocsr()
+        components = min(self.n_components, tfidf.shape[1] - 1, tfidf.shape[0] - 1)
+        self.svd = TruncatedSVD(n_components=components, random_state=self.seed) if components >= 1 else None
+        dense = self.svd.fit_transform(tfidf) if self.svd is not None else tfidf.toarray()
+        self.embeddings = normalize(dense).astype(np.float32)
+
+        n_lists = self.n_lists or int(np.sqrt(len(questions)))
+        n_lists = max(1, min(n_lists, len(questions)))
+        self.centroids, assignments = self._spherical_kmeans(self.embeddings, n_lists)
+        order = np.argsort(assignments, kind='stable')
+        self._list_rows = order.astype(np.int32)
+        self._list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))])
+
+        self._build_stats = {
+            'dimensions': int(self.embeddings.shape[1]),
+            'lists': n_lists,
+            'build_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+        if self.recall_sample:
+            rng = np.random.default_rng(self.seed)
+            sample = rng.choice(len(questions), size=min(self.recall_sample, len(questions)), replace=False)
+            self._build_stats['recall_at_10'] = self.measure_recall([questions[i] for i in sample], k=10)
+
+    def transform(self, questions: List[str]) -> csr_matrix:
+        """TF-IDF vectors of the questions (used by the semantic answer cache)"""
+        return self.vectorizer.transform(questions)
+
+    def embed(self, questions: List[str], vectors: csr_matrix = None) -> np.ndarray:
+        """L2-normalized float32 LSA embeddings (of the given TF-IDF vectors, if any)"""
+        tfidf = vectors if vectors is not None else self.vectorizer.transform(questions)
+        dense = self.svd.transform(tfidf) if self.svd is not None else tfidf.toarray()
+        return normalize(dense).astype(np.float32)
+
+    def search(self, questions: List[str], k: int, vectors: csr_matrix = None, exact: bool = False) -> List[SearchResult]:
+        """Embedding-search candidates, ranked and scored by TF-IDF cosine"""
+        if not len(self) or not questions:
+            return [EMPTY_RESULT for _ in questions]
+        if vectors is None:
+            vectors = self.transform(questions)
+
+        candidates = self.embedding_search(questions, max(k, self.n_candidates), vectors, exact)
+        results = []
+        for i, (rows, _) in enumerate(candidates):
+            scores = (self.tfidf[rows] @ vectors[i].T).toarray().ravel()
+            results.append(top_candidates(scores, k, rows))
+        return results
+
+    def embedding_search(self, questions: List[str], k: int, vectors: csr_matrix = None,
+                         exact: bool = False) -> List[SearchResult]:
+        """Per question, the best k rows by LSA embedding cosine (IVF unless exact)"""
+        if not len(self) or not questions:
+            return [EMPTY_RESULT for _ in questions]
+
+        queries = self.embed(questions, vectors)
+        if exact or len(self.centroids) <= self.n_probe:
+            return [top_candidates(scores, k) for scores in queries @ self.embeddings.T]
+
+        n_probe = min(self.n_probe, len(self.centroids))
+        nearest_lists = np.argpartition(-(queries @ self.centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+        results = []
+        for query, lists in zip(queries, nearest_lists):
+            rows = np.concatenate([
+                self._list_rows[self._list_offsets[i]:self._list_offsets[i + 1]] for i in lists
+            ]).astype(np.int64)
+            results.append(top_candidates(self.embeddings[rows] @ query, k, rows))
+        return results
+
+    def measure_recall(self, questions: List[str], k: int = 10) -> float:
+        """Share of the exact top-k rows (by embedding cosine) that the IVF search also returns"""
+        approximate = self.embedding_search(questions, k)
+        exact = self.embedding_search(questions, k, exact=True)
+        found = sum(len(np.intersect1d(a_rows, e_rows)) for (a_rows, _), (e_rows, _) in zip(approximate, exact))
+        expected = sum(len(e_rows) for e_rows, _ in exact)
+        return round(found / expected, 4) if expected else 1.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {'engine': self.name, 'faqs': len(self), 'n_probe': self.n_probe,
+                 'embedding_bytes': int(self.embeddings.nbytes)}
+        stats.update(self._build_stats)
+        return stats
+
+    def _clear(self):
+        self.svd = None
+        self.tfidf = None
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self._list_offsets = np.zeros(1, dtype=np.int64)
+        self._list_rows = np.zeros(0, dtype=np.int32)
+        self._build_stats = {}
+
+    def _spherical_kmeans(self, points: np.ndarray, n_lists: int, iterations: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Cosine k-means on unit vectors; centroids are trained on a sample, then every point is assigned"""
+        rng = np.random.default_rng(self.seed)
+        sample = points
+        if len(points) > 64 * n_lists:
+            sample = points[rng.choice(len(points), size=64 * n_lists, replace=False)]
+
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = normalize(sums).astype(np.float32)
+
+        # Assign in chunks to bound the size of the score matrix
+        assignments = np.concatenate([
+            np.argmax(points[start:start + 8192] @ centroids.T, axis=1)
+            for start in range(0, len(points), 8192)
+        ])
+        return centroids, assignments
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_executor_workers = 0
+# Secondary searches submitted to the shared pool and not yet finished or cancelled
+_executor_pending = 0
+
+
+def _search_executor(max_workers: int) -> ThreadPoolExecutor:
+    """Search threads shared by all hybrid engines of this process, sized by the first caller
+
+    Recreated in forked workers, whose copy of the pool has no threads.
+    """
+    global _executor, _executor_pid, _executor_workers, _executor_pending
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hybrid-retrieval')
+            _executor_pid = os.getpid()
+            _executor_workers = max_workers
+            _executor_pending = 0
+        return _executor
+
+
+def _submit_search(max_workers: int, function, *args) -> Optional[Future]:
+    """Submit a secondary search to the shared pool, or return None when the pool is backed up
+
+    Searches beyond one per pool thread would only queue behind other requests'
+    searches and miss their budget anyway, so they are shed instead of queued.
+    """
+    global _executor_pending
+    executor = _search_executor(max_workers)
+    with _executor_lock:
+        if _executor_pending >= _executor_workers:
+            return None
+        _executor_pending += 1
+    future = executor.submit(function, *args)
+    future.add_done_callback(_search_finished)
+    return future
+
+
+def _search_finished(future: Future):
+    """Done callback of _submit_search(); also runs for cancelled futures"""
+    global _executor_pending
+    with _executor_lock:
+        _executor_pending -= 1
+
+
+class HybridResult(tuple):
+    """
+    (rows, similarities) of a fused ranking, unpacking like any SearchResult
+
+    Also carries timings_ms (search time per engine that answered within the
+    budget) and skipped (engines that missed it).
+    """
+
+    def __new__(cls, rows: np.ndarray, similarities: np.ndarray, timings_ms: Dict[str, float],
+                skipped: List[str]):
+        result = super().__new__(cls, (rows, similarities))
+        result.timings_ms = timings_ms
+        result.skipped = skipped
+        return result
+
+
+class HybridEngine(RetrievalEngine):
+    """
+    Several engines queried concurrently, rankings merged by reciprocal-rank fusion
+
+    Each engine returns its own top candidates; a row's fused score is the sum
+    of 1 / (rrf_k + rank) over the engines that ranked it, which rewards rows
+    several engines agree on without comparing their incompatible scores.
+    The fused order decides the ranking.
+
+    Hybrid only reorders candidates; it does not make hits more confident.
+    The reported similarity feeds AIService's confidence thresholds, which are
+    calibrated for word TF-IDF cosine, so it is the primary engine's
+    similarity, and the share of questions answered at high confidence is the
+    primary engine's (see benchmark_retrieval.py). What fusion changes is
+    which FAQ ranks first and which FAQs reach the LLM as context. Rows only the other engines found (e.g. through a typo only
+    the character n-grams match) get their best similarity capped at
+    secondary_similarity_cap, by default below the 0.3 FAQ match threshold:
+    they still reach the LLM as context but are never served as a FAQ answer
+    on their own, as character n-gram cosine runs high for unrelated questions.
+
+    The primary engine is searched in the calling thread and always waited
+    for; the others run on a search thread pool shared by all hybrid engines
+    of the process and are dropped from the fusion if they have not answered
+    when the time budget runs out. Dropped searches still queued are
+    cancelled, and while the pool has a search pending per thread new
+    secondary searches are shed (counted in 'shed') instead of queued, so
+    the budget bounds the work done as well as the response time.
+    """
+
+    name = 'hybrid'
+
+    def __init__(self, engines: Sequence[str] = ('tfidf', 'bm25', 'char'), rrf_k: float = 60,
+                 budget_ms: float = 50, max_workers: int = None, secondary_similarity_cap: float = 0.25):
+        """
+        Args:
+            engines: Registered engine names; the first one is the primary
+            rrf_k: Rank offset of the fusion; larger values flatten rank differences
+            budget_ms: Search time budget per question
+            max_workers: Search threads for the secondary engines (default: 4 per engine)
+            secondary_similarity_cap: Highest similarity of a row the primary engine did not rank
+        """
+        if not engines:
+            raise ValueError("Hybrid retrieval needs at least one engine")
+        self.engine_names = list(engines)
+        self.engines = [create_retrieval_engine(name) for name in engines]
+        self.rrf_k = rrf_k
+        self.budget_ms = budget_ms
+        self.max_workers = max_workers or 4 * len(self.engines)
+        self.secondary_similarity_cap = secondary_similarity_cap
+
+        self._stats_lock = threading.Lock()
+        self._stats = {'queries': 0, 'shed': 0, 'budget_misses': {engine.name: 0 for engine in self.engines}}
+        self._latency = {engine.name: LatencyTracker() for engine in self.engines}
+
+    def __len__(self) -> int:
+        return len(self.engines[0])
+
+    def clone(self) -> 'HybridEngine':
+        return HybridEngine(self.engine_names, self.rrf_k, self.budget_ms, self.max_workers,
+                            self.secondary_similarity_cap)
+
+    def build(self, questions: List[str]):
+        for engine in self.engines:
+            engine.build(questions)
+
+    def transform(self, questions: List[str]) -> csr_matrix:
+        """Vectors of the primary engine (used by the semantic answer cache)"""
+        return self.engines[0].transform(questions)
+
+    def search(self, questions: List[str], k: int, vectors: csr_matrix = None) -> List[HybridResult]:
+        if not questions:
+            return []
+
+        started = time.perf_counter()
+        futures = [_submit_search(self.max_workers, self._timed_search, engine, questions, k, None)
+                   for engine in self.engines[1:]]
+
+        # The primary never waits behind other requests' searches in the shared pool;
+        # only its vectors are in a space the caller knows
+        primary_result = self._timed_search(self.engines[0], questions, k, vectors)
+        remaining = self.budget_ms * len(questions) / 1000 - (time.perf_counter() - started)
+        submitted = [future for future in futures if future is not None]
+        wait(submitted, timeout=max(remaining, 0))
+
+        # Searches still queued when the budget ran out are cancelled, so they do not
+        # take pool threads (and the GIL) from later requests; running ones finish unused
+        answered = [primary_result]
+        skipped = []
+        shed = 0
+        for engine, future in zip(self.engines[1:], futures):
+            if future is None:
+                shed += 1
+                skipped.append(engine.name)
+            elif future.done() and not future.cancelled() and future.exception() is None:
+                answered.append(future.result())
+            else:
+                future.cancel()
+                skipped.append(engine.name)
+
+        timings_ms = {name: elapsed_ms for name, _, elapsed_ms in answered}
+        with self._stats_lock:
+            self._stats['queries'] += len(questions)
+            self._stats['shed'] += shed
+            for name in skipped:
+                self._stats['budget_misses'][name] = self._stats['budget_misses'].get(name, 0) + 1
+
+        return [
+            HybridResult(*self._fuse([results[i] for _, results, _ in answered], k), timings_ms, skipped)
+            for i in range(len(questions))
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = {'queries': self._stats['queries'], 'shed': self._stats['shed'],
+                     'budget_misses': dict(self._stats['budget_misses'])}
+        stats.update({
+            'engine': self.name,
+            'faqs': len(self),
+            'budget_ms': self.budget_ms,
+            'rrf_k': self.rrf_k,
+            'engines': {engine.name: engine.get_stats() for engine in self.engines},
+            'p50_ms': {name: tracker.percentile(50, min_samples=1) for name, tracker in list(self._latency.items())},
+            'p95_ms': {name: tracker.percentile(95, min_samples=1) for name, tracker in list(self._latency.items())}
+        })
+        return stats
+
+    def _timed_search(self, engine: RetrievalEngine, questions: List[str], k: int,
+                      vectors: Optional[csr_matrix]) -> Tuple[str, List[SearchResult], float]:
+        started = time.perf_counter()
+        results = engine.search(questions, k, vectors)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._latency.setdefault(engine.name, LatencyTracker()).add(elapsed_ms / len(questions))
+        return engine.name, results, elapsed_ms
+
+    def _fuse(self, rankings: List[SearchResult], k: int) -> SearchResult:
+        """Reciprocal-rank fusion of per-engine rankings (primary first) for one question"""
+        fused = {}
+        similarity = {}
+        secondary_similarity = {}
+        for position, (rows, similarities) in enumerate(rankings):
+            for rank, (row, row_similarity) in enumerate(zip(rows.tolist(), similarities.tolist())):
+                fused[row] = fused.get(row, 0.0) + 1 / (self.rrf_k + rank + 1)
+                if position == 0:
+                    similarity[row] = row_similarity
+                else:
+                    secondary_similarity[row] = max(secondary_similarity.get(row, 0.0), row_similarity)
+
+        if not fused:
+            return EMPTY_RESULT
+        for row, row_similarity in secondary_similarity.items():
+            if row not in similarity:
+                similarity[row] = min(row_similarity, self.secondary_similarity_cap)
+
+        # Ties in the fused score go to the higher similarity
+        order = sorted(fused, key=lambda row: (-fused[row], -similarity[row], row))[:k]
+        return np.array(order, dtype=np.int64), np.array([similarity[row] for row in order])
+
+
+class ExactMatchIndex:
+    """
+    Hash index from normalized FAQ question to FAQ id
+
+    Questions are folded with normalize_question (case, punctuation,
+    whitespace), so a copy-pasted FAQ title is found with one dict lookup.
+    FAQs sharing a normalized question are kept in insertion order and the
+    first one answers.
+
+    copy() is cheap (no re-normalization), so an index snapshot can take its
+    own copy and update only the changed FAQs; copies share the hit counters.
+    """
+
+    def __init__(self):
+        self._ids_by_key = {}
+        self._key_by_id = {}
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'lookups': 0, 'hits': 0}
+
+    def __len__(self) -> int:
+        return len(self._key_by_id)
+
+    def build(self, faq_ids: List[Any], questions: List[str]):
+        """Replace the index contents"""
+        ids_by_key = {}
+        key_by_id = {}
+        for faq_id, question in zip(faq_ids, questions):
+            key = normalize_question(question)
+            ids_by_key[key] = ids_by_key.get(key, ()) + (faq_id,)
+            key_by_id[faq_id] = key
+        with self._lock:
+            self._ids_by_key = ids_by_key
+            self._key_by_id = key_by_id
+
+    def update(self, faq_id: Any, question: Optional[str]):
+        """Add or re-key one FAQ; a question of None removes it"""
+        key = normalize_question(question) if question is not None else None
+        with self._lock:
+            old_key = self._key_by_id.pop(faq_id, None)
+            if old_key is not None:
+                ids = tuple(other for other in self._ids_by_key[old_key] if other != faq_id)
+                if ids:
+                    self._ids_by_key[old_key] = ids
+                else:
+                    del self._ids_by_key[old_key]
+            if key is not None:
+                self._ids_by_key[key] = self._ids_by_key.get(key, ()) + (faq_id,)
+                self._key_by_id[faq_id] = key
+
+    def copy(self) -> 'ExactMatchIndex':
+        """Independent copy of the entries, sharing the lookup statistics"""
+        clone = ExactMatchIndex()
+        with self._lock:
+            clone._ids_by_key = dict(self._ids_by_key)
+            clone._key_by_id = dict(self._key_by_id)
+        clone._stats_lock = self._stats_lock
+        clone._stats = self._stats
+        return clone
+
+    def lookup(self, question: str) -> Optional[Any]:
+        """Id of the FAQ whose normalized question equals this one, or None"""
+        key = normalize_question(question)
+        ids = self._ids_by_key.get(key)
+        faq_id = ids[0] if ids else None
+        with self._stats_lock:
+            self._stats['lookups'] += 1
+            self._stats['hits'] += faq_id is not None
+        return faq_id
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['questions'] = len(self._ids_by_key)
+        stats['hit_rate'] = round(stats['hits'] / stats['lookups'], 4) if stats['lookups'] else 0.0
+        return stats
+
+
+RETRIEVAL_ENGINES = {
+    TfidfEngine.name: TfidfEngine,
+    BM25Engine.name: BM25Engine,
+    CharNgramEngine.name: CharNgramEngine,
+    LSAEngine.name: LSAEngine,
+    HybridEngine.name: HybridEngine,
+}
+
+
+def create_retrieval_engine(name: str, **options) -> RetrievalEngine:
+    """Instantiate a registered engine by name; raises ValueError for unknown names"""
+    try:
+        engine_class = RETRIEVAL_ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown retrieval engine: {name}")
+    return engine_class(**options)
@@ -27,4 +27,8 @@ except Exception as e:
 
 # 启动应用
 echo "Starting application..."
+if [ "$ASYNC_CHAT" = "true" ]; then
+    # ASGI mode: /api/chat runs on an event loop, other routes go through Flask
+    exec gunicorn --bind 0.0.0.0:$PORT --timeout 120 --workers 2 -k uvicorn.workers.UvicornWorker asgi:application
+fi
 exec gunicorn --bind 0.0.0.0:$PORT --timeout 120 --workers 2 app:app
\ No newline at end of file
@@ -78,7 +78,7 @@ def test_ai_service():
             print(f"Similarity: {result.get('similarity', 0):.3f}")
             
             # Evaluate results
-            if result['source'] == 'faq_match' and test_case['expected'] in ['exact_match', 'semantic_match']:
+            if result['source'] in ('faq_match', 'faq_exact_match') and test_case['expected'] in ['exact_match', 'semantic_match']:
                 print("✅ Test passed")
             elif result['source'] == 'ai_generated' and test_case['expected'] == 'no_match':
                 print("✅ Test passed")
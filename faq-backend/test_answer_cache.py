@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# Test script for the LLM answer cache
+# Runs offline: the LLM call is replaced by a counting stub
+
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from answer_cache import AnswerCache, SemanticAnswerCache, normalize_question
+from ai_service import AIService
+from models import FAQ
+
+
+def test_normalize_question():
+    assert normalize_question("  How do I RESET my password?? ") == "how do i reset my password"
+    assert normalize_question("reset\tpassword!") == normalize_question("Reset password")
+
+
+def test_lru_eviction():
+    cache = AnswerCache(max_size=2, ttl_seconds=60)
+    cache.put(cache.make_key("q1", []), "a1")
+    cache.put(cache.make_key("q2", []), "a2")
+    cache.get(cache.make_key("q1", []))          # q1 becomes most recently used
+    cache.put(cache.make_key("q3", []), "a3")    # evicts q2
+
+    assert cache.get(cache.make_key("q1", [])) == "a1"
+    assert cache.get(cache.make_key("q2", [])) is None
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_ttl_expiry():
+    cache = AnswerCache(max_size=10, ttl_seconds=0.05)
+    key = cache.make_key("q", [(1, 1)])
+    cache.put(key, "a", [1])
+    assert cache.get(key) == "a"
+
+    time.sleep(0.06)
+    assert cache.get(key) is None
+    assert cache.get_stats()['expirations'] == 1
+
+
+def test_invalidate_faqs():
+    cache = AnswerCache()
+    cache.put(cache.make_key("q1", [(1, 1), (2, 1)]), "a1", [1, 2])
+    cache.put(cache.make_key("q2", [(3, 1)]), "a2", [3])
+
+    assert cache.invalidate_faqs([2]) == 1
+    assert cache.get(cache.make_key("q1", [(1, 1), (2, 1)])) is None
+    assert cache.get(cache.make_key("q2", [(3, 1)])) == "a2"
+
+
+def test_smart_answer_uses_cache():
+    """Repeated questions reach the LLM once; editing a context FAQ invalidates the answer"""
+    service = AIService()
+    service.openai_api_key = 'test-key'
+    calls = []
+    service._generate_completion = lambda question, context: calls.append(question) or f"answer #{len(calls)}"
+
+    faqs = [
+        FAQ(id=1, revision=1, question="How do I apply for vacation leave?", answer="Use the HR portal."),
+        FAQ(id=2, revision=1, question="Where can I find my payroll information?", answer="Self-service portal."),
+    ]
+    service.update_faq_vectors(faqs, corpus_version=1)
+
+    first = service.smart_answer("Can I carry over unused vacation days?")
+    second = service.smart_answer("can I carry over unused vacation days")
+    print(f"First: {first['answer']} (cached={first['cached']})")
+    print(f"Second: {second['answer']} (cached={second['cached']})")
+
+    assert first['source'] == 'ai_generated' and not first['cached']
+    assert second['cached'] and second['answer'] == first['answer']
+    assert len(calls) == 1
+
+    faqs[0] = FAQ(id=1, revision=2, question=faqs[0].question, answer="Use the new HR portal.")
+    service.update_faq_vectors(faqs, corpus_version=2)
+    third = service.smart_answer("Can I carry over unused vacation days?")
+
+    assert not third['cached']
+    assert len(calls) == 2
+    assert service.answer_cache.get_stats()['invalidations'] == 1
+
+
+def test_semantic_cache_serves_paraphrases():
+    """A paraphrase with the same FAQ context reuses the answer; another context does not"""
+    service = AIService()
+    service.openai_api_key = 'test-key'
+    service.answer_cache = AnswerCache(max_size=0)  # exercise the semantic cache only
+    calls = []
+    service._generate_completion = lambda question, context: calls.append(question) or f"answer #{len(calls)}"
+
+    faqs = [
+        FAQ(id=1, revision=1, question="How do I submit an expense report for travel?", answer="Use the Finance portal."),
+        FAQ(id=2, revision=1, question="What is the remote work policy?", answer="2-3 days per week."),
+    ]
+    service.update_faq_vectors(faqs, corpus_version=1)
+
+    first = service.smart_answer("Can I get reimbursed for travel expenses I paid myself?")
+    paraphrase = service.smart_answer("Who reimburses travel expenses I paid for myself?")
+    print(f"Paraphrase served from cache: {paraphrase['cached']}")
+
+    assert not first['cached']
+    assert paraphrase['cached'] and paraphrase['answer'] == first['answer']
+    assert len(calls) == 1
+
+    cache = SemanticAnswerCache(max_distance=0.15)
+    vector = service.vectorizer.transform(["submit travel expense report"])
+    cache.put(vector, ((1, 1),), "cached answer", [1])
+    assert cache.get(vector, ((1, 1),)) == "cached answer"
+    assert cache.get(vector, ((2, 1),)) is None
+
+    service.update_faq_vectors(faqs, corpus_version=2)
+    assert service.semantic_cache.get_stats()['size'] == 0
+
+
+def test_reindex_during_llm_call():
+    """An answer vectorized before a reindex is not cached next to vectors of the new index"""
+    service = AIService()
+    service.openai_api_key = 'test-key'
+    service.answer_cache = AnswerCache(max_size=0)
+    faqs = [
+        FAQ(id=1, revision=1, question="How do I submit an expense report for travel?", answer="Use the Finance portal."),
+        FAQ(id=2, revision=1, question="What is the remote work policy?", answer="2-3 days per week."),
+    ]
+    service.update_faq_vectors(faqs, corpus_version=1)
+    calls = []
+
+    def completion(question, context):
+        calls.append(question)
+        if len(calls) == 1:
+            # A rebuild publishes a new vocabulary while this call is in flight
+            service.update_faq_vectors(faqs + [
+                FAQ(id=3, revision=1, question="Which laptop models can I order from the hardware catalogue?",
+                    answer="See the IT catalogue."),
+            ], corpus_version=2)
+        return f"answer #{len(calls)}"
+
+    service._generate_completion = completion
+    first = service.smart_answer("Can I get reimbursed for travel expenses I paid myself?")
+    paraphrase = service.smart_answer("Who reimburses travel expenses I paid for myself?")
+
+    assert first['answer'] == "answer #1"
+    assert not paraphrase['cached'] and paraphrase['answer'] == "answer #2"
+    stats = service.semantic_cache.get_stats()
+    assert stats['stale_puts'] == 1 and stats['size'] == 1
+
+    cache = SemanticAnswerCache()
+    cache.clear(generation=2)
+    vector = service.vectorizer.transform(["submit travel expense report"])
+    cache.put(vector, ((1, 1),), "old index", [1], generation=1)
+    cache.put(vector, ((1, 1),), "new index", [1], generation=2)
+    assert cache.get(vector, ((1, 1),), generation=2) == "new index"
+    assert cache.get(vector, ((1, 1),), generation=1) is None
+
+
+if __name__ == "__main__":
+    print("Starting Answer Cache Tests...")
+    print("=" * 60)
+    test_normalize_question()
+    test_lru_eviction()
+    test_ttl_expiry()
+    test_invalidate_faqs()
+    test_smart_answer_uses_cache()
+    test_semantic_cache_serves_paraphrases()
+    test_reindex_during_llm_call()
+    print("✅ All answer cache tests passed")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# Test script for the ASGI entrypoint and the async chat path
+# Runs offline: the LLM call is replaced by a stub and the app uses a throwaway SQLite database
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'faq_test.db'))
+
+import httpx
+
+from ai_service import AIService
+from asgi import PooledWsgiToAsgi, application
+from app import app, ai_service
+from models import db, FAQ, FAQCorpusState, Log
+
+
+def asgi_client(asgi_app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi_app), base_url='http://testserver')
+
+
+def make_slow_wsgi_app(active, peak):
+    lock = threading.Lock()
+
+    def slow_wsgi_app(environ, start_response):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.2)
+        with lock:
+            active[0] -= 1
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [environ['PATH_INFO'].encode('utf-8')]
+
+    return slow_wsgi_app
+
+
+def fetch_concurrently(adapter, count):
+    async def fetch():
+        async with asgi_client(adapter) as client:
+            return await asyncio.gather(*[client.get(f'/page/{i}') for i in range(count)])
+
+    started = time.perf_counter()
+    responses = asyncio.run(fetch())
+    return responses, time.perf_counter() - started
+
+
+def test_wsgi_routes_run_concurrently():
+    """Slow Flask routes are served side by side by the pooled adapter, not one at a time"""
+    active, peak = [0], [0]
+    adapter = PooledWsgiToAsgi(make_slow_wsgi_app(active, peak), max_threads=4)
+
+    responses, elapsed = fetch_concurrently(adapter, 4)
+    print(f"4 slow requests took {elapsed:.2f}s, peak concurrency {peak[0]}")
+
+    assert [response.text for response in responses] == [f'/page/{i}' for i in range(4)]
+    assert peak[0] == 4
+    assert elapsed < 0.6
+
+
+def test_wsgi_threads_are_bounded():
+    """No more than max_threads Flask requests run at once; the rest wait for a thread"""
+    active, peak = [0], [0]
+    adapter = PooledWsgiToAsgi(make_slow_wsgi_app(active, peak), max_threads=2)
+
+    responses, elapsed = fetch_concurrently(adapter, 6)
+
+    assert [response.status_code for response in responses] == [200] * 6
+    assert peak[0] == 2
+    assert elapsed >= 0.55
+
+
+def test_async_chat_route():
+    """POST /api/chat on the event loop answers from the FAQs, falls back to the LLM and logs the question"""
+    with app.app_context():
+        db.session.add(FAQ(question="How do I book a meeting room?", answer="Use the room booking page."))
+        db.session.add(FAQ(question="Where is the staff parking?", answer="Behind building C."))
+        FAQCorpusState.bump()
+        db.session.commit()
+        ai_service.sync_corpus(FAQCorpusState.current_revision(), lambda: FAQ.query.all())
+        logged_before = Log.query.count()
+
+    calls = []
+
+    async def fake_completion(question, context):
+        calls.append(question)
+        return "Stub LLM answer"
+
+    original_key, original_completion = ai_service.openai_api_key, ai_service._generate_completion_async
+    ai_service.openai_api_key = 'test-key'
+    ai_service._generate_completion_async = fake_completion
+
+    async def ask(question):
+        async with asgi_client(application) as client:
+            return await client.post('/api/chat', json={'question': question})
+
+    try:
+        faq_response = asyncio.run(ask("How do I book a meeting room for today?"))
+        ai_response = asyncio.run(ask("Can I bring a guest to the company picnic?"))
+        empty_response = asyncio.run(ask("   "))
+    finally:
+        ai_service.openai_api_key = original_key
+        ai_service._generate_completion_async = original_completion
+
+    print(f"FAQ: {faq_response.json()}")
+    print(f"AI: {ai_response.json()}")
+
+    assert faq_response.status_code == 200
+    assert faq_response.json()['source'] == 'faq_match'
+    assert faq_response.json()['answer'] == "Use the room booking page."
+
+    assert ai_response.status_code == 200
+    assert ai_response.json()['source'] == 'ai_generated'
+    assert ai_response.json()['answer'] == "Stub LLM answer"
+    assert calls == ["Can I bring a guest to the company picnic?"]
+
+    assert empty_response.status_code == 400
+
+    with app.app_context():
+        assert Log.query.count() == logged_before + 2
+
+
+def test_smart_answer_async():
+    """smart_answer_async serves FAQ matches inline and awaits the LLM once per uncached question"""
+    service = AIService()
+    service.openai_api_key = 'test-key'
+    calls = []
+
+    async def fake_completion(question, context):
+        calls.append((question, context))
+        await asyncio.sleep(0.01)
+        return f"answer #{len(calls)}"
+
+    service._generate_completion_async = fake_completion
+    service.update_faq_vectors([
+        FAQ(id=1, revision=1, question="How do I apply for vacation leave?", answer="Use the HR portal."),
+        FAQ(id=2, revision=1, question="Where can I find my payroll information?", answer="Self-service portal."),
+    ], corpus_version=1)
+
+    faq_result = asyncio.run(service.smart_answer_async("How do I apply for vacation leave next month?"))
+    first = asyncio.run(service.smart_answer_async("Can I carry over unused vacation days?"))
+    second = asyncio.run(service.smart_answer_async("can I carry over unused vacation days"))
+    print(f"FAQ: {faq_result['answer']}, first: {first['answer']}, second cached={second['cached']}")
+
+    assert faq_result['source'] == 'faq_match' and faq_result['answer'] == "Use the HR portal."
+    assert first['source'] == 'ai_generated' and first['answer'] == "answer #1" and not first['cached']
+    assert second['cached'] and second['answer'] == "answer #1"
+    assert len(calls) == 1
+    assert calls[0][1], "the vacation FAQ should be passed as LLM context"
+
+
+if __name__ == "__main__":
+    test_wsgi_routes_run_concurrently()
+    test_wsgi_threads_are_bounded()
+    test_async_chat_route()
+    test_smart_answer_async()
+    print("✅ All ASGI tests passed")
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# Test script for the chat API endpoints
+# Runs offline: the LLM call is replaced by a stub and the app uses a throwaway SQLite database
+
+import os
+import sys
+import tempfile
+import json
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'faq_test.db'))
+
+from app import app, ai_service
+from llm_resilience import CircuitBreaker
+from models import db, FAQ, FAQCorpusState, Log
+
+client = app.test_client()
+
+
+def load_faqs():
+    """Add the test FAQs (once) and bring the shared AIService up to date"""
+    with app.app_context():
+        if not FAQ.query.filter_by(question="How do I request a new laptop?").first():
+            db.session.add(FAQ(question="How do I request a new laptop?", answer="Open an IT hardware ticket."))
+            db.session.add(FAQ(question="When is the expense report deadline?", answer="The 5th of each month."))
+            FAQCorpusState.bump()
+            db.session.commit()
+        ai_service.sync_corpus(FAQCorpusState.current_revision(), lambda: FAQ.query.all())
+
+
+class StubLLM:
+    """Replaces the LLM calls and circuit breaker of the shared AIService, recording peak concurrency
+
+    Streamed answers yield stream_tokens; with fail set, the stream raises before its first token.
+    """
+
+    def __init__(self, delay=0.0, stream_tokens=("LLM ", "answer"), fail=False):
+        self.delay = delay
+        self.stream_tokens = stream_tokens
+        self.fail = fail
+        self.calls = []
+        self.streams_closed = 0
+        self.active = self.peak = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._saved = (ai_service.openai_api_key, ai_service._generate_completion, ai_service._stream_completion,
+                       ai_service.llm_breaker)
+        ai_service.openai_api_key = 'test-key'
+        ai_service._generate_completion = self.complete
+        ai_service._stream_completion = self.stream
+        ai_service.llm_breaker = CircuitBreaker(failure_threshold=1, open_seconds=60)
+        ai_service.answer_cache.clear()
+        ai_service.semantic_cache.clear(ai_service._snapshot.vector_generation)
+        return self
+
+    def __exit__(self, *exc_info):
+        (ai_service.openai_api_key, ai_service._generate_completion, ai_service._stream_completion,
+         ai_service.llm_breaker) = self._saved
+
+    def stream(self, question, context):
+        self.calls.append(question)
+        try:
+            if self.fail:
+                raise RuntimeError("LLM backend unavailable")
+            for text in self.stream_tokens:
+                yield text
+        finally:
+            self.streams_closed += 1
+
+    def complete(self, question, context):
+        with self._lock:
+            self.calls.append(question)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return f"LLM answer to: {question}"
+
+
+def test_batch_is_retrieval_only_by_default():
+    """Without use_ai no LLM call is made; unmatched questions come back unanswered"""
+    load_faqs()
+    with StubLLM() as llm:
+        response = client.post('/api/chat/batch', json={
+            'questions': ["How do I request a new laptop for my team?", "Can I bring my dog to work?"]
+        })
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert results[0]['source'] == 'faq_match'
+    assert results[1]['source'] == 'unanswered' and results[1]['answer'] is None
+    assert llm.calls == []
+
+
+def test_batch_rejects_non_boolean_use_ai():
+    """'false' as a string must not switch the LLM on"""
+    with app.app_context():
+        logged_before = Log.query.count()
+
+    for use_ai in ["false", 1, None]:
+        response = client.post('/api/chat/batch', json={'questions': ["Can I bring my dog to work?"], 'use_ai': use_ai})
+        assert response.status_code == 400, use_ai
+        assert 'use_ai' in response.get_json()['error']
+
+    with app.app_context():
+        assert Log.query.count() == logged_before
+
+
+def test_batch_with_ai_runs_llm_calls_concurrently():
+    """use_ai answers unmatched questions with bounded concurrency; oversized AI batches are rejected"""
+    load_faqs()
+    questions = [f"Can I bring my dog number {i} to work?" for i in range(6)]
+    saved_config = {key: app.config.get(key) for key in ('CHAT_BATCH_AI_CONCURRENCY', 'CHAT_BATCH_AI_MAX_SIZE')}
+    app.config['CHAT_BATCH_AI_CONCURRENCY'] = 3
+    try:
+        with StubLLM(delay=0.1) as llm:
+            started = time.perf_counter()
+            response = client.post('/api/chat/batch', json={'questions': questions, 'use_ai': True})
+            elapsed = time.perf_counter() - started
+    finally:
+        app.config.update(saved_config)
+    print(f"6 LLM answers took {elapsed:.2f}s, peak concurrency {llm.peak}")
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['answer'] for result in results] == [f"LLM answer to: {question}" for question in questions]
+    assert sorted(llm.calls) == sorted(questions)
+    assert llm.peak == 3
+    assert elapsed < 0.5
+
+    app.config['CHAT_BATCH_AI_MAX_SIZE'] = 2
+    try:
+        response = client.post('/api/chat/batch', json={'questions': questions, 'use_ai': True})
+    finally:
+        app.config.update(saved_config)
+    assert response.status_code == 400
+
+
+def stream_events(response):
+    """(event, data) pairs of a Server-Sent Events response body"""
+    events = []
+    for block in response.get_data(as_text=True).strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_stream_emits_meta_tokens_then_done():
+    """An LLM answer streams as meta, one token event per delta, then done; the question is logged"""
+    load_faqs()
+    question = "Can I bring my cat to the office?"
+    with app.app_context():
+        logged_before = Log.query.count()
+
+    with StubLLM(stream_tokens=("Pets ", "are not ", "allowed.")) as llm:
+        response = client.post('/api/chat/stream', json={'question': question})
+        events = stream_events(response)
+
+    assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+    assert [event for event, _ in events] == ['meta', 'token', 'token', 'token', 'done']
+    meta = events[0][1]
+    assert meta['source'] == 'ai_generated' and meta['question'] == question and 'answer' not in meta
+    assert [data['text'] for event, data in events if event == 'token'] == ["Pets ", "are not ", "allowed."]
+    assert events[-1][1]['answer'] == "Pets are not allowed."
+    assert llm.calls == [question]
+
+    # FAQ matches arrive as a single token, without an LLM call
+    with StubLLM() as llm:
+        events = stream_events(client.get('/api/chat/stream', query_string={'question': "How do I request a new laptop?"}))
+    assert [event for event, _ in events] == ['meta', 'token', 'done']
+    assert events[1][1]['text'] == "Open an IT hardware ticket." and llm.calls == []
+
+    with app.app_context():
+        assert Log.query.count() == logged_before + 2
+        assert Log.query.order_by(Log.id.desc()).offset(1).first().question == question
+
+
+def test_stream_falls_back_without_the_llm():
+    """A failed LLM call, or an open breaker, still streams a complete FAQ-based answer"""
+    load_faqs()
+    question = "Is there a deadline for laptop requests?"
+
+    with StubLLM(fail=True) as llm:
+        failed = stream_events(client.post('/api/chat/stream', json={'question': question}))
+        assert ai_service.llm_breaker.state == CircuitBreaker.OPEN
+
+        # The breaker opened after one failure; the next question does not reach the LLM
+        rejected = stream_events(client.post('/api/chat/stream', json={'question': question + " Really?"}))
+        assert ai_service.llm_breaker.get_stats()['rejected'] == 1
+
+    assert llm.calls == [question]
+    for events in (failed, rejected):
+        assert [event for event, _ in events] == ['meta', 'token', 'done']
+        assert events[0][1]['source'] in ('faq_fallback', 'extractive')
+        assert events[1][1]['text'] == events[2][1]['answer'] and events[2][1]['answer']
+
+
+def test_stream_client_disconnect_releases_the_llm_call():
+    """Closing the response mid-stream closes the LLM stream and releases its breaker slot"""
+    load_faqs()
+    with StubLLM(stream_tokens=["token %d " % i for i in range(100)]) as llm:
+        response = client.post('/api/chat/stream', json={'question': "Can I bring my bike inside?"})
+        chunks = iter(response.response)
+        assert next(chunks).startswith(b'event: meta')
+        assert next(chunks).startswith(b'event: token')
+        response.close()
+
+        assert llm.streams_closed == 1
+        breaker_stats = ai_service.llm_breaker.get_stats()
+        assert breaker_stats['released'] == 1 and breaker_stats['failures'] == 0
+        assert breaker_stats['state'] == CircuitBreaker.CLOSED
+
+
+if __name__ == "__main__":
+    test_batch_is_retrieval_only_by_default()
+    test_batch_rejects_non_boolean_use_ai()
+    test_batch_with_ai_runs_llm_calls_concurrently()
+    test_stream_emits_meta_tokens_then_done()
+    test_stream_falls_back_without_the_llm()
+    test_stream_client_disconnect_releases_the_llm_call()
+    print("✅ All chat API tests passed")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# Test script for cross-worker FAQ corpus change notifications
+# Runs offline: SQLite for the polling fallback, a pipe standing in for a LISTEN connection
+
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from corpus_listener import CorpusChangeListener, open_listen_connection
+from models import db, FAQCorpusState
+
+
+class FakeListenConnection:
+    """psycopg2-style connection: readable when notified, poll() moves notifications to .notifies"""
+
+    def __init__(self):
+        self._read, self._write = os.pipe()
+        self.notifies = []
+        self.closed = False
+
+    def fileno(self):
+        return self._read
+
+    def notify(self):
+        os.write(self._write, b'x')
+
+    def poll(self):
+        self.notifies.extend(os.read(self._read, 1024))
+
+    def close(self):
+        self.closed = True
+        os.close(self._read)
+        os.close(self._write)
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_polling_fallback_on_sqlite():
+    """Without LISTEN/NOTIFY the revision row is polled; a bump reaches every listener"""
+    app = Flask(__name__)
+    path = os.path.join(tempfile.mkdtemp(), 'corpus.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        FAQCorpusState.ensure_row()
+        assert open_listen_connection(db.engine, FAQCorpusState.NOTIFY_CHANNEL) is None
+
+    def read_revision():
+        with app.app_context():
+            return FAQCorpusState.current_revision()
+
+    seen = [[], []]
+    listeners = [CorpusChangeListener(read_revision, seen[i].append, poll_seconds=0.05) for i in range(2)]
+    for listener in listeners:
+        listener.start()
+    assert wait_until(lambda: seen[0][-1:] == [0] and seen[1][-1:] == [0])
+
+    with app.app_context():
+        FAQCorpusState.bump()
+        db.session.commit()
+    assert wait_until(lambda: seen[0][-1:] == [1] and seen[1][-1:] == [1])
+
+    stats = listeners[0].get_stats()
+    print(f"Listener stats: {stats}")
+    assert stats['mode'] == 'poll' and stats['changes'] == 2 and stats['last_revision'] == 1
+    for listener in listeners:
+        listener.stop(timeout=1)
+        assert not listener.running
+
+
+def test_notifications_wake_the_listener():
+    """A notification triggers a revision check long before the periodic re-check"""
+    revision = [5]
+    seen = []
+    connection = FakeListenConnection()
+    listener = CorpusChangeListener(lambda: revision[0], seen.append, open_connection=lambda: connection,
+                                    check_seconds=30)
+    listener.start()
+    assert wait_until(lambda: seen == [5])
+
+    revision[0] = 6
+    started = time.monotonic()
+    connection.notify()
+    assert wait_until(lambda: seen == [5, 6])
+    assert time.monotonic() - started < 1
+
+    stats = listener.get_stats()
+    assert stats['mode'] == 'listen' and stats['notifications'] == 1
+    listener.stop(timeout=2)
+    assert connection.closed
+
+
+def test_reconnects_and_catches_up_after_errors():
+    """A database error closes the connection; after reconnecting the revision is re-read"""
+    revision = [1]
+    seen = []
+    connections = []
+    failed = threading.Event()
+
+    def read_revision():
+        if revision[0] == 2 and not failed.is_set():
+            failed.set()
+            raise RuntimeError("connection lost")
+        return revision[0]
+
+    def open_connection():
+        connections.append(FakeListenConnection())
+        return connections[-1]
+
+    listener = CorpusChangeListener(read_revision, seen.append, open_connection=open_connection,
+                                    check_seconds=30, reconnect_seconds=0.05)
+    listener.start()
+    assert wait_until(lambda: seen == [1])
+
+    revision[0] = 2
+    connections[0].notify()
+    assert wait_until(lambda: seen == [1, 2])
+
+    stats = listener.get_stats()
+    assert stats['errors'] == 1 and 'connection lost' in stats['last_error']
+    assert len(connections) == 2 and connections[0].closed
+    listener.stop(timeout=2)
+
+
+if __name__ == "__main__":
+    print("Starting Corpus Listener Tests...")
+    print("=" * 60)
+    test_polling_fallback_on_sqlite()
+    test_notifications_wake_the_listener()
+    test_reconnects_and_catches_up_after_errors()
+    print("✅ All corpus listener tests passed")
@@ -75,6 +75,16 @@ def test_emotion_recognition():
         print("-" * 60)
         print()
 
+def test_keyword_word_boundaries():
+    """Keywords only match whole words; each matched keyword adds one to the score"""
+    assert ai_service.analyze_emotion("Do you know the breakfast menu?")['emotions'] == []
+    assert ai_service.analyze_emotion("I need this now, fast")['emotion_score'] == 2
+
+    result = ai_service.analyze_emotion("I want to file a complaint, let me speak to someone")
+    assert sorted(result['emotions']) == ['complaint', 'transfer']
+    assert result['emotion_score'] == 2
+    assert result['needs_human']
+
 def test_human_transfer_responses():
     """Test human transfer response generation"""
     
@@ -150,6 +160,7 @@ if __name__ == "__main__":
     print()
     
     test_emotion_recognition()
+    test_keyword_word_boundaries()
     test_human_transfer_responses()
     test_smart_answer_with_emotions()
     
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# Test script for FAQ revisions and the corpus revision row
+# Runs offline against throwaway SQLite databases
+
+import os
+import sys
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'faq_test.db'))
+
+from flask import Flask
+from sqlalchemy import inspect, text
+
+import app as app_module
+from app import app, upgrade_faq_table
+from models import db, FAQ, FAQCorpusState
+
+client = app.test_client()
+
+
+def sqlite_app():
+    """A separate Flask app on an empty SQLite database, sharing the models' db object"""
+    other = Flask(__name__)
+    other.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'revisions.db')
+    db.init_app(other)
+    return other
+
+
+def test_bump_updates_the_revision_row():
+    """bump() only updates the row created at startup; concurrent bumps are all counted"""
+    other = sqlite_app()
+    with other.app_context():
+        db.create_all()
+        try:
+            FAQCorpusState.bump()
+            raise AssertionError("bump() created the revision row")
+        except RuntimeError:
+            db.session.rollback()
+
+        FAQCorpusState.ensure_row()
+        FAQCorpusState.ensure_row()
+        assert FAQCorpusState.query.count() == 1 and FAQCorpusState.current_revision() == 0
+
+        FAQCorpusState.bump()
+        db.session.commit()
+        assert FAQCorpusState.current_revision() == 1
+
+    def bump_in_own_session():
+        with other.app_context():
+            FAQCorpusState.bump()
+            db.session.commit()
+
+    threads = [threading.Thread(target=bump_in_own_session) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with other.app_context():
+        assert FAQCorpusState.current_revision() == 9
+        assert FAQCorpusState.query.count() == 1
+
+
+def test_ensure_row_loses_the_insert_race_quietly():
+    """A worker whose insert collides with another worker's row rolls back instead of failing"""
+    other = sqlite_app()
+    with other.app_context():
+        db.create_all()
+        FAQCorpusState.ensure_row()
+
+        # Make this session miss the row, as if both workers checked before either committed
+        original_get = db.session.get
+        db.session.get = lambda *args, **kwargs: None
+        try:
+            FAQCorpusState.ensure_row()
+        finally:
+            db.session.get = original_get
+
+        assert FAQCorpusState.query.count() == 1
+        assert FAQCorpusState.current_revision() == 0
+
+
+def test_upgrade_faq_table_adds_revision_columns_and_row():
+    """A faqs table from before revisions gets the columns, existing FAQs revision 1, and the revision row"""
+    other = sqlite_app()
+    with other.app_context():
+        db.session.execute(text("CREATE TABLE faqs (id INTEGER PRIMARY KEY, question TEXT NOT NULL, answer TEXT NOT NULL)"))
+        db.session.execute(text("INSERT INTO faqs (id, question, answer) VALUES (1, 'Old question?', 'Old answer.')"))
+        db.session.commit()
+        db.create_all()  # leaves the existing faqs table as it is
+
+        upgrade_faq_table()
+        columns = {column['name'] for column in inspect(db.engine).get_columns('faqs')}
+        assert {'revision', 'updated_at'} <= columns
+        assert FAQ.revisions() == {1: 1}
+        assert FAQCorpusState.current_revision() == 0
+
+        # Running it again (every worker does at startup) changes nothing
+        upgrade_faq_table()
+        FAQCorpusState.bump()
+        db.session.commit()
+        assert FAQCorpusState.current_revision() == 1
+
+
+def test_upgrade_faq_table_tolerates_a_concurrent_upgrade():
+    """A worker that inspected the old table before another worker added the columns starts up normally"""
+    other = sqlite_app()
+    with other.app_context():
+        db.session.execute(text("CREATE TABLE faqs (id INTEGER PRIMARY KEY, question TEXT NOT NULL, answer TEXT NOT NULL)"))
+        db.session.commit()
+        db.create_all()
+        old_columns = inspect(db.engine).get_columns('faqs')
+
+        upgrade_faq_table()  # the other worker
+
+        class StaleInspector:
+            """Reports the table as it was before the other worker's upgrade, once"""
+            calls = 0
+
+            def __init__(self, engine):
+                self.inspector = inspect(engine)
+
+            def get_columns(self, table):
+                StaleInspector.calls += 1
+                return old_columns if StaleInspector.calls == 1 else self.inspector.get_columns(table)
+
+        app_module.inspect = StaleInspector
+        try:
+            upgrade_faq_table()
+        finally:
+            app_module.inspect = inspect
+        assert StaleInspector.calls > 1
+        assert {'revision', 'updated_at'} <= {column['name'] for column in inspect(db.engine).get_columns('faqs')}
+
+
+def test_update_faq_increments_revisions():
+    """Editing a FAQ bumps both its own revision and the corpus revision"""
+    response = client.post('/api/faqs', json={'question': "How do I order business cards?", 'answer': "Ask the front desk."})
+    assert response.status_code == 201
+    faq_id = response.get_json()['id']
+
+    with app.app_context():
+        corpus_revision = FAQCorpusState.current_revision()
+        assert db.session.get(FAQ, faq_id).revision == 1
+
+    for expected in (2, 3):
+        response = client.put(f'/api/faqs/{faq_id}', json={'answer': f"Ask the front desk (v{expected})."})
+        assert response.status_code == 200
+
+    with app.app_context():
+        faq = db.session.get(FAQ, faq_id)
+        assert faq.revision == 3 and faq.answer == "Ask the front desk (v3)."
+        assert FAQCorpusState.current_revision() == corpus_revision + 2
+
+    assert client.delete(f'/api/faqs/{faq_id}').status_code == 200
+    with app.app_context():
+        assert FAQCorpusState.current_revision() == corpus_revision + 3
+
+
+if __name__ == "__main__":
+    test_bump_updates_the_revision_row()
+    test_ensure_row_loses_the_insert_race_quietly()
+    test_upgrade_faq_table_adds_revision_columns_and_row()
+    test_upgrade_faq_table_tolerates_a_concurrent_upgrade()
+    test_update_faq_increments_revisions()
+    print("✅ All FAQ revision tests passed")
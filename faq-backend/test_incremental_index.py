@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# Test script for the incremental FAQ index
+# Runs offline against in-memory FAQ objects (no database or API key needed)
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from scipy.sparse import vstack
+
+from ai_service import AIService
+from incremental_index import IncrementalFAQIndex
+from models import FAQ
+
+SAMPLE_FAQS = [
+    FAQ(id=1, revision=1, question="How do I apply for vacation leave?", answer="Use the HR portal."),
+    FAQ(id=2, revision=1, question="How to reset my password?", answer="Use the IT self-service portal."),
+    FAQ(id=3, revision=1, question="Where can I find my payroll information?", answer="Employee Self-Service."),
+    FAQ(id=4, revision=1, question="What are the company working hours?", answer="9:00 AM to 5:00 PM."),
+]
+QUESTIONS = ["reset my password", "vacation leave request", "payroll portal", "working hours policy"]
+
+
+def scores(index):
+    return index.similarities(index.transform(QUESTIONS)).toarray()
+
+
+def scores_by_id(index):
+    """Similarity per (question, FAQ id) for live rows, independent of row order"""
+    matrix = scores(index)
+    return {(q, faq_id): round(float(matrix[q, row]), 9)
+            for q in range(len(QUESTIONS)) for row, faq_id in enumerate(index.faq_ids)
+            if index._row_of.get(faq_id) == row}
+
+
+def test_similarities_are_cosine_tfidf():
+    """Scores equal the cosine of smoothed TF-IDF vectors over the hashed counts; unseen terms weigh nothing"""
+    index = IncrementalFAQIndex(n_features=2 ** 12)
+    index.sync(SAMPLE_FAQS)
+
+    counts = index.hasher.transform([faq.question for faq in SAMPLE_FAQS]).toarray()
+    doc_freq = (counts > 0).sum(axis=0)
+    idf = np.where(doc_freq > 0, np.log((1 + len(SAMPLE_FAQS)) / (1 + doc_freq)) + 1, 0)
+    rows = counts * idf
+    rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+    queries = index.hasher.transform(QUESTIONS).toarray() * idf
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    assert np.allclose(scores(index), queries @ rows.T)
+    assert scores(index)[0].argmax() == 1
+
+
+def test_updates_touch_only_changed_faqs():
+    """Edits and deletes match a fresh build, while re-tokenizing only the changed FAQ"""
+    index = IncrementalFAQIndex(n_features=2 ** 12, compact_seconds=3600, max_delta_ratio=1, max_dead_ratio=1)
+    index.sync(SAMPLE_FAQS)
+    assert index.get_stats()['rows_tokenized'] == 4
+
+    edited = list(SAMPLE_FAQS)
+    edited[1] = FAQ(id=2, revision=2, question="How to reset my network password?", answer="IT portal.")
+    edited[3] = FAQ(id=4, revision=2, question=SAMPLE_FAQS[3].question, answer="8:30 AM to 5:30 PM.")
+    del edited[2]
+    edited.append(FAQ(id=5, revision=1, question="How do I book a meeting room?", answer="Use Outlook."))
+
+    changed = index.sync(edited)
+    stats = index.get_stats()
+    print(f"Changed FAQs: {sorted(changed)}, stats: {stats}")
+
+    assert sorted(changed) == [2, 3, 4, 5]
+    assert stats['rows_tokenized'] == 6          # only FAQ 2 and the new FAQ 5
+    assert stats['tombstones'] == 2
+    assert index.faq_answers[index._row_of[4]] == "8:30 AM to 5:30 PM."
+
+    fresh = IncrementalFAQIndex(n_features=2 ** 12)
+    fresh.sync(edited)
+    assert scores_by_id(index) == scores_by_id(fresh)
+    assert index.sync(edited) == []
+
+
+def test_matches_default_tfidf_engine():
+    """Same similarities as the fitted TF-IDF vectorizer, also for questions with unknown words"""
+    service = AIService()
+    service.update_faq_vectors(SAMPLE_FAQS, corpus_version=1)
+    index = IncrementalFAQIndex()
+    index.sync(SAMPLE_FAQS)
+
+    questions = QUESTIONS + ["reset my forgotten password quickly", "parking garage opening times"]
+    expected = (service.vectorizer.transform(questions) @ service.faq_vectors.T).toarray()
+    assert np.allclose(index.similarities(index.transform(questions)).toarray(), expected)
+
+
+def test_row_norms_follow_edits():
+    """Norms maintained per edit equal norms recomputed from scratch"""
+    index = IncrementalFAQIndex(n_features=2 ** 12, compact_seconds=3600, max_delta_ratio=1, max_dead_ratio=1)
+    index.sync(SAMPLE_FAQS)
+    index.upsert(5, 1, "How do I reset my VPN password?", "Call IT.")
+    index.upsert(2, 2, "How to reset my email password?", "IT portal.")
+    index.delete(3)
+
+    view = index.view()
+    alive = index._alive
+    counts = vstack([view.main, view.delta]).toarray()[alive]
+    assert np.allclose(view.row_scale[alive], 1 / np.linalg.norm(counts * view.idf, axis=1))
+    assert np.all(view.row_scale[~alive] == 0)
+
+
+def test_sync_revisions_loads_only_changed_faqs():
+    """Only FAQs whose revision changed are loaded; the result equals a full sync"""
+    index = IncrementalFAQIndex(n_features=2 ** 12, compact_seconds=3600, max_delta_ratio=1, max_dead_ratio=1)
+    index.sync(SAMPLE_FAQS)
+
+    edited = {faq.id: faq for faq in SAMPLE_FAQS}
+    edited[2] = FAQ(id=2, revision=2, question="How to reset my network password?", answer="IT portal.")
+    edited[5] = FAQ(id=5, revision=1, question="How do I book a meeting room?", answer="Use Outlook.")
+    del edited[3]
+    loaded = []
+
+    def load_faqs(ids):
+        loaded.extend(ids)
+        return [edited[faq_id] for faq_id in ids]
+
+    changed = index.sync_revisions({faq_id: faq.revision for faq_id, faq in edited.items()}, load_faqs)
+    assert sorted(changed) == [2, 3, 5]
+    assert sorted(loaded) == [2, 5]
+
+    fresh = IncrementalFAQIndex(n_features=2 ** 12)
+    fresh.sync(edited.values())
+    assert scores_by_id(index) == scores_by_id(fresh)
+    assert index.sync_revisions({faq_id: faq.revision for faq_id, faq in edited.items()}, load_faqs) == []
+
+
+def test_compaction_drops_tombstones():
+    index = IncrementalFAQIndex(n_features=2 ** 12, compact_seconds=3600, max_delta_ratio=1, max_dead_ratio=1)
+    index.sync(SAMPLE_FAQS)
+    index.delete(3)
+    index.upsert(2, 2, "How do I change my password?", "IT portal.")
+    before = scores_by_id(index)
+
+    index.compact()
+    stats = index.get_stats()
+    assert stats['rows'] == stats['faqs'] == 3
+    assert stats['tombstones'] == 0 and stats['delta_rows'] == 0
+    assert scores_by_id(index) == before
+
+    # Many tombstones trigger compaction automatically
+    index.max_dead_ratio = 0.2
+    index.sync(SAMPLE_FAQS[:1])
+    assert index.get_stats()['tombstones'] == 0
+
+
+def test_ai_service_incremental_mode():
+    """AIService retrieves through the incremental index and invalidates answers per changed FAQ"""
+    service = AIService()
+    service.incremental_index = IncrementalFAQIndex(n_features=2 ** 12)
+    service.index_mode = 'incremental'
+
+    assert service.retrieve("reset password") == []
+    service.update_faq_vectors(SAMPLE_FAQS, corpus_version=1)
+    assert service.retrieve("reset my password", k=1)[0]['id'] == 2
+    assert [hits[0]['id'] for hits in service.retrieve_batch(QUESTIONS, k=1)] == [2, 1, 3, 4]
+
+    service.answer_cache.put(service.answer_cache.make_key("q", [(2, 1)]), "cached", [2])
+    edited = SAMPLE_FAQS[:1] + [FAQ(id=2, revision=2, question="How to unlock my account?", answer="Call IT.")]
+    service.update_faq_vectors(edited, corpus_version=2)
+
+    assert service.answer_cache.get_stats()['size'] == 0
+    assert service.retrieve("unlock account", k=1)[0]['id'] == 2
+    assert service.get_index_stats()['faqs'] == 2
+
+    service.compact_index()
+    assert service.retrieve("unlock account", k=1)[0]['question'] == "How to unlock my account?"
+
+
+def test_ai_service_sync_reads_revisions():
+    """After the first build, corpus changes load only the FAQs whose revision changed"""
+    service = AIService()
+    service.incremental_index = IncrementalFAQIndex(n_features=2 ** 12)
+    service.index_mode = 'incremental'
+    faqs = {faq.id: faq for faq in SAMPLE_FAQS}
+    loaded = []
+
+    def load_all():
+        loaded.append('all')
+        return list(faqs.values())
+
+    def load_by_id(ids):
+        loaded.extend(ids)
+        return [faqs[faq_id] for faq_id in ids]
+
+    def revisions():
+        return {faq_id: faq.revision for faq_id, faq in faqs.items()}
+
+    service.sync_corpus(1, load_all, revisions, load_by_id)
+    faqs[2] = FAQ(id=2, revision=2, question="How to unlock my account?", answer="Call IT.")
+    service.sync_corpus(2, load_all, revisions, load_by_id)
+
+    assert loaded == ['all', 2]
+    assert service.corpus_version == 2
+    assert service.retrieve("unlock account", k=1)[0]['id'] == 2
+
+
+if __name__ == "__main__":
+    print("Starting Incremental Index Tests...")
+    print("=" * 60)
+    test_similarities_are_cosine_tfidf()
+    test_updates_touch_only_changed_faqs()
+    test_matches_default_tfidf_engine()
+    test_row_norms_follow_edits()
+    test_sync_revisions_loads_only_changed_faqs()
+    test_compaction_drops_tombstones()
+    test_ai_service_incremental_mode()
+    test_ai_service_sync_reads_revisions()
+    print("✅ All incremental index tests passed")
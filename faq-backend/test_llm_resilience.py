@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# Test script for the LLM circuit breaker, hedged requests and degraded answers
+# Runs offline: LLM calls are replaced by stubs
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ai_config import AIConfig
+from ai_service import AIService
+from llm_resilience import CircuitBreaker, LatencyTracker, SingleFlight, hedged_call
+from models import FAQ
+
+EXPENSE_ANSWER = ("Submit expense reports through the Finance portal. Attach all receipts. "
+                  "Reimbursement takes about two weeks.")
+
+
+def test_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, open_seconds=0.05)
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()          # half-open probe
+    assert not breaker.allow_request()      # only one probe at a time
+    breaker.record_success(latency_ms=10)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_counts_slow_calls():
+    breaker = CircuitBreaker(failure_threshold=2, slow_call_ms=100)
+    breaker.record_success(latency_ms=150)
+    breaker.record_success(latency_ms=150)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.get_stats()['slow_calls'] == 2
+
+
+def test_hedged_call():
+    executor = ThreadPoolExecutor(max_workers=4)
+    attempts = []
+
+    def slow_then_fast():
+        attempts.append(time.perf_counter())
+        time.sleep(0.3 if len(attempts) == 1 else 0.01)
+        return len(attempts)
+
+    started = time.perf_counter()
+    result, hedged = hedged_call(slow_then_fast, 0.05, executor)
+    elapsed = time.perf_counter() - started
+    print(f"Hedged result from attempt #{result} after {elapsed * 1000:.0f} ms")
+
+    assert hedged and result == 2
+    assert elapsed < 0.25
+
+    result, hedged = hedged_call(lambda: 'fast', 0.5, executor)
+    assert result == 'fast' and not hedged
+
+
+def test_concurrent_first_hedges_share_one_executor():
+    """Requests hedging at the same time for the first time create one thread pool, not one each"""
+    service = AIService()
+    barrier = threading.Barrier(16)
+
+    def first_hedge():
+        barrier.wait()
+        return service._get_hedge_executor()
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        hedge_executors = list(executor.map(lambda _: first_hedge(), range(16)))
+    assert all(hedge_executor is hedge_executors[0] for hedge_executor in hedge_executors)
+
+    service.close_llm_clients()
+    assert hedge_executors[0]._shutdown and service._hedge_executor is None
+    assert service._get_hedge_executor() is not hedge_executors[0]
+    service.close_llm_clients()
+
+
+def test_latency_tracker():
+    tracker = LatencyTracker(window=100)
+    assert tracker.percentile(95) is None
+    for latency in range(1, 101):
+        tracker.add(latency)
+    assert 94 <= tracker.percentile(95) <= 96
+
+
+def test_degraded_answers_while_open():
+    """Failed calls open the circuit; answers then come from the FAQs without calling the LLM"""
+    service = AIService()
+    service.openai_api_key = 'test-key'
+    service.llm_breaker = CircuitBreaker(failure_threshold=1, open_seconds=60)
+    calls = []
+
+    def failing_completion(question, context):
+        calls.append(question)
+        raise TimeoutError("LLM timed out")
+
+    service._generate_completion = failing_completion
+    service.update_faq_vectors([
+        FAQ(id=1, revision=1, question="How do I submit an expense report?", answer=EXPENSE_ANSWER),
+        FAQ(id=2, revision=1, question="What is the remote work policy?", answer="Remote work is 2-3 days per week."),
+    ], corpus_version=1)
+
+    first = service.smart_answer("When will my expense reimbursement arrive?")
+    second = service.smart_answer("Do I need receipts for my expense claim?")
+    print(f"First: {first['source']} / Second: {second['source']}")
+    print(second['answer'])
+
+    assert len(calls) == 1
+    assert service.llm_breaker.state == CircuitBreaker.OPEN
+    assert first['source'] in ('faq_fallback', 'extractive')
+    assert second['source'] in ('faq_fallback', 'extractive')
+    assert 'receipts' in second['answer']
+
+    extract = AIService._extractive_answer("Where do I attach receipts?", [{'answer': EXPENSE_ANSWER}])
+    assert extract == "Attach all receipts."
+
+
+
+def test_single_flight():
+    """Concurrent callers of one key share a call and its exception; later callers start a new one"""
+    flights = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def slow_call():
+        calls.append(1)
+        release.wait(1)
+        return 'answer'
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(flights.do, 'key', slow_call) for _ in range(8)]
+        time.sleep(0.1)
+        assert flights.get_stats()['in_flight'] == 1
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert flights.get_stats() == {'calls': 1, 'coalesced': 7, 'in_flight': 0}
+    assert flights.do('key', lambda: 'again') == ('again', False)
+
+    def failing_call():
+        time.sleep(0.1)
+        raise TimeoutError("LLM timed out")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(flights.do, 'other', failing_call) for _ in range(3)]
+        errors = [future.exception() for future in futures]
+    assert all(isinstance(error, TimeoutError) for error in errors)
+
+    async def ask_concurrently():
+        async def slow_coroutine():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'async answer'
+        return await asyncio.gather(*[flights.do_async('async', slow_coroutine) for _ in range(5)])
+
+    calls.clear()
+    results = asyncio.run(ask_concurrently())
+    assert len(calls) == 1 and [result for result, _ in results] == ['async answer'] * 5
+
+
+def test_identical_questions_share_one_llm_call():
+    """A burst of the same question (modulo case and punctuation) costs one LLM call"""
+    service = AIService()
+    service.openai_api_key = 'test-key'
+    calls = []
+
+    def slow_completion(question, context):
+        calls.append(question)
+        time.sleep(0.2)
+        return "Submit it through the Finance portal."
+
+    service._generate_completion = slow_completion
+    service.update_faq_vectors([
+        FAQ(id=1, revision=1, question="How do I submit an expense report?", answer=EXPENSE_ANSWER),
+        FAQ(id=2, revision=1, question="What is the remote work policy?", answer="Remote work is 2-3 days per week."),
+    ], corpus_version=1)
+
+    questions = ["When is the new expense deadline?", "when is the new expense deadline",
+                 "When is the NEW expense deadline??"] * 4
+    with ThreadPoolExecutor(max_workers=len(questions)) as executor:
+        results = list(executor.map(service.smart_answer, questions))
+
+    assert len(calls) == 1
+    assert all(result['answer'] == "Submit it through the Finance portal." for result in results)
+    # Followers of the in-flight call are coalesced, not cached; only cache hits report cached
+    assert sum(not result['cached'] and not result['coalesced'] for result in results) == 1
+    assert not any(result['cached'] and result['coalesced'] for result in results)
+    flight_stats = service.get_llm_resilience_stats()['single_flight']
+    assert flight_stats['calls'] == 1 and flight_stats['coalesced'] > 0
+    assert sum(result['coalesced'] for result in results) == flight_stats['coalesced']
+
+    later = service.smart_answer("When is the new expense deadline?")
+    assert later['cached'] and not later['coalesced']
+
+
+def test_settings_and_pool_stats_per_client():
+    """Settings come from the given config; each LLM client pool reports its own queue"""
+    service = AIService({'AI_HTTP_MAX_CONNECTIONS': 2, 'AI_ASYNC_HTTP_MAX_CONNECTIONS': 5, 'AI_SIMILARITY_THRESHOLD': 0.9})
+    assert service.http_max_connections == 2 and service.async_http_max_connections == 5
+    assert service.similarity_threshold == 0.9
+    assert AIService().ai_model == AIConfig.AI_MODEL
+
+    messages = [{'role': 'user', 'content': 'hello'}]
+    with ExitStack() as calls:
+        for _ in range(3):
+            calls.enter_context(service._track_llm_call(messages))
+        for _ in range(4):
+            calls.enter_context(service._track_llm_call(messages, 'async'))
+        stats = service.get_llm_pool_stats()
+
+    assert stats['in_flight'] == 7 and stats['queued'] == 1
+    assert stats['pools']['sync']['queued'] == 1 and stats['pools']['sync']['max_connections'] == 2
+    assert stats['pools']['async']['queued'] == 0 and stats['pools']['async']['max_connections'] == 5
+    stats = service.get_llm_pool_stats()
+    assert stats['requests'] == 7 and stats['in_flight'] == 0
+    assert stats['pools']['async']['peak_in_flight'] == 4
+
+
+def half_open_service():
+    """AIService whose breaker has just moved to half-open (one probe allowed)"""
+    service = AIService()
+    service.openai_api_key = 'test-key'
+    service.llm_breaker = CircuitBreaker(failure_threshold=1, open_seconds=0.05)
+    service.update_faq_vectors([
+        FAQ(id=1, revision=1, question="How do I submit an expense report?", answer=EXPENSE_ANSWER),
+        FAQ(id=2, revision=1, question="What is the remote work policy?", answer="Remote work is 2-3 days per week."),
+    ], corpus_version=1)
+    service.llm_breaker.record_failure()
+    time.sleep(0.06)
+    assert service.llm_breaker.state == CircuitBreaker.HALF_OPEN
+    return service
+
+
+def test_disconnected_stream_releases_the_probe():
+    """A client leaving mid-stream during the half-open probe does not block later LLM calls"""
+    service = half_open_service()
+    closed = []
+
+    def stream_completion(question, context):
+        try:
+            yield "Submit it "
+            yield "through the Finance portal."
+        finally:
+            closed.append(question)
+
+    service._stream_completion = stream_completion
+    events = service.stream_answer("When is the new expense deadline?")
+    assert next(events)['event'] == 'meta'
+    assert next(events)['event'] == 'token'
+    events.close()  # GeneratorExit at the yield, as when the SSE client disconnects
+
+    assert closed == ["When is the new expense deadline?"]
+    assert service.llm_breaker.get_stats()['released'] == 1
+    assert service.llm_breaker.allow_request()
+
+
+def test_cancelled_async_call_releases_the_probe():
+    """Cancelling the async half-open probe gives its slot back; a later call closes the circuit"""
+    service = half_open_service()
+    started = asyncio.Event()
+
+    async def hanging_completion(question, context):
+        started.set()
+        await asyncio.sleep(10)
+
+    async def cancel_probe():
+        task = asyncio.ensure_future(service._resilient_completion_async("When is the expense deadline?"))
+        await started.wait()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    service._generate_completion_async = hanging_completion
+    asyncio.run(cancel_probe())
+    assert service.llm_breaker.state == CircuitBreaker.HALF_OPEN
+    assert service.llm_breaker.get_stats()['failures'] == 1
+
+    async def answer(question, context):
+        return "Submit it through the Finance portal."
+
+    service._generate_completion_async = answer
+    assert asyncio.run(service._resilient_completion_async("When is the expense deadline?")) == \
+        "Submit it through the Finance portal."
+    assert service.llm_breaker.state == CircuitBreaker.CLOSED
+
+
+if __name__ == "__main__":
+    print("Starting LLM Resilience Tests...")
+    print("=" * 60)
+    test_breaker_opens_and_recovers()
+    test_breaker_counts_slow_calls()
+    test_hedged_call()
+    test_concurrent_first_hedges_share_one_executor()
+    test_latency_tracker()
+    test_degraded_answers_while_open()
+    test_single_flight()
+    test_identical_questions_share_one_llm_call()
+    test_settings_and_pool_stats_per_client()
+    test_disconnected_stream_releases_the_probe()
+    test_cancelled_async_call_releases_the_probe()
+    print("✅ All LLM resilience tests passed")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# Test script for the mock OpenAI-compatible LLM server
+# Runs offline: AIService talks to a mock server started on a free local port
+
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ai_service import AIService
+from mock_llm_server import LatencyDistribution, MockLLMConfig, create_server
+
+
+def start_mock_server(**settings):
+    server = create_server(port=0, config=MockLLMConfig(**settings))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def mock_ai_service(server) -> AIService:
+    service = AIService()
+    service.openai_api_key = 'mock-key'
+    service.openai_base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    service.ai_max_retries = 0
+    return service
+
+
+def test_latency_distributions():
+    rng = random.Random(7)
+    assert LatencyDistribution('fixed:25', rng).sample_ms() == 25
+    assert all(10 <= LatencyDistribution('uniform:10:20', rng).sample_ms() <= 20 for _ in range(100))
+    assert LatencyDistribution('normal:5:100', rng).sample_ms() >= 0
+
+    try:
+        LatencyDistribution('gamma:1', rng)
+        assert False, "invalid spec accepted"
+    except ValueError:
+        pass
+
+
+def test_completion_and_stream():
+    server = start_mock_server(latency='fixed:20', tokens_per_second=0, completion_tokens=12)
+    service = mock_ai_service(server)
+    try:
+        started = time.perf_counter()
+        answer = service._generate_completion("How do I reset my password?")
+        elapsed = time.perf_counter() - started
+        print(f"Completion in {elapsed * 1000:.0f} ms: {answer}")
+
+        assert answer.startswith("Mock answer to: How do I reset my password?")
+        assert len(answer.split()) == 12
+        assert elapsed >= 0.02
+
+        deltas = list(service._stream_completion("How do I reset my password?"))
+        assert len(deltas) == 12
+        assert ''.join(deltas).strip() == answer
+
+        async_answer = asyncio.run(service._generate_completion_async("How do I reset my password?"))
+        assert async_answer == answer
+
+        assert server.RequestHandlerClass.config.stats['requests'] == 3
+        assert server.RequestHandlerClass.config.stats['streams'] == 1
+    finally:
+        server.shutdown()
+
+
+def test_token_throughput():
+    server = start_mock_server(tokens_per_second=200, completion_tokens=10)
+    service = mock_ai_service(server)
+    try:
+        started = time.perf_counter()
+        list(service._stream_completion("What is the remote work policy?"))
+        assert time.perf_counter() - started >= 10 / 200
+    finally:
+        server.shutdown()
+
+
+def test_error_rate():
+    server = start_mock_server(error_rate=1.0, error_status=503)
+    service = mock_ai_service(server)
+    try:
+        answer = service.generate_ai_response("What is the remote work policy?")
+        print(f"Degraded answer: {answer[:60]}...")
+
+        assert "temporarily unavailable" in answer
+        assert service.get_llm_pool_stats()['failures'] == 1
+        assert server.RequestHandlerClass.config.stats['errors'] == 1
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    print("Starting Mock LLM Server Tests...")
+    print("=" * 60)
+    test_latency_distributions()
+    test_completion_and_stream()
+    test_token_throughput()
+    test_error_rate()
+    print("✅ All mock LLM server tests passed")
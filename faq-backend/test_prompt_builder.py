@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# Test script for the token-budgeted prompt builder
+# Runs offline (no API key needed)
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ai_service import AIService
+from models import FAQ
+from prompt_builder import PromptBuilder, estimate_message_tokens, estimate_tokens, relevant_sentences
+
+EXPENSE_ANSWER = ("Submit expense reports through the Finance portal. Attach all receipts. "
+                  "Reimbursement takes about two weeks.")
+FILLER = " ".join(f"The cafeteria menu for week {week} is posted on the intranet board." for week in range(1, 60))
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("How do I reset my password?") == 7
+    assert estimate_tokens("internationalization") == 4
+    assert estimate_tokens("ext. 1234") == 4
+    messages = [{"role": "user", "content": "Hello there"}]
+    assert estimate_message_tokens(messages) == 3 + 2 + 3
+
+
+def test_relevant_sentences():
+    """Sentences sharing question terms are kept, in reading order, within the budget"""
+    text = FILLER + " " + EXPENSE_ANSWER
+    terms = {'receipts', 'expense', 'reports'}
+    assert relevant_sentences(EXPENSE_ANSWER, terms, 100) == EXPENSE_ANSWER
+
+    trimmed = relevant_sentences(text, terms, 20)
+    assert trimmed == "Submit expense reports through the Finance portal. Attach all receipts."
+    assert estimate_tokens(trimmed) <= 20
+
+    long_answer = FILLER + " Submit expense reports through the Finance portal and attach all the receipts you kept."
+    cut = relevant_sentences(long_answer, terms, 6)
+    assert cut == "Submit expense reports ..."
+    assert relevant_sentences(text, terms, 0) == ''
+
+
+def test_context_respects_the_budget():
+    """Long context FAQs are trimmed so the whole prompt stays within max_input_tokens"""
+    builder = PromptBuilder(max_input_tokens=300)
+    question = "Do I need receipts for my expense report?"
+    hits = [
+        {'question': "How do I submit an expense report?", 'answer': FILLER + " " + EXPENSE_ANSWER},
+        {'question': "What is the remote work policy?", 'answer': "Remote work is 2-3 days per week."},
+        {'question': "Where is the cafeteria menu?", 'answer': FILLER},
+    ]
+
+    context = builder.context_faqs(question, hits)
+    messages = builder.build_messages(question, context)
+    print(f"Prompt tokens: {estimate_message_tokens(messages)}, stats: {builder.get_stats()}")
+
+    assert estimate_message_tokens(messages) <= 300
+    assert len(context) == 3
+    assert "Attach all receipts." in context[0] and "cafeteria" not in context[0]
+    assert context[1] == "Q: What is the remote work policy?\nA: Remote work is 2-3 days per week."
+    stats = builder.get_stats()
+    assert stats['trimmed_faqs'] == 2 and stats['tokens_saved'] > 1000
+
+    # Context that fits is sent unchanged; a budget of 0 disables trimming
+    assert builder.context_faqs(question, hits[1:2]) == [context[1]]
+    assert PromptBuilder(max_input_tokens=0).context_faqs(question, hits)[0].endswith(EXPENSE_ANSWER)
+
+
+def test_question_longer_than_the_budget():
+    """A question that uses up the budget drops the context, even FAQs with empty answers, instead of failing"""
+    assert relevant_sentences('', {'expense'}, -5) == ''
+    assert relevant_sentences('   \n ', {'expense'}, -5) == ''
+
+    builder = PromptBuilder(max_input_tokens=50)
+    question = "Do I need receipts for my expense report? " + FILLER
+    hits = [
+        {'question': "How do I submit an expense report?", 'answer': ""},
+        {'question': "What about receipts?", 'answer': "   "},
+        {'question': "Where is the cafeteria menu?", 'answer': EXPENSE_ANSWER},
+    ]
+    assert builder.context_faqs(question, hits) == []
+    assert builder.get_stats()['dropped_faqs'] == 3
+
+
+def test_prompt_tokens_are_recorded():
+    """Each LLM call records its prompt size and latency in the prompt statistics"""
+    service = AIService()
+    service.openai_api_key = 'test-key'
+    service.prompt_builder.max_input_tokens = 250
+    prompts = []
+
+    class Response:
+        class usage:
+            prompt_tokens = 180
+        choices = [type('Choice', (), {'message': type('Message', (), {'content': 'Attach your receipts.'})})]
+
+    class Completions:
+        def create(self, **kwargs):
+            prompts.append(kwargs['messages'])
+            return Response
+
+    service._get_openai_client = lambda: type('Client', (), {'chat': type('Chat', (), {'completions': Completions()})})
+    service.update_faq_vectors([
+        FAQ(id=1, revision=1, question="How do I submit an expense report?", answer=FILLER + " " + EXPENSE_ANSWER),
+        FAQ(id=2, revision=1, question="What is the remote work policy?", answer="Remote work is 2-3 days per week."),
+    ], corpus_version=1)
+
+    result = service.smart_answer("Do I need receipts for my expense claim?")
+    assert result['answer'] == 'Attach your receipts.'
+    assert estimate_message_tokens(prompts[0]) <= 250 and "Attach all receipts." in prompts[0][1]['content']
+
+    stats = service.get_prompt_stats()
+    print(f"Prompt stats: {stats}")
+    assert stats['samples'] == 1 and stats['avg_prompt_tokens'] == 180
+    assert stats['recent'][0]['estimated_prompt_tokens'] == estimate_message_tokens(prompts[0])
+    assert stats['estimate_ratio'] is not None and stats['trimmed_faqs'] == 1
+
+
+if __name__ == "__main__":
+    print("Starting Prompt Builder Tests...")
+    print("=" * 60)
+    test_estimate_tokens()
+    test_relevant_sentences()
+    test_context_respects_the_budget()
+    test_question_longer_than_the_budget()
+    test_prompt_tokens_are_recorded()
+    print("✅ All prompt builder tests passed")
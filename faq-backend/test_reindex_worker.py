@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Test script for the background FAQ reindex worker
+# Runs offline against in-memory FAQ objects (no database or API key needed)
+
+import os
+import sys
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ai_service import AIService
+from models import FAQ
+from reindex_worker import ReindexWorker
+
+SAMPLE_FAQS = [
+    FAQ(id=1, revision=1, question="How do I apply for vacation leave?", answer="Use the HR portal."),
+    FAQ(id=2, revision=1, question="How to reset my password?", answer="Use the IT self-service portal."),
+    FAQ(id=3, revision=1, question="Where can I find my payroll information?", answer="Employee Self-Service."),
+]
+
+
+def test_burst_is_coalesced():
+    """A burst of requests is served by a single rebuild once it goes quiet"""
+    rebuilds = []
+    worker = ReindexWorker(lambda: rebuilds.append(time.monotonic()), debounce_seconds=0.05)
+
+    started = time.monotonic()
+    for _ in range(20):
+        worker.request()
+    assert worker.wait_idle(timeout=2)
+
+    stats = worker.get_stats()
+    print(f"Reindex stats: {stats}")
+    assert len(rebuilds) == 1 and rebuilds[0] - started >= 0.05
+    assert stats['requests'] == 20 and stats['rebuilds'] == 1 and stats['coalesced'] == 19
+    worker.stop(timeout=1)
+
+
+def test_max_delay_bounds_continuous_edits():
+    """A never-ending stream of edits still gets rebuilt every max_delay_seconds"""
+    rebuilds = []
+    worker = ReindexWorker(lambda: rebuilds.append(time.monotonic()), debounce_seconds=0.1,
+                           max_delay_seconds=0.15)
+
+    deadline = time.monotonic() + 0.6
+    while time.monotonic() < deadline:
+        worker.request()
+        time.sleep(0.02)
+    assert worker.wait_idle(timeout=2)
+
+    assert len(rebuilds) >= 3
+    worker.stop(timeout=1)
+
+
+def test_requests_during_rebuild_and_failures():
+    """Edits made while a rebuild runs get one more rebuild; a failing rebuild does not kill the worker"""
+    calls = []
+    release = threading.Event()
+
+    def rebuild():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            release.wait(1)
+            raise RuntimeError("database unavailable")
+
+    worker = ReindexWorker(rebuild, debounce_seconds=0.01)
+    worker.request()
+    time.sleep(0.1)
+    assert worker.get_stats()['running']
+
+    worker.request()
+    worker.request()
+    release.set()
+    assert worker.wait_idle(timeout=2)
+
+    stats = worker.get_stats()
+    assert len(calls) == 2 and stats['rebuilds'] == 2
+    assert stats['failures'] == 1 and stats['last_error'] is None
+    worker.stop(timeout=1)
+    assert not worker.get_stats()['alive']
+
+
+def test_chat_is_served_during_rebuild():
+    """Questions are answered from the current snapshot while the worker rebuilds"""
+    service = AIService()
+    service.update_faq_vectors(SAMPLE_FAQS[:2], corpus_version=1)
+
+    def load_faqs():
+        time.sleep(0.3)
+        return SAMPLE_FAQS
+
+    worker = ReindexWorker(lambda: service.sync_corpus(2, load_faqs), debounce_seconds=0.01)
+    worker.request()
+    time.sleep(0.05)
+
+    started = time.perf_counter()
+    hits = service.retrieve("How to reset my password?", k=1)
+    assert time.perf_counter() - started < 0.2
+    assert hits[0]['id'] == 2 and service.corpus_version == 1
+
+    assert worker.wait_idle(timeout=2)
+    assert service.corpus_version == 2
+    assert service.retrieve("payroll information", k=1)[0]['id'] == 3
+    worker.stop(timeout=1)
+
+
+if __name__ == "__main__":
+    print("Starting Reindex Worker Tests...")
+    print("=" * 60)
+    test_burst_is_coalesced()
+    test_max_delay_bounds_continuous_edits()
+    test_requests_during_rebuild_and_failures()
+    test_chat_is_served_during_rebuild()
+    print("✅ All reindex worker tests passed")
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# Test script for FAQ retrieval in AIService
+# Runs offline against in-memory FAQ objects (no database or API key needed)
+
+import os
+import sys
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from ai_service import AIService
+from incremental_index import IncrementalFAQIndex
+from models import FAQ
+
+SAMPLE_FAQS = [
+    FAQ(id=1, revision=1, question="How do I apply for vacation leave?",
+        answer="Apply through the HR portal under 'Leave Management'."),
+    FAQ(id=2, revision=1, question="How to reset my password?",
+        answer="Go to the IT self-service portal and click 'Reset Password'."),
+    FAQ(id=3, revision=1, question="Where can I find my payroll information?",
+        answer="Payroll information is in the Employee Self-Service portal."),
+    FAQ(id=4, revision=1, question="What are the company working hours?",
+        answer="Standard working hours are Monday to Friday, 9:00 AM to 5:00 PM."),
+    FAQ(id=5, revision=1, question="How to reset my password?",
+        answer="Duplicate entry of the password FAQ."),
+    FAQ(id=6, revision=1, question="How do I reset my VPN token?",
+        answer="Request a new VPN token from IT support."),
+]
+
+
+def build_service():
+    service = AIService()
+    service.update_faq_vectors(SAMPLE_FAQS, corpus_version=1)
+    return service
+
+
+def test_retrieve_matches_cosine_similarity():
+    """Top-k hits are ranked exactly like a full cosine similarity scan"""
+    service = build_service()
+    question = "I need to reset my password"
+
+    hits = service.retrieve(question, k=3)
+    expected = cosine_similarity(service.vectorizer.transform([question]), service.faq_vectors)[0]
+
+    print(f"Question: {question}")
+    for hit in hits:
+        print(f"  #{hit['id']} {hit['question']} ({hit['similarity']:.3f})")
+
+    assert hits[0]['id'] == 2
+    assert np.isclose(hits[0]['similarity'], expected.max())
+    similarities = [hit['similarity'] for hit in hits]
+    assert similarities == sorted(similarities, reverse=True)
+
+
+def test_retrieve_deduplicates_questions():
+    """Duplicate FAQ questions appear only once in the hits"""
+    service = build_service()
+    hits = service.retrieve("How to reset my password?", k=3)
+
+    questions = [hit['question'] for hit in hits]
+    assert len(questions) == len(set(questions))
+    assert 5 not in [hit['id'] for hit in hits]
+
+
+def test_retrieve_edge_cases():
+    """Empty index, k larger than the corpus and unrelated questions"""
+    assert AIService().retrieve("anything") == []
+
+    service = build_service()
+    assert len(service.retrieve("password", k=50)) <= len(SAMPLE_FAQS)
+    assert service.retrieve("zebra giraffe", k=3) == []
+
+
+def test_retrieve_batch_matches_single_queries():
+    """Batch retrieval returns the same hits as one retrieve() call per question"""
+    service = build_service()
+    questions = ["reset password", "working hours", "vacation leave", "zebra giraffe"]
+
+    batch_hits = service.retrieve_batch(questions, k=3)
+
+    assert len(batch_hits) == len(questions)
+    for question, hits in zip(questions, batch_hits):
+        single_hits = service.retrieve(question, k=3)
+        assert [hit['id'] for hit in hits] == [hit['id'] for hit in single_hits]
+
+
+def test_find_similar_faq():
+    """find_similar_faq is the thresholded top-1 retrieval hit"""
+    service = build_service()
+    match = service.find_similar_faq("How do I apply for vacation leave?")
+
+    assert match['id'] == 1
+    assert match['confidence'] == 'high'
+    assert service.find_similar_faq("How do I cook pasta?") is None
+
+
+def test_index_artifact_roundtrip():
+    """A second worker memory-maps the saved index instead of refitting"""
+    index_dir = tempfile.mkdtemp()
+    writer = AIService()
+    writer.index_dir = index_dir
+    assert writer.sync_corpus(7, lambda: SAMPLE_FAQS)
+    assert [name[:3] for name in os.listdir(index_dir)] == ['v7-']
+
+    # The reader loads the FAQs in another order; only the content must match
+    reader = AIService()
+    reader.index_dir = index_dir
+    assert reader.sync_corpus(7, lambda: SAMPLE_FAQS[::-1])
+    assert not reader.faq_vectors.data.flags.writeable  # read-only memory map
+    assert reader.get_index_stats()['memory_mapped']
+    assert reader.get_index_stats()['faqs'] == len(SAMPLE_FAQS)
+    assert not writer.get_index_stats()['memory_mapped']
+
+    for question in ["reset password", "working hours", "payroll portal"]:
+        expected = [(hit['id'], round(hit['similarity'], 6)) for hit in writer.retrieve(question, k=3)]
+        assert [(hit['id'], round(hit['similarity'], 6)) for hit in reader.retrieve(question, k=3)] == expected
+
+    # Older artifacts are pruned as new corpus versions are saved
+    for version in (8, 9):
+        writer.sync_corpus(version, lambda: SAMPLE_FAQS[:4])
+    assert sorted(name[:3] for name in os.listdir(index_dir)) == ['v8-', 'v9-']
+
+
+def test_index_artifact_rejected_for_other_content():
+    """An artifact saved for the same revision number but other FAQ content is rebuilt, not served"""
+    index_dir = tempfile.mkdtemp()
+    writer = AIService()
+    writer.index_dir = index_dir
+    writer.sync_corpus(3, lambda: SAMPLE_FAQS)
+
+    # Another database (or a reset one) that reached revision 3 with different FAQs
+    other_faqs = [FAQ(id=1, revision=1, question="Where is the cafeteria?", answer="Ground floor, building A.")]
+    reader = AIService()
+    reader.index_dir = index_dir
+    assert reader.sync_corpus(3, lambda: other_faqs)
+    assert not reader.get_index_stats()['memory_mapped']
+    assert reader.find_similar_faq("Where is the cafeteria?")['answer'] == "Ground floor, building A."
+    assert len(os.listdir(index_dir)) == 2
+
+    # A changed answer alone also invalidates the artifact
+    edited = [FAQ(id=faq.id, revision=faq.revision, question=faq.question, answer=faq.answer + " (edited)")
+              for faq in SAMPLE_FAQS]
+    reader = AIService()
+    reader.index_dir = index_dir
+    reader.sync_corpus(3, lambda: edited)
+    assert not reader.get_index_stats()['memory_mapped']
+    assert reader.find_similar_faq("How do I apply for vacation leave?")['answer'].endswith("(edited)")
+
+
+def test_exact_match_fast_path():
+    """Copy-pasted FAQ questions are answered without vectorizing, in both index modes"""
+    service = build_service()
+
+    def no_vectorizing(*args):
+        raise AssertionError("exact match went through vectorization")
+
+    service._vectorize = no_vectorizing
+    result = service.smart_answer("  how to RESET my password ")
+    assert result['source'] == 'faq_exact_match'
+    assert result['answer'] == SAMPLE_FAQS[1].answer and result['similarity'] == 1.0
+    assert service.smart_answer_batch(["What are the company working hours"])[0]['source'] == 'faq_exact_match'
+    assert service.get_index_stats()['exact_match']['hits'] == 2
+    assert service._exact_match_result("How do I reset my VPN", {'sentiment': 'neutral'}) is None
+
+    incremental = AIService()
+    incremental.incremental_index = IncrementalFAQIndex(n_features=2 ** 12)
+    incremental.update_faq_vectors(SAMPLE_FAQS, corpus_version=1)
+    edited = SAMPLE_FAQS[:1] + [FAQ(id=6, revision=2, question="How do I renew my VPN token?", answer="Ask IT.")]
+    incremental.update_faq_vectors(edited, corpus_version=2)
+    assert incremental._exact_match_result("How do I renew my VPN token?", {'sentiment': 'neutral'})['answer'] == "Ask IT."
+    assert incremental._exact_match_result("How do I reset my VPN token?", {'sentiment': 'neutral'}) is None
+    assert incremental._exact_match_result("How to reset my password?", {'sentiment': 'neutral'}) is None
+
+
+def test_snapshot_swap_is_never_torn():
+    """Readers racing with rebuilds always see rows, questions and answers of one corpus version"""
+    corpora = {
+        version: [FAQ(id=faq.id, revision=version, question=f"{faq.question} v{version}",
+                      answer=f"v{version}: {faq.answer}") for faq in SAMPLE_FAQS[::version]]
+        for version in (1, 2)
+    }
+    service = AIService()
+    service.update_faq_vectors(corpora[1], corpus_version=1)
+    snapshot = service.index_snapshot
+    try:
+        snapshot.faq_answers = ()
+        raise AssertionError("snapshot fields must be read-only")
+    except AttributeError:
+        pass
+
+    stop = threading.Event()
+    torn = []
+
+    def rebuild():
+        version = 1
+        while not stop.is_set():
+            version = 3 - version
+            service.update_faq_vectors(corpora[version], corpus_version=version)
+
+    writer = threading.Thread(target=rebuild)
+    writer.start()
+    try:
+        for _ in range(300):
+            for hits in service.retrieve_batch(["reset password", "working hours"], k=3):
+                for hit in hits:
+                    version = hit['revision']
+                    if not (hit['answer'].startswith(f"v{version}:") and hit['question'].endswith(f"v{version}")):
+                        torn.append(hit)
+    finally:
+        stop.set()
+        writer.join()
+
+    assert not torn, torn[:3]
+    # The first snapshot is untouched by later rebuilds
+    assert snapshot.faq_answers[0].startswith("v1:") and snapshot.corpus_version == 1
+
+
+if __name__ == "__main__":
+    print("Starting FAQ Retrieval Tests...")
+    print("=" * 60)
+    test_retrieve_matches_cosine_similarity()
+    test_retrieve_deduplicates_questions()
+    test_retrieve_edge_cases()
+    test_retrieve_batch_matches_single_queries()
+    test_find_similar_faq()
+    test_index_artifact_roundtrip()
+    test_index_artifact_rejected_for_other_content()
+    test_exact_match_fast_path()
+    test_snapshot_swap_is_never_torn()
+    print("✅ All retrieval tests passed")
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# Test script for the pluggable retrieval engines
+# Runs offline against in-memory FAQ objects (no database or API key needed)
+
+import os
+import random
+import sys
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import benchmark_retrieval
+import retrieval_engines
+from ai_service import AIService
+from models import FAQ
+from retrieval_engines import (EMPTY_RESULT, BM25Engine, CharNgramEngine, HybridEngine, LSAEngine, RetrievalEngine,
+                               create_retrieval_engine)
+
+SAMPLE_FAQS = [
+    FAQ(id=1, revision=1, question="How do I apply for vacation leave?", answer="Use the HR portal."),
+    FAQ(id=2, revision=1, question="How to reset my password?", answer="Use the IT self-service portal."),
+    FAQ(id=3, revision=1, question="Where can I find my payroll information?", answer="Employee Self-Service."),
+    FAQ(id=4, revision=1, question="What are the company working hours?", answer="9:00 AM to 5:00 PM."),
+    FAQ(id=5, revision=1, question="How do I reset my VPN token?", answer="Request a new token from IT."),
+]
+
+WORDS = ("password reset leave vacation payroll expense travel laptop vpn benefits insurance office "
+         "parking badge printer email calendar meeting training policy").split()
+
+
+def brute_force_bm25(engine, question):
+    """Score every document with the textbook BM25 formula"""
+    counts = engine.vectorizer.transform([question])
+    terms = set(counts.indices)
+    doc_counts = engine._doc_matrix
+    doc_lengths = np.asarray(doc_counts.sum(axis=1)).ravel()
+    scores = np.zeros(doc_counts.shape[0])
+    for term in terms:
+        column = doc_counts[:, term].toarray().ravel()
+        df = np.count_nonzero(column)
+        idf = np.log(1 + (len(scores) - df + 0.5) / (df + 0.5))
+        norm = engine.k1 * (1 - engine.b + engine.b * doc_lengths / engine._avg_doc_len)
+        scores += idf * column * (engine.k1 + 1) / (column + norm)
+    return scores
+
+
+def test_bm25_matches_brute_force():
+    """MaxScore top-k returns the same documents and scores as scoring every document"""
+    rng = random.Random(3)
+    questions = [' '.join(rng.choices(WORDS, k=rng.randint(3, 8))) for _ in range(2000)]
+    engine = BM25Engine()
+    engine.build(questions)
+    engine._doc_matrix = engine.vectorizer.transform(questions)
+
+    for query in ["reset password vpn", "travel expense policy meeting", "parking badge", "laptop"]:
+        rows, similarities = engine.search([query], k=10)[0]
+        expected = brute_force_bm25(engine, query)
+        normalizer = engine._self_score(engine._analyzer(query))
+
+        ratios = np.minimum(expected[rows] / normalizer, 1.0)
+        assert np.allclose(similarities, ratios ** engine.similarity_exponent, atol=1e-5)
+        assert np.isclose(expected[rows[-1]], np.sort(expected)[-10], atol=1e-4)
+
+    stats = engine.get_stats()
+    print(f"BM25 stats: {stats}")
+    assert stats['early_terminations'] > 0
+    assert stats['postings_probed'] > 0
+
+
+def test_bm25_similarity_scale():
+    """An identical question scores 1.0; unrelated or unknown words lower the similarity"""
+    engine = BM25Engine()
+    engine.build([faq.question for faq in SAMPLE_FAQS])
+
+    rows, similarities = engine.search(["How to reset my password?"], k=3)[0]
+    assert rows[0] == 1 and np.isclose(similarities[0], 1.0)
+    assert all(0 < similarity < 1 for similarity in similarities[1:])
+
+    _, diluted = engine.search(["reset my password zebra giraffe"], k=1)[0]
+    assert diluted[0] < 0.8
+
+    assert len(engine.search(["zebra giraffe"], k=3)[0][0]) == 0
+    assert engine.transform(["reset password"]).nnz > 0
+
+
+def test_bm25_paraphrases_clear_the_confidence_thresholds():
+    """Calibrated BM25 similarities answer paraphrases at high confidence about as often as TF-IDF"""
+    service = AIService({'AI_RETRIEVAL_ENGINE': 'bm25'})
+    service.update_faq_vectors(SAMPLE_FAQS, corpus_version=1)
+    match = service.find_similar_faq("How can I apply for my vacation leave?")
+    assert match['id'] == 1 and match['confidence'] == 'high'
+
+    rng = random.Random(11)
+    faqs = benchmark_retrieval.generate_corpus(1000, rng)
+    paraphrases = [benchmark_retrieval.paraphrase(rng.choice(faqs).question, rng) for _ in range(200)]
+    out_of_domain = [benchmark_retrieval.out_of_domain_query(rng) for _ in range(100)]
+    rates = {}
+    for name in ('tfidf', 'bm25'):
+        engine = create_retrieval_engine(name)
+        engine.build([faq.question for faq in faqs])
+        rates[name] = [
+            float(np.mean([len(similarities) > 0 and similarities[0] > 0.7
+                           for _, similarities in engine.search(questions, k=1)]))
+            for questions in (paraphrases, out_of_domain)
+        ]
+    print(f"High-confidence rate (paraphrases, out of domain): {rates}")
+
+    assert rates['bm25'][0] >= 0.8 * rates['tfidf'][0]
+    assert rates['bm25'][1] <= max(rates['tfidf'][1], 0.05)
+
+
+def test_ai_service_bm25_engine():
+    """AIService ranks through the configured engine; unknown names fall back to tfidf"""
+    service = AIService()
+    service.retrieval_engine = create_retrieval_engine('bm25')
+    service.retrieval_engine_name = 'bm25'
+    service.update_faq_vectors(SAMPLE_FAQS, corpus_version=1)
+
+    match = service.find_similar_faq("How do I apply for vacation leave?")
+    assert match['id'] == 1 and match['confidence'] == 'high'
+    assert service.retrieve("reset password", k=2)[0]['id'] in (2, 5)
+    assert [hits[0]['id'] for hits in service.retrieve_batch(["payroll information", "working hours"], k=1)] == [3, 4]
+    assert service.get_index_stats()['engine'] == 'bm25'
+
+    assert AIService({'AI_RETRIEVAL_ENGINE': 'no-such-engine'}).retrieval_engine is None
+
+
+class FixedEngine(RetrievalEngine):
+    """Returns a fixed ranking after an optional delay"""
+
+    def __init__(self, name, rows, similarities, delay=0.0):
+        self.name = name
+        self.result = (np.array(rows), np.array(similarities))
+        self.delay = delay
+        self.threads = []
+
+    def __len__(self):
+        return 10
+
+    def build(self, questions):
+        pass
+
+    def transform(self, questions):
+        return None
+
+    def search(self, questions, k, vectors=None):
+        self.threads.append(threading.current_thread())
+        time.sleep(self.delay)
+        return [self.result for _ in questions]
+
+
+def test_reciprocal_rank_fusion():
+    """Rows ranked well by several engines win; similarity is the primary engine's"""
+    hybrid = HybridEngine(engines=['tfidf'], rrf_k=60)
+    hybrid.engines = [FixedEngine('a', [1, 2, 3], [0.9, 0.5, 0.4]),
+                      FixedEngine('b', [2, 3, 1], [0.8, 0.7, 0.2]),
+                      FixedEngine('c', [3, 2], [0.6, 0.3])]
+
+    result = hybrid.search(["question"], k=3)[0]
+    rows, similarities = result
+    # 2: 1/62 + 1/61 + 1/62, 3: 1/63 + 1/62 + 1/61, 1: 1/61 + 1/63
+    assert list(rows) == [2, 3, 1]
+    assert list(similarities) == [0.5, 0.4, 0.9]
+    assert set(result.timings_ms) == {'a', 'b', 'c'} and result.skipped == []
+
+
+def test_hybrid_similarity_follows_primary_engine():
+    """Secondary engines cannot raise a row's similarity; rows only they found are capped"""
+    hybrid = HybridEngine(engines=['tfidf'])
+    hybrid.engines = [FixedEngine('primary', [1], [0.35]),
+                      FixedEngine('char', [1, 4], [0.98, 0.95])]
+    rows, similarities = hybrid.search(["question"], k=3)[0]
+    assert dict(zip(rows.tolist(), similarities.tolist())) == {1: 0.35, 4: 0.25}
+
+    questions = [faq.question for faq in SAMPLE_FAQS]
+    tfidf = create_retrieval_engine('tfidf')
+    tfidf.build(questions)
+    hybrid = create_retrieval_engine('hybrid', budget_ms=1000)
+    hybrid.build(questions)
+
+    # An unrelated question shares character n-grams with the FAQs but no words
+    assert hybrid.search(["Where do I park my bicycle?"], k=1)[0][1][0] <= 0.25
+    for question in ["How do I reset my password?", "Where do I park my bicycle?"]:
+        expected = dict(zip(*(array.tolist() for array in tfidf.search([question], k=3)[0])))
+        rows, similarities = hybrid.search([question], k=3)[0]
+        for row, similarity in zip(rows.tolist(), similarities.tolist()):
+            assert similarity == expected[row] if row in expected else similarity <= 0.25
+
+
+def test_hybrid_budget_drops_slow_engines():
+    """Secondary engines that miss the time budget are left out; the primary is always used, searched inline"""
+    hybrid = HybridEngine(engines=['tfidf'], budget_ms=20)
+    hybrid.engines = [FixedEngine('primary', [1], [0.5], delay=0.05),
+                      FixedEngine('fast', [2], [0.9]),
+                      FixedEngine('slow', [3], [0.9], delay=0.5)]
+
+    started = time.perf_counter()
+    result = hybrid.search(["question"], k=3)[0]
+    assert time.perf_counter() - started < 0.3
+    assert sorted(result[0]) == [1, 2]
+    assert result.skipped == ['slow']
+    assert hybrid.engines[0].threads == [threading.current_thread()]
+    assert hybrid.get_stats()['budget_misses']['slow'] == 1
+
+    hybrid.engines = [FixedEngine('primary', [], [])]
+    assert len(hybrid.search(["question"], k=3)[0][0]) == len(EMPTY_RESULT[0])
+
+
+def test_hybrid_budget_bounds_the_work_done():
+    """Searches that missed the budget are cancelled and a backed-up pool sheds new ones instead of queueing them"""
+    hybrid = HybridEngine(engines=['tfidf'], budget_ms=5, max_workers=2)
+    hybrid.engines = [FixedEngine('primary', [1], [0.5]), FixedEngine('slow', [2], [0.9], delay=0.05)]
+
+    started = time.perf_counter()
+    for _ in range(100):
+        assert hybrid.search(["question"], k=3)[0].skipped == ['slow']
+    elapsed = time.perf_counter() - started
+    print(f"100 searches took {elapsed:.2f}s, slow engine ran {len(hybrid.engines[1].threads)} times")
+
+    assert retrieval_engines._executor_pending <= retrieval_engines._executor_workers
+    assert hybrid.get_stats()['shed'] > 0
+    # Only what the pool could run in the meantime was run, not one search per call
+    assert len(hybrid.engines[1].threads) <= (elapsed / 0.05 + 1) * retrieval_engines._executor_workers
+    deadline = time.monotonic() + 1
+    while retrieval_engines._executor_pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert retrieval_engines._executor_pending == 0
+
+
+def test_char_ngrams_tolerate_typos():
+    questions = [faq.question for faq in SAMPLE_FAQS]
+    char_engine = CharNgramEngine()
+    char_engine.build(questions)
+    rows, similarities = char_engine.search(["how to resett my pasword"], k=1)[0]
+    assert rows[0] == 1 and similarities[0] > 0.5
+
+    hybrid = create_retrieval_engine('hybrid', budget_ms=1000)
+    hybrid.build(questions)
+    result = hybrid.search(["how to resett my pasword", "payroll information"], k=3)
+    assert result[0][0][0] == 1 and result[1][0][0] == 2
+    assert set(result[0].timings_ms) == {'tfidf', 'bm25', 'char'}
+    print(f"Hybrid stats: {hybrid.get_stats()['p50_ms']}")
+
+
+def test_ai_service_hybrid_engine():
+    """Hybrid retrieval matches typos at high confidence and reports per-engine timing"""
+    service = AIService({'AI_RETRIEVAL_ENGINE': 'hybrid', 'AI_HYBRID_BUDGET_MS': 1000.0})
+    service.update_faq_vectors(SAMPLE_FAQS, corpus_version=1)
+
+    hits = service.retrieve("How to reset my pasword?", k=2)
+    assert hits[0]['id'] == 2 and set(hits[0]['retrieval_ms']) == {'tfidf', 'bm25', 'char'}
+    assert service.find_similar_faq("How do I aply for vacation leave?")['confidence'] == 'high'
+    assert service.get_index_stats()['engine'] == 'hybrid'
+
+
+def test_lsa_ivf_recall():
+    """IVF search probes a few lists, agrees with exact search, and reports recall@k"""
+    rng = random.Random(5)
+    topics = [rng.sample(WORDS, 4) for _ in range(40)]
+    questions = [' '.join(rng.sample(topic, 3) + rng.choices(WORDS, k=1)) for topic in topics for _ in range(50)]
+    engine = LSAEngine(n_components=32, n_probe=8)
+    engine.build(questions)
+
+    stats = engine.get_stats()
+    print(f"LSA stats: {stats}")
+    assert engine.embeddings.dtype == np.float32 and engine.embeddings.shape == (2000, 32)
+    assert stats['lists'] == 44 and stats['recall_at_10'] > 0.5
+
+    rows, similarities = engine.search([questions[7]], k=5)[0]
+    assert similarities[0] > 0.99 and np.all(np.diff(similarities) <= 0)
+    assert engine.measure_recall(questions[:50], k=5) > 0.5
+
+    # Probing every list is exact
+    engine.n_probe = stats['lists']
+    assert engine.measure_recall(questions[:50], k=5) == 1.0
+
+    small = LSAEngine()
+    small.build([faq.question for faq in SAMPLE_FAQS])
+    assert small.search(["reset password"], k=1)[0][0][0] in (1, 4)
+
+
+def test_lsa_scores_with_tfidf_cosine():
+    """LSA only proposes candidates; similarities are TF-IDF cosine, so loose matches stay low"""
+    engine = LSAEngine()
+    engine.build([faq.question for faq in SAMPLE_FAQS])
+
+    # In the embedding space both reset FAQs look identical to the question
+    embedding_rows, embedding_similarities = engine.embedding_search(["reset password"], k=2)[0]
+    assert set(embedding_rows) == {1, 4} and min(embedding_similarities) > 0.9
+
+    rows, similarities = engine.search(["reset password"], k=2)[0]
+    expected = (engine.tfidf @ engine.transform(["reset password"]).T).toarray().ravel()
+    assert list(rows) == [1, 4] and np.allclose(similarities, expected[rows])
+    assert similarities[1] < 0.3
+
+    assert len(engine.search(["Where do I park my bicycle?"], k=3)[0][0]) == 0
+
+
+def test_benchmark_harness():
+    """The benchmark builds a synthetic corpus, paraphrases queries and reports every metric"""
+    rng = random.Random(1)
+    faqs = benchmark_retrieval.generate_corpus(300, rng)
+    assert len({faq.question for faq in faqs}) == 300
+    assert benchmark_retrieval.paraphrase(faqs[0].question, rng) != faqs[0].question
+
+    assert benchmark_retrieval.out_of_domain_query(rng).endswith('?')
+
+    results = benchmark_retrieval.run([300], ['tfidf', 'bm25'], query_count=30, seed=1, verbose=False, ood_count=20)
+    assert [result['engine'] for result in results] == ['tfidf', 'bm25']
+    for result in results:
+        assert set(result['latency_ms']) == {'mean', 'p50', 'p95', 'p99'}
+        assert result['recall_at_3'] >= result['recall_at_1'] > 0.5
+        assert result['memory_bytes'] > 0
+        assert result['ood_queries'] == 20 and 0 <= result['ood_high_confidence_rate'] <= 1
+        if result['precision_with_ood'] is not None:
+            assert result['precision_with_ood'] <= result['high_confidence_precision']
+
+
+if __name__ == "__main__":
+    print("Starting Retrieval Engine Tests...")
+    print("=" * 60)
+    test_bm25_matches_brute_force()
+    test_bm25_similarity_scale()
+    test_bm25_paraphrases_clear_the_confidence_thresholds()
+    test_ai_service_bm25_engine()
+    test_reciprocal_rank_fusion()
+    test_hybrid_similarity_follows_primary_engine()
+    test_hybrid_budget_drops_slow_engines()
+    test_hybrid_budget_bounds_the_work_done()
+    test_char_ngrams_tolerate_typos()
+    test_ai_service_hybrid_engine()
+    test_lsa_ivf_recall()
+    test_lsa_scores_with_tfidf_cosine()
+    test_benchmark_harness()
+    print("✅ All retrieval engine tests passed")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# Test script for the cache warm-up job
+# Runs offline: SQLite for the Log table, LLM calls are replaced by stubs
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from ai_service import AIService
+from models import db, FAQ, Log
+from warm_cache import frequent_questions, warm_caches
+
+
+def make_app():
+    app = Flask(__name__)
+    path = os.path.join(tempfile.mkdtemp(), 'warmup.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_frequent_questions():
+    """Recent questions are folded by normalized form and ranked; old and session-end rows are ignored"""
+    app = make_app()
+    now = datetime.utcnow()
+    rows = (
+        [("When is the expense deadline?", 0)] * 4 + [("when is the expense deadline", 0)] * 2
+        + [("How do I reset my VPN token?", 1)] * 3 + [("What is the parking policy?", 2)]
+        + [("Can I work from Lisbon?", 30)] * 10 + [("Session ended", 0)] * 10
+    )
+    with app.app_context():
+        for question, age_days in rows:
+            db.session.add(Log(question=question, timestamp=now - timedelta(days=age_days),
+                               is_session_end=question == "Session ended"))
+        db.session.commit()
+
+        questions = frequent_questions(days=7, limit=10, now=now)
+        assert questions == [("When is the expense deadline?", 6), ("How do I reset my VPN token?", 3)]
+        assert frequent_questions(days=7, limit=1, min_count=1, now=now) == [("When is the expense deadline?", 6)]
+        assert len(frequent_questions(days=7, limit=10, min_count=1, now=now)) == 3
+        # min_count applies to the folded count (4 + 2), not to each spelling
+        assert frequent_questions(days=7, limit=10, min_count=5, now=now) == [("When is the expense deadline?", 6)]
+
+
+def test_warm_caches_fills_the_answer_cache():
+    """Warmed questions are answered from the cache afterwards, concurrency stays within the limit"""
+    service = AIService()
+    service.openai_api_key = 'test-key'
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def completion(question, context):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        return f"Answer to: {question}"
+
+    service._generate_completion = completion
+    service.update_faq_vectors([
+        FAQ(id=1, revision=1, question="How do I submit an expense report?", answer="Use the Finance portal."),
+        FAQ(id=2, revision=1, question="How to reset my password?", answer="Use the IT self-service portal."),
+    ], corpus_version=1)
+
+    questions = [f"Question number {i} about expense deadlines" for i in range(8)]
+    stats = warm_caches(questions, service, concurrency=2, budget_seconds=10)
+    print(f"Warm-up stats: {stats}")
+
+    assert stats['answered'] == 8 and stats['skipped'] == 0 and stats['failed'] == 0
+    assert in_flight[1] <= 2
+    assert service.smart_answer(questions[3])['cached']
+    assert service.smart_answer("How to reset my password?")['source'] == 'faq_exact_match'
+
+
+def test_warm_caches_respects_the_budget():
+    """No question is started after the budget; questions in flight are finished"""
+    service = AIService()
+    service.openai_api_key = 'test-key'
+    service._generate_completion = lambda question, context: time.sleep(0.1) or "Answer"
+    service.update_faq_vectors([
+        FAQ(id=1, revision=1, question="How do I submit an expense report?", answer="Use the Finance portal."),
+    ], corpus_version=1)
+
+    started = time.perf_counter()
+    stats = warm_caches([f"Unrelated question {i} about travel" for i in range(20)], service,
+                        concurrency=2, budget_seconds=0.15)
+    assert time.perf_counter() - started < 0.6
+    assert stats['skipped'] > 0 and stats['answered'] + stats['skipped'] == 20
+    assert stats['sources'] == {'ai_generated': stats['answered']}
+
+
+if __name__ == "__main__":
+    print("Starting Cache Warm-up Tests...")
+    print("=" * 60)
+    test_frequent_questions()
+    test_warm_caches_fills_the_answer_cache()
+    test_warm_caches_respects_the_budget()
+    print("✅ All cache warm-up tests passed")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache warm-up from historical chat traffic
+
+Reads the most frequent questions of the last N days from the Log table,
+folds spelling variants by normalized question, and answers them through
+smart_answer, most frequent first, so the LLM answer caches (exact and
+semantic) and lazily created retrieval state are warm before the first users
+arrive. At most 'concurrency' questions are answered at once; once the time
+budget is spent no further question is started and only the calls already in
+flight are waited for.
+
+Caches live in process memory. With gunicorn and PRELOAD_FAQ_INDEX,
+gunicorn.conf.py runs the warm-up in the master right after the index preload
+(AI_WARMUP_ENABLED=true), so every forked worker starts with the warm caches.
+The CLI runs the same job in its own process: use it to preview the questions
+(--dry-run) and to measure how long a warm-up takes.
+
+Usage:
+    python warm_cache.py [--days 7] [--limit 200] [--min-count 2]
+                         [--concurrency 4] [--budget 60] [--dry-run]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import func, or_
+
+from answer_cache import normalize_question
+from models import db, Log
+
+logger = logging.getLogger(__name__)
+
+
+def frequent_questions(days: int = 7, limit: int = 200, min_count: int = 2,
+                       now: datetime = None) -> List[Tuple[str, int]]:
+    """
+    Most asked questions of the last days (needs an app context)
+
+    Args:
+        days: Look-back window
+        limit: Maximum number of questions
+        min_count: Questions asked fewer times (after folding) are left out
+        now: End of the window (default: utcnow)
+
+    Returns:
+        (question, count) pairs, most frequent first; each question is one of
+        the spellings folded into it
+
+    Counting, min_count, ordering and limit run in the database, grouped by the
+    question with case, surrounding whitespace and trailing punctuation folded,
+    so only the returned rows are loaded. Variants that differ inside the
+    question are folded afterwards by normalize_question; a variant asked fewer
+    than min_count times on its own is not counted towards them.
+    """
+    since = (now or datetime.utcnow()) - timedelta(days=days)
+    folded = func.rtrim(func.lower(func.trim(Log.question)), ' ?!.')
+    count = func.count().label('count')
+    rows = db.session.query(func.min(Log.question), count)\
+        .filter(Log.timestamp >= since, Log.question.isnot(None))\
+        .filter(or_(Log.is_session_end == False, Log.is_session_end.is_(None)))\
+        .group_by(folded)\
+        .having(func.count() >= min_count)\
+        .order_by(count.desc())\
+        .limit(limit)\
+        .all()
+
+    totals = Counter()
+    spellings = {}
+    for question, question_count in rows:
+        key = normalize_question(question)
+        if not key:
+            continue
+        totals[key] += question_count
+        # Rows arrive most frequent first, so the first spelling seen belongs to the largest group
+        spellings.setdefault(key, question.strip())
+
+    return [(spellings[key], total) for key, total in totals.most_common()]
+
+
+def warm_caches(questions: List[str], service, concurrency: int = 4, budget_seconds: float = 60) -> Dict[str, Any]:
+    """
+    Answer questions through service.smart_answer within a time budget
+
+    Args:
+        questions: Questions in priority order
+        service: AIService whose caches are warmed
+        concurrency: Questions answered at once (keep within AI_HTTP_MAX_CONNECTIONS)
+        budget_seconds: No question is started after this many seconds
+
+    Returns:
+        Counters of the run
+    """
+    deadline = time.monotonic() + budget_seconds
+    llm_requests = service.get_llm_pool_stats()['requests']
+    started = time.perf_counter()
+
+    def warm(question):
+        if time.monotonic() >= deadline:
+            return None
+        return service.smart_answer(question)
+
+    sources = Counter()
+    skipped = failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='cache-warmup') as executor:
+        for question, future in [(question, executor.submit(warm, question)) for question in questions]:
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.warning(f"Cache warm-up failed for {question!r}: {e}")
+                failed += 1
+                continue
+            if result is None:
+                skipped += 1
+            else:
+                sources[result['source']] += 1
+
+    return {
+        'questions': len(questions),
+        'answered': sum(sources.values()),
+        'skipped': skipped,
+        'failed': failed,
+        'sources': dict(sources),
+        'llm_calls': service.get_llm_pool_stats()['requests'] - llm_requests,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+
+def main():
+    from app import app, sync_faq_index
+    from ai_service import ai_service
+
+    parser = argparse.ArgumentParser(description='Warm the answer caches with frequent questions from the Log table')
+    parser.add_argument('--days', type=int, default=app.config['AI_WARMUP_DAYS'])
+    parser.add_argument('--limit', type=int, default=app.config['AI_WARMUP_QUESTIONS'])
+    parser.add_argument('--min-count', type=int, default=app.config['AI_WARMUP_MIN_COUNT'])
+    parser.add_argument('--concurrency', type=int, default=app.config['AI_WARMUP_CONCURRENCY'])
+    parser.add_argument('--budget', type=float, default=app.config['AI_WARMUP_BUDGET_SECONDS'],
+                        help='Seconds after which no further question is started')
+    parser.add_argument('--dry-run', action='store_true', help='Only list the questions that would be warmed')
+    args = parser.parse_args()
+
+    with app.app_context():
+        questions = frequent_questions(args.days, args.limit, args.min_count)
+        if not args.dry_run:
+            sync_faq_index()
+
+    if args.dry_run:
+        for question, count in questions:
+            print(f"{count:>6}  {question}")
+        return
+
+    stats = warm_caches([question for question, _ in questions], ai_service, args.concurrency, args.budget)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == '__main__':
+    main()